@@ -0,0 +1,211 @@
+"""
+Микробенчмарки сериализаторов, рендереров, фильтров и генерации слагов
+
+Все данные создаются в памяти (без обращения к бд): связанные объекты и теги
+подставляются в кэш предвыборки, а счётчики - как значения аннотаций (для
+сериализаторов по строкам `values()` - строки и связанные данные страницы),
+поэтому замеряется только CPU-стоимость Python кода.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from taggit.models import Tag
+
+from content.benchmarks.runner import benchmark
+from content.filters import BlogFilter, PostFilter
+from content.models import Blog, Post, PostImage, Comment
+from content.serializers import BlogSerializer, PostSerializer, CommentSerializer
+from content.utils import generate_slug
+from content.values import BlogValuesSerializer, PostValuesSerializer
+from core.renderers import OrjsonRenderer
+
+LIST_SIZE = 100
+
+
+def prefetched(model, objects):
+    """
+    Queryset с заполненным кэшем результатов (как после prefetch_related)
+    """
+    queryset = model.objects.all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def make_users(amount):
+    return [User(pk=i, username="user%d" % i) for i in range(1, amount + 1)]
+
+
+def make_blogs(amount):
+    users = make_users(5)
+    now = timezone.now()
+    blogs = []
+    for i in range(1, amount + 1):
+        blog = Blog(pk=i, slug="user-blog-%d" % i, title="Блог номер %d" % i, description="Описание блога " * 5,
+                    created_at=now - timedelta(days=i), updated_at=now, owner=users[i % 5])
+        blog._prefetched_objects_cache = {"authors": prefetched(User, users[:3])}
+        blog.subscribers = i * 7
+        blogs.append(blog)
+    return blogs
+
+
+def make_posts(amount):
+    users = make_users(5)
+    blog = make_blogs(1)[0]
+    tags = [Tag(pk=i, name="тег-%d" % i, slug="teg-%d" % i) for i in range(1, 6)]
+    now = timezone.now()
+    posts = []
+    for i in range(1, amount + 1):
+        post = Post(pk=i, slug="post-%d-1" % i, title="Пост номер %d" % i, body="Содержание поста. " * 50,
+                    is_published=True, created_at=now - timedelta(hours=i), views=i * 3, blog=blog,
+                    author=users[i % 5], comments_count=i, last_commented_at=now - timedelta(minutes=i))
+        image = PostImage(pk=i, post_id=i, image="posts/images/%064x.jpg" % i, sha256="%064x" % i, width=1600,
+                          height=1200, size=250000, status=PostImage.STATUS_READY,
+                          thumbnails={"160": "posts/thumbnails/%064x_160.jpg" % i,
+                                      "480": "posts/thumbnails/%064x_480.jpg" % i})
+        post._prefetched_objects_cache = {"tags": prefetched(Tag, tags[:i % 5]),
+                                          "images": prefetched(PostImage, [image] if i % 2 else [])}
+        post.num_likes = i * 2
+        posts.append(post)
+    return posts
+
+
+def make_comments(amount):
+    users = make_users(5)
+    post = make_posts(1)[0]
+    now = timezone.now()
+    return [
+        Comment(pk=i, body="Комментарий %d" % i, created_at=now - timedelta(minutes=i), post=post,
+                commented_by=users[i % 5], path=str(i).zfill(Comment.PATH_STEP))
+        for i in range(1, amount + 1)
+    ]
+
+
+@benchmark("serializer.post.list", items=LIST_SIZE)
+def post_serializer_list():
+    posts = make_posts(LIST_SIZE)
+    return lambda: PostSerializer(posts, many=True).data
+
+
+@benchmark("serializer.post.retrieve")
+def post_serializer_retrieve():
+    post = make_posts(1)[0]
+    return lambda: PostSerializer(post).data
+
+
+@benchmark("serializer.blog.list", items=LIST_SIZE)
+def blog_serializer_list():
+    blogs = make_blogs(LIST_SIZE)
+    return lambda: BlogSerializer(blogs, many=True).data
+
+
+@benchmark("serializer.comment.list", items=LIST_SIZE)
+def comment_serializer_list():
+    comments = make_comments(LIST_SIZE)
+    return lambda: CommentSerializer(comments, many=True).data
+
+
+def values_rows(objects, fields):
+    """
+    Строки `values()` объектов (поля через связи - через `__`)
+    """
+    rows = []
+    for obj in objects:
+        row = {}
+        for field in fields:
+            value = obj
+            for name in field.split("__"):
+                value = getattr(value, name, None)
+            row[field] = value
+        rows.append(row)
+    return rows
+
+
+@benchmark("serializer.post.list.values", items=LIST_SIZE)
+def post_values_serializer_list():
+    posts = make_posts(LIST_SIZE)
+    for post in posts:
+        post.body_head = post.body[:PostSerializer.excerpt_length + 1]
+    rows = values_rows(posts, PostValuesSerializer.values + ("num_likes", "body_head"))
+    related = {
+        "tags": {post.pk: [tag.name for tag in post.tags.all()] for post in posts},
+        "images": {},
+        "likes": {},
+        "authors": {post.author_id: post.author.username for post in posts},
+        "flags": {},
+    }
+    serializer = PostValuesSerializer(rows)
+    return lambda: [serializer.to_representation(row, related) for row in rows]
+
+
+@benchmark("serializer.blog.list.values", items=LIST_SIZE)
+def blog_values_serializer_list():
+    blogs = make_blogs(LIST_SIZE)
+    rows = values_rows(blogs, BlogValuesSerializer.values + ("subscribers", ))
+    related = {
+        "authors": {blog.pk: [user.username for user in blog.authors.all()] for blog in blogs},
+        "latest_posts": {},
+        "owners": {blog.owner_id: blog.owner.username for blog in blogs},
+        "subscribers": {},
+        "flags": {},
+    }
+    serializer = BlogValuesSerializer(rows)
+    return lambda: [serializer.to_representation(row, related) for row in rows]
+
+
+@benchmark("renderer.post.list.json", items=LIST_SIZE)
+def post_renderer_json():
+    data = PostSerializer(make_posts(LIST_SIZE), many=True).data
+    return lambda: JSONRenderer().render(data)
+
+
+@benchmark("renderer.post.list.orjson", items=LIST_SIZE)
+def post_renderer_orjson():
+    data = PostSerializer(make_posts(LIST_SIZE), many=True).data
+    return lambda: OrjsonRenderer().render(data)
+
+
+@benchmark("renderer.blog.list.json", items=LIST_SIZE)
+def blog_renderer_json():
+    data = BlogSerializer(make_blogs(LIST_SIZE), many=True).data
+    return lambda: JSONRenderer().render(data)
+
+
+@benchmark("renderer.blog.list.orjson", items=LIST_SIZE)
+def blog_renderer_orjson():
+    data = BlogSerializer(make_blogs(LIST_SIZE), many=True).data
+    return lambda: OrjsonRenderer().render(data)
+
+
+@benchmark("utils.generate_slug.latin")
+def generate_slug_latin():
+    return lambda: generate_slug("blog_owner", "My first blog about python")
+
+
+@benchmark("utils.generate_slug.cyrillic")
+def generate_slug_cyrillic():
+    return lambda: generate_slug("владелец_блога", "Мой первый блог о программировании")
+
+
+@benchmark("filter.post.build")
+def post_filter_build():
+    data = QueryDict("ordering=-relevance&title=post")
+    queryset = Post.objects.all()
+    return lambda: PostFilter(data=data, queryset=queryset).qs
+
+
+@benchmark("filter.post.tags")
+def post_filter_tags():
+    data = QueryDict("tags=python&tags=django&tags=docker&tags_match=all")
+    queryset = Post.objects.all()
+    return lambda: PostFilter(data=data, queryset=queryset).qs
+
+
+@benchmark("filter.blog.build")
+def blog_filter_build():
+    data = QueryDict("ordering=-relevance&title=blog")
+    queryset = Blog.objects.all()
+    return lambda: BlogFilter(data=data, queryset=queryset).qs
@@ -0,0 +1,88 @@
+import json
+import time
+
+REGISTRY = []
+
+
+class Benchmark:
+    """
+    Микробенчмарк
+
+    Параметры инициализации `__init__()`
+     * `name` - имя бенчмарка (ключ в файле базовых значений)
+     * `setup` - функция подготовки данных, возвращающая замеряемую функцию без аргументов
+     * `items` - кол-во элементов, обрабатываемых за один вызов замеряемой функции
+    """
+    def __init__(self, name, setup, items=1):
+        self.name = name
+        self.setup = setup
+        self.items = items
+
+    def measure(self, number, repeat):
+        """
+        Замер времени выполнения
+        :param number: кол-во вызовов в одном повторе
+        :param repeat: кол-во повторов
+        :return: лучшее время обработки одного элемента (нс.)
+        """
+        func = self.setup()
+        func()                                  # прогрев (ленивые кэши полей, импорты)
+        best = None
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - started_at
+            best = elapsed if best is None else min(best, elapsed)
+        return best / (number * self.items) * 1e9
+
+
+def benchmark(name, items=1):
+    """
+    Регистрация функции подготовки данных как бенчмарка
+    :param name: имя бенчмарка
+    :param items: кол-во элементов, обрабатываемых за один вызов
+    """
+    def decorator(setup):
+        REGISTRY.append(Benchmark(name, setup, items))
+        return setup
+    return decorator
+
+
+def run(benchmarks, number, repeat):
+    """
+    Выполнение набора бенчмарков
+    :return: словарь {имя: нс. на элемент}
+    """
+    return {bench.name: bench.measure(number, repeat) for bench in benchmarks}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results, baseline=None):
+    data = dict(baseline or {})
+    data.update({name: round(value, 1) for name, value in results.items()})
+    with open(path, "w") as file:
+        json.dump(dict(sorted(data.items())), file, indent=2)
+        file.write("\n")
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Поиск регрессий относительно базовых значений
+    :param results: результаты замеров {имя: нс. на элемент}
+    :param baseline: базовые значения {имя: нс. на элемент}
+    :param threshold: допустимое относительное замедление (0.25 - на 25%)
+    :return: список (имя, базовое значение, текущее значение)
+    """
+    return [
+        (name, baseline[name], value)
+        for name, value in results.items()
+        if name in baseline and value > baseline[name] * (1 + threshold)
+    ]
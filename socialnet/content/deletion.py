@@ -0,0 +1,251 @@
+"""
+Удаление блогов и пользователей
+
+Отметка удаления скрывает блог (и его посты) или пользователя (вход и его блоги)
+сразу, одним коротким UPDATE. Сущность с зависимыми записями удаляется фоновой задачей
+порциями по `CHUNK_SIZE` строк: задача удаляет одну порцию в своей транзакции и
+ставит следующую задачу, поэтому блокировки держатся только на время порции
+"""
+from collections import Counter
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value, CharField
+from django.db.models.functions import Coalesce, Concat, Greatest, Length
+from django.utils import timezone
+
+from content.models import (
+    Blog, Post, PostImage, Comment, Like, Subscription, TaggedPost, TagCount, Notification, PostActivity
+)
+from content.notifications import discount_unread
+from content.suggest import tag_suggest
+from content.trending import invalidate_trending
+from core.jobs import enqueue
+
+DEFAULTS = {
+    'CHUNK_SIZE': 1000,
+}
+
+PURGE_PRIORITY = -1                 # удаление уступает очередь остальным задачам
+
+
+def get_setting(name):
+    """
+    Получение параметра удаления из `settings.DELETION`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'DELETION', {}).get(name, DEFAULTS[name])
+
+
+def mark_blogs_deleted(blogs):
+    """
+    Отметка блогов удалёнными: слаг освобождается (`-deleted-<id>`, slugify
+    не создаёт слаги с дефиса), последний пост сбрасывается, так как посты
+    удаляются без обработчиков сигналов
+    :return: кол-во блогов
+    """
+    return blogs.update(
+        deleted_at=timezone.now(), latest_post=None,
+        slug=Concat(Value("-deleted-"), "pk", output_field=CharField()),
+    )
+
+
+def soft_delete_blog(blog):
+    """
+    Отметка удаления блога и постановка задачи его удаления (в одной транзакции)
+    """
+    with transaction.atomic():
+        mark_blogs_deleted(Blog.objects.filter(pk=blog.pk))
+        enqueue("content.purge_blog", {"blog_id": blog.pk}, priority=PURGE_PRIORITY)
+        transaction.on_commit(invalidate_trending)
+
+
+def soft_delete_user(user):
+    """
+    Отметка удаления пользователя (деактивация) и его блогов и постановка задачи
+    удаления пользователя (в одной транзакции)
+
+    Скрываются только его блоги (с постами): посты в чужих блогах и комментарии
+    пользователя видны до их удаления задачей, лайки - до обезличивания
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        mark_blogs_deleted(Blog.objects.filter(owner=user))
+        enqueue("content.purge_user", {"user_id": user.pk}, priority=PURGE_PRIORITY)
+        transaction.on_commit(invalidate_trending)
+
+
+def delete_chunk(queryset):
+    """
+    Удаление порции записей запроса одним DELETE без обработчиков сигналов и
+    каскада (зависимые записи удалены предыдущими порциями)
+    :return: кол-во удалённых записей
+    """
+    chunk = queryset.order_by().values("pk")[:get_setting('CHUNK_SIZE')]
+    return queryset.model._base_manager.filter(pk__in=chunk)._raw_delete(queryset.db)
+
+
+def delete_notifications_chunk(notifications):
+    """
+    Удаление порции уведомлений с уменьшением счётчиков непрочитанных получателей
+    (одним UPDATE на порцию)
+    """
+    ids = list(notifications.order_by().values_list("pk", flat=True)[:get_setting('CHUNK_SIZE')])
+    if not ids:
+        return 0
+    chunk = Notification.objects.filter(pk__in=ids)
+    discount_unread(chunk)
+    return chunk._raw_delete(notifications.db)
+
+
+def anonymize_likes_chunk(likes):
+    """
+    Обезличивание порции лайков (`liked_by = NULL`, как `SET_NULL` при удалении
+    пользователя): лайки остаются в счётчиках постов
+    """
+    chunk = likes.order_by().values("pk")[:get_setting('CHUNK_SIZE')]
+    return Like.objects.filter(pk__in=chunk).update(liked_by=None)
+
+
+def delete_images_chunk(images):
+    """
+    Удаление порции изображений постов с обработчиками сигналов (файлы удаляются
+    после фиксации транзакции)
+    """
+    chunk = images.order_by().values("pk")[:get_setting('CHUNK_SIZE')]
+    return PostImage.objects.filter(pk__in=chunk).delete()[0]
+
+
+def delete_tags_chunk(tagged):
+    """
+    Удаление порции тегов постов с уменьшением счётчиков использования тегов
+    (одним UPDATE на тег)
+    """
+    rows = list(tagged.order_by().values_list("pk", "tag_id")[:get_setting('CHUNK_SIZE')])
+    if not rows:
+        return 0
+    TaggedPost.objects.filter(pk__in=[pk for pk, _ in rows])._raw_delete(tagged.db)
+    for tag_id, count in Counter(tag_id for _, tag_id in rows).items():
+        TagCount.objects.filter(tag_id=tag_id).update(posts=Greatest(F("posts") - count, 0))
+        transaction.on_commit(partial(tag_suggest.adjust, tag_id, None, -count))
+    return len(rows)
+
+
+def delete_posts_chunk(posts):
+    """
+    Удаление порции постов (без зависимых записей) с пересчётом последнего поста
+    блогов, ссылавшихся на удалённые посты (ограничение внешнего ключа отложенное)
+    """
+    ids = list(posts.order_by().values_list("pk", flat=True)[:get_setting('CHUNK_SIZE')])
+    if not ids:
+        return 0
+    Post.all_objects.filter(pk__in=ids)._raw_delete(posts.db)
+    Blog.all_objects.filter(latest_post__in=ids).refresh_latest_post()
+    transaction.on_commit(invalidate_trending)
+    return len(ids)
+
+
+def delete_comments_chunk(comments):
+    """
+    Удаление порции комментариев вместе с поддеревьями ответов (по материализованному
+    пути) с пересчётом счётчика и даты последнего комментария постов
+
+    Порция - не больше `CHUNK_SIZE` строк поддеревьев, начиная с самых глубоких:
+    комментарий удаляется не раньше своих ответов, корни поддеревьев - последними
+    """
+    chunk_size = get_setting('CHUNK_SIZE')
+    roots = list(comments.order_by("post_id", "path").values_list("post_id", "path")[:chunk_size])
+    if not roots:
+        return 0
+    subtrees = reduce(or_, (Q(post_id=post_id, path__startswith=path) for post_id, path in roots))
+    rows = list(Comment.objects.filter(subtrees).order_by(Length("path").desc(), "path")
+                .values_list("pk", "post_id")[:chunk_size])
+    deleted = Comment.objects.filter(pk__in=[pk for pk, _ in rows])._raw_delete(comments.db)
+    post_comments = Comment.objects.filter(post=OuterRef("pk")).order_by().values("post")
+    Post.all_objects.filter(pk__in={post_id for _, post_id in rows}).update(
+        comments_count=Coalesce(Subquery(post_comments.annotate(count=Count("pk")).values("count")), 0),
+        last_commented_at=Subquery(post_comments.annotate(latest=Max("created_at")).values("latest")),
+    )
+    return deleted
+
+
+def post_steps(posts):
+    """
+    Шаги удаления постов: зависимые записи, затем посты
+    :param posts: запрос постов
+    :return: список (функция удаления порции, запрос)
+    """
+    return [
+        (delete_chunk, Comment.objects.filter(post__in=posts.values("pk"))),
+        (delete_chunk, Like.objects.filter(post__in=posts.values("pk"))),
+        (delete_notifications_chunk, Notification.objects.filter(post__in=posts.values("pk"))),
+        (delete_chunk, PostActivity.objects.filter(post__in=posts.values("pk"))),
+        (delete_tags_chunk, TaggedPost.objects.filter(content_object__in=posts.values("pk"))),
+        (delete_images_chunk, PostImage.objects.filter(post__in=posts.values("pk"))),
+        (delete_posts_chunk, posts),
+    ]
+
+
+def blog_steps(blog_id):
+    """
+    Шаги удаления блога: посты, подписки, авторы
+    """
+    return post_steps(Post.all_objects.filter(blog_id=blog_id)) + [
+        (delete_chunk, Subscription.objects.filter(blog_id=blog_id)),
+        (delete_chunk, Blog.authors.through.objects.filter(blog_id=blog_id)),
+    ]
+
+
+def user_steps(user_id):
+    """
+    Шаги удаления пользователя (после его блогов): посты в других блогах,
+    комментарии, лайки (обезличиваются), подписки, уведомления,
+    авторство в блогах
+    """
+    return post_steps(Post.all_objects.filter(author_id=user_id)) + [
+        (delete_comments_chunk, Comment.objects.filter(commented_by_id=user_id)),
+        (anonymize_likes_chunk, Like.objects.filter(liked_by_id=user_id)),
+        (delete_chunk, Subscription.objects.filter(user_id=user_id)),
+        (delete_notifications_chunk, Notification.objects.filter(recipient_id=user_id)),
+        (delete_notifications_chunk, Notification.objects.filter(actor_id=user_id)),
+        (delete_chunk, Blog.authors.through.objects.filter(user_id=user_id)),
+    ]
+
+
+def purge_step(steps):
+    """
+    Удаление одной порции первого шага, для которого остались записи
+    :return: удалена ли порция (False - записей не осталось)
+    """
+    return any(delete(queryset) for delete, queryset in steps)
+
+
+def purge_blog(blog_id):
+    """
+    Удаление порции блога, после удаления всех зависимых записей - самого блога
+    :return: остались ли записи для удаления
+    """
+    if purge_step(blog_steps(blog_id)):
+        return True
+    Blog.all_objects.filter(pk=blog_id).delete()
+    return False
+
+
+def purge_user(user_id):
+    """
+    Удаление порции пользователя: сначала его блогов, затем остальных зависимых
+    записей, после чего самого пользователя
+    :return: остались ли записи для удаления
+    """
+    blog_id = Blog.all_objects.filter(owner_id=user_id).order_by("pk").values_list("pk", flat=True).first()
+    if blog_id is not None:
+        purge_blog(blog_id)
+        return True
+    if purge_step(user_steps(user_id)):
+        return True
+    User.objects.filter(pk=user_id).delete()
+    return False
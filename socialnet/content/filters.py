@@ -1,10 +1,73 @@
+from django import forms
 from django.db.models import F, Count
-from django_filters import DateFilter, OrderingFilter, ModelMultipleChoiceFilter
+from django_filters import DateFilter, OrderingFilter, ChoiceFilter, Filter
 from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import FilterSet
-from taggit.models import Tag
+from rest_framework.filters import BaseFilterBackend
 
-from content.models import Blog, Post
+from content.models import Blog, Post, TaggedPost
+
+
+class TagNamesField(forms.Field):
+    """
+    Поле списка имён тегов (без проверки существования тегов)
+    """
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        if value in EMPTY_VALUES:
+            return []
+        return [name for name in dict.fromkeys(value) if name]
+
+
+class PostTagsFilter(Filter):
+    """
+    Фильтр постов по именам тегов
+
+    Посты выбираются полусоединением по таблице `TaggedPost` (индекс (tag, post)):
+     * `any` - посты хотя бы с одним из тегов
+     * `all` - посты со всеми тегами
+    Режим задаётся фильтром `match_field_name` того же набора фильтров
+    """
+    field_class = TagNamesField
+
+    def __init__(self, *args, match_field_name="tags_match", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.match_field_name = match_field_name
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        tagged = TaggedPost.objects.filter(tag__name__in=value).values("content_object")
+        if self.parent.form.cleaned_data.get(self.match_field_name) == "all":
+            tagged = tagged.annotate(matched=Count("tag")).filter(matched=len(value)).values("content_object")
+        return qs.filter(pk__in=tagged)
+
+
+class SparseFieldsFilterBackend(BaseFilterBackend):
+    """
+    Фильтр отложенного чтения полей модели, не выводимых в списке
+    (`?fields=`, `?exclude=`, `Meta.list_exclude` сериализатора)
+    """
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, "action", "list") != "list":     # Объект читается целиком
+            return queryset
+        serializer = view.get_serializer(many=True).child
+        optimize = getattr(serializer, "optimize_queryset", None)
+        return queryset if optimize is None else optimize(queryset)
+
+
+class IncludeFilterBackend(BaseFilterBackend):
+    """
+    Фильтр чтения встраиваемых связей (`?include=`) списка и объекта
+    """
+    def filter_queryset(self, request, queryset, view):
+        action = getattr(view, "action", "list")
+        if action not in ("list", "retrieve") or request.method != "GET":
+            return queryset
+        serializer = view.get_serializer(many=True).child if action == "list" else view.get_serializer()
+        include = getattr(serializer, "include_queryset", None)
+        return queryset if include is None else include(queryset)
 
 
 class NullLastOrderingFilter(OrderingFilter):
@@ -121,20 +184,24 @@ class PostFilter(FilterSet):
     Атрибуты фильтрации:
      * `date_from` - по дате "от"
      * `date_to` - по дате "до"
-     * `tags` - по тегу (Taggit)
+     * `tags` - по тегам (Taggit)
+     * `tags_match` - режим фильтрации по тегам: любой из тегов (`any`, по умолчанию) или все теги (`all`)
     Параметры сортировки:
      * 'title' - по заголовку ↑↓
      * `date` - по дате публикации ↑↓
+     * `activity` - по дате последнего комментария ↑↓
      * `like` - по кол-ву лайков ↑↓
      * `relevance` - по актуальности ↑↓
     """
     date_from = DateFilter(field_name='created_at', lookup_expr="gt")
     date_to = DateFilter(field_name='created_at', lookup_expr="lt")
-    tags = ModelMultipleChoiceFilter(field_name='tags__name', to_field_name='name', queryset=Tag.objects.all())
+    tags = PostTagsFilter()
+    tags_match = ChoiceFilter(choices=(('any', 'Any'), ('all', 'All')), method='filter_tags_match')
     ordering = PostRelevanceOrderingFilter(
         fields=(
             ('title', 'title'),
-            ('created_at', 'date')
+            ('created_at', 'date'),
+            ('last_commented_at', 'activity'),
         ),
         field_name='ordering',
     )
@@ -142,3 +209,7 @@ class PostFilter(FilterSet):
     class Meta:
         model = Post
         fields = ['title', 'created_at', 'tags', ]
+
+    @staticmethod
+    def filter_tags_match(queryset, name, value):
+        return queryset                          # Режим применяется фильтром `tags`
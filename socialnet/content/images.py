@@ -0,0 +1,276 @@
+import hashlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import close_old_connections, connection, transaction
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from content.models import PostImage
+from content.thumbnails import make_thumbnails
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'THUMBNAIL_SIZES': (160, 480, 1024),
+    'MAX_UPLOAD_SIZE': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40 * 1000 * 1000,
+    'FORMATS': ("JPEG", "PNG", "GIF", "WEBP"),
+    'MAX_PER_POST': 10,
+    'WORKERS': 2,
+}
+
+IMAGE_DIR = "posts/images"
+THUMBNAIL_DIR = "posts/thumbnails"
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+FORMATS_BY_EXTENSION = {extension: image_format for image_format, extension in EXTENSIONS.items()}
+THUMBNAIL_FORMATS = {"GIF": "PNG"}          # Миниатюры GIF - первый кадр в PNG
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_setting(name):
+    """
+    Получение параметра изображений постов из `settings.POST_IMAGES`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'POST_IMAGES', {}).get(name, DEFAULTS[name])
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик загрузки файлов во временные файлы на диске с расчётом SHA-256
+
+    Файл читается блоками и не накапливается в памяти целиком (независимо от
+    `FILE_UPLOAD_MAX_MEMORY_SIZE`), хеш считается по мере записи блоков. Файл
+    больше `MAX_UPLOAD_SIZE` пропускается, его имя сохраняется в `rejected`
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected = []
+        self.max_size = get_setting('MAX_UPLOAD_SIZE')
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.file.close()
+            self.rejected.append(self.file_name)
+            raise SkipFile()
+        self.hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hash.hexdigest()
+        return file
+
+
+def image_name(sha256, image_format):
+    return "%s/%s/%s.%s" % (IMAGE_DIR, sha256[:2], sha256, EXTENSIONS[image_format])
+
+
+def thumbnail_name(sha256, size, image_format):
+    return "%s/%s/%s_%d.%s" % (THUMBNAIL_DIR, sha256[:2], sha256, size, EXTENSIONS[image_format])
+
+
+def media_url(name, request=None):
+    """
+    Адрес файла хранилища (абсолютный при наличии запроса, как у `serializers.FileField`)
+    """
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def thumbnail_urls(thumbnails, request=None):
+    return {size: media_url(name, request) for size, name in sorted(thumbnails.items(), key=lambda item: int(item[0]))}
+
+
+def read_image(file):
+    """
+    Проверка загруженного изображения по содержимому (без полного декодирования)
+    :return: формат Pillow, ширина, высота
+    """
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError({"image": [_("Upload a valid image.")]}, code="invalid_image")
+    finally:
+        file.seek(0)
+    if image_format not in get_setting('FORMATS'):
+        raise ValidationError({"image": [_("Unsupported image format.")]}, code="invalid_image")
+    if width * height > get_setting('MAX_PIXELS'):
+        raise ValidationError({"image": [_("Image is too large.")]}, code="invalid_image")
+    return image_format, width, height
+
+
+def lock_content(sha256):
+    """
+    Блокировка содержимого до конца транзакции (`pg_advisory_xact_lock`):
+    сохранение изображения и удаление его файлов по тому же хешу выполняются по очереди
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [sha256])
+
+
+def attach_image(post, file):
+    """
+    Сохранение загруженного изображения поста
+
+    Файл сохраняется под именем по хешу содержимого (уже сохранённый файл
+    используется повторно) под блокировкой содержимого, миниатюры генерируются после фиксации транзакции.
+    Изображение с уже готовыми миниатюрами того же содержимого получает их сразу
+    :param post: пост
+    :param file: загруженный файл (`HashingUploadHandler` - с хешем `sha256`)
+    :return: изображение поста
+    """
+    image_format, width, height = read_image(file)
+    sha256 = getattr(file, "sha256", None)
+    if sha256 is None:
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+        file.seek(0)
+    name = image_name(sha256, image_format)
+    with transaction.atomic():
+        lock_content(sha256)                        # Файл не удаляется до фиксации записи изображения
+        if not default_storage.exists(name):
+            name = default_storage.save(name, file)
+        ready = PostImage.objects.filter(sha256=sha256, status=PostImage.STATUS_READY).values("thumbnails").first()
+        image = PostImage.objects.create(
+            post=post, image=name, sha256=sha256, width=width, height=height, size=file.size,
+            status=PostImage.STATUS_READY if ready else PostImage.STATUS_PENDING,
+            thumbnails=ready["thumbnails"] if ready else {},
+        )
+    if not ready:
+        transaction.on_commit(partial(schedule_thumbnails, image))
+    return image
+
+
+def get_pool():
+    """
+    Пул процессов генерации миниатюр процесса (создаётся при первом обращении)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=get_setting('WORKERS'),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def thumbnail_names(image):
+    """
+    Имена файлов миниатюр изображения по размеру и их формат
+    """
+    source_format = FORMATS_BY_EXTENSION[image.image.name.rsplit(".", 1)[-1]]
+    image_format = THUMBNAIL_FORMATS.get(source_format, source_format)
+    return {size: thumbnail_name(image.sha256, size, image_format) for size in get_setting('THUMBNAIL_SIZES')}, \
+        image_format
+
+
+def thumbnail_task(image):
+    """
+    Аргументы `make_thumbnails()` изображения и имена миниатюр по размеру
+    """
+    names, image_format = thumbnail_names(image)
+    targets = [(size, default_storage.path(name)) for size, name in names.items()]
+    return (default_storage.path(image.image.name), targets, image_format), names
+
+
+def save_thumbnails(sha256, names, error=None):
+    """
+    Сохранение результата генерации для всех ожидающих изображений того же содержимого
+    """
+    if error is not None:
+        logger.error("Thumbnails of %s failed: %s", sha256, error)
+        return PostImage.objects.filter(sha256=sha256, status=PostImage.STATUS_PENDING)\
+            .update(status=PostImage.STATUS_FAILED)
+    return PostImage.objects.filter(sha256=sha256).exclude(status=PostImage.STATUS_READY).update(
+        status=PostImage.STATUS_READY, thumbnails={str(size): name for size, name in names.items()},
+    )
+
+
+def thumbnails_done(sha256, names, future):
+    close_old_connections()                         # Поток результатов пула, а не запроса
+    try:
+        save_thumbnails(sha256, names, future.exception())
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(image):
+    """
+    Генерация миниатюр изображения вне запроса: в пуле из `WORKERS` процессов,
+    результат сохраняется в бд потоком результатов пула; при `WORKERS = 0` -
+    сразу в текущем процессе
+    :return: future генерации или None
+    """
+    args, names = thumbnail_task(image)
+    if not get_setting('WORKERS'):
+        try:
+            make_thumbnails(*args)
+        except Exception as error:
+            save_thumbnails(image.sha256, names, error)
+        else:
+            save_thumbnails(image.sha256, names)
+        return None
+    future = get_pool().submit(make_thumbnails, *args)
+    future.add_done_callback(partial(thumbnails_done, image.sha256, names))
+    return future
+
+
+def regenerate_thumbnails(images):
+    """
+    Генерация миниатюр изображений с ожиданием результата (по одной задаче на
+    содержимое), результаты сохраняются текущим потоком
+    :param images: изображения постов
+    :return: кол-во сгенерированных и кол-во ошибок
+    """
+    tasks = {image.sha256: thumbnail_task(image) for image in images}
+    futures = {}
+    if get_setting('WORKERS'):
+        futures = {sha256: get_pool().submit(make_thumbnails, *args) for sha256, (args, _) in tasks.items()}
+    failed = 0
+    for sha256, (args, names) in tasks.items():
+        try:
+            futures[sha256].result() if futures else make_thumbnails(*args)
+        except Exception as error:
+            failed += 1
+            save_thumbnails(sha256, names, error)
+        else:
+            save_thumbnails(sha256, names)
+    return len(tasks) - failed, failed
+
+
+def delete_image_files(image):
+    """
+    Удаление файлов изображения и миниатюр, если на них не ссылаются другие изображения
+    (проверка и удаление - под блокировкой содержимого, см. `attach_image()`)
+    """
+    with transaction.atomic():
+        lock_content(image.sha256)
+        if PostImage.objects.filter(sha256=image.sha256).exists():
+            return False
+        names, _ = thumbnail_names(image)
+        for name in {image.image.name, *names.values(), *image.thumbnails.values()}:
+            default_storage.delete(name)
+    return True
@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from content.benchmarks import cases  # noqa: F401 (регистрация бенчмарков)
+from content.benchmarks.runner import REGISTRY, run, load_baseline, save_baseline, find_regressions
+
+BASELINE_PATH = os.path.join(os.path.dirname(cases.__file__), "baseline.json")
+
+
+class Command(BaseCommand):
+    """
+    Команда запуска микробенчмарков сериализаторов, фильтров и утилит
+
+    Результаты (нс. на элемент) сравниваются с базовыми значениями, при замедлении
+    сверх порога `--threshold` команда завершается с ошибкой. Абсолютные значения
+    зависят от машины, поэтому файл базовых значений не хранится в репозитории и
+    создаётся на каждой машине (`--save-baseline` на исходной версии кода).
+    Пример: `python manage.py benchmark serializer --repeat 7 --threshold 0.3`
+    """
+    help = "Run content microbenchmarks and compare them with stored baselines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Name prefixes of benchmarks to run")
+        parser.add_argument("--number", type=int, default=200, help="Calls per repeat")
+        parser.add_argument("--repeat", type=int, default=5, help="Repeats (the best one is taken)")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown")
+        parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file path")
+        parser.add_argument("--save-baseline", action="store_true", help="Store results as the new baseline")
+
+    def handle(self, *args, **options):
+        benchmarks = [
+            bench for bench in REGISTRY
+            if not options["names"] or any(bench.name.startswith(name) for name in options["names"])
+        ]
+        if not benchmarks:
+            raise CommandError("No benchmarks matched %s" % ", ".join(options["names"]))
+        baseline = load_baseline(options["baseline"])
+        if not baseline and not options["save_baseline"]:
+            self.stdout.write(self.style.WARNING(
+                "No baseline at %s, run with --save-baseline on this machine first" % options["baseline"]
+            ))
+        results = run(benchmarks, options["number"], options["repeat"])
+
+        width = max(len(name) for name in results)
+        for name, value in results.items():
+            line = "%s  %12.1f ns/item" % (name.ljust(width), value)
+            if name in baseline:
+                line += "  (baseline %.1f, %+.1f%%)" % (baseline[name], (value / baseline[name] - 1) * 100)
+            self.stdout.write(line)
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], results, baseline)
+            self.stdout.write(self.style.SUCCESS("Baseline saved to %s" % options["baseline"]))
+            return
+        regressions = find_regressions(results, baseline, options["threshold"])
+        if regressions:
+            raise CommandError("Regressions over %d%%: %s" % (
+                options["threshold"] * 100,
+                ", ".join("%s %.1f -> %.1f ns" % regression for regression in regressions),
+            ))
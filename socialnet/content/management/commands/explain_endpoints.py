@@ -0,0 +1,129 @@
+from collections import namedtuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from content.models import Post, Comment, Subscription, TagCount
+from content.trending import invalidate_trending
+from core.explain import explain, plan_issues
+from core.querystats import fingerprint
+
+Samples = namedtuple("Samples", ("blog", "post", "comment", "author", "subscriber", "tag"))
+
+
+def get_samples():
+    """
+    Объекты для параметров конечных точек: самый обсуждаемый опубликованный пост,
+    его блог, автор и корневой комментарий, подписчик и самый используемый тег
+    """
+    post = Post.objects.filter(is_published=True).select_related("blog", "author")\
+        .order_by("-comments_count", "-pk").first()
+    if post is None:
+        raise CommandError("No published posts found, load data with `manage.py seed` first")
+    comment = Comment.objects.filter(post=post, parent__isnull=True).order_by("path").first()
+    subscription = Subscription.objects.select_related("user").order_by("pk").first()
+    usage = TagCount.objects.filter(posts__gt=0).select_related("tag").order_by("-posts", "tag_id").first()
+    return Samples(
+        blog=post.blog.slug,
+        post=post.slug,
+        comment=comment and comment.pk,
+        author=post.author,
+        subscriber=subscription and subscription.user,
+        tag=usage and usage.tag.name,
+    )
+
+
+def get_endpoints(samples):
+    """
+    Запросы к конечным точкам API: (имя url, аргументы url, параметры запроса, пользователь)
+    """
+    endpoints = [
+        ("blog-list", {}, {}, None),
+        ("blog-list", {}, {"ordering": "-date"}, None),
+        ("blog-list", {}, {"ordering": "-relevance"}, None),
+        ("blog-detail", {"slug": samples.blog}, {}, None),
+        ("blog-detail", {"slug": samples.blog}, {"include": "posts"}, None),
+        ("blog-posts-list", {"slug": samples.blog}, {}, None),
+        ("blog-posts-list", {"slug": samples.blog}, {}, samples.author),
+        ("post-list", {}, {}, None),
+        ("post-list", {}, {"ordering": "-activity"}, None),
+        ("post-list", {}, {"ordering": "-relevance"}, None),
+        ("user-posts-list", {}, {}, samples.author),
+        ("post-detail", {"slug": samples.post}, {}, None),
+        ("post-detail", {"slug": samples.post}, {"include": "blog,author,comments"}, None),
+        ("post-trending", {}, {}, None),
+        ("post-comments-list", {"slug": samples.post}, {}, None),
+        ("post-threads-list", {"slug": samples.post}, {}, None),
+        ("tag-list", {}, {}, None),
+    ]
+    if samples.subscriber is not None:
+        endpoints.append(("user-subscribes-list", {}, {}, samples.subscriber))
+    if samples.comment is not None:
+        endpoints.append(("comment-thread", {"pk": samples.comment}, {}, None))
+    if samples.tag is not None:
+        endpoints.append(("post-list", {}, {"tags": samples.tag}, None))
+        endpoints.append(("tag-suggest", {}, {"q": samples.tag[:2]}, None))
+    return endpoints
+
+
+class Command(BaseCommand):
+    """
+    Команда проверки планов выполнения запросов конечных точек API
+
+    Каждая конечная точка вызывается с параметрами по данным бд (рекомендуется
+    бд после `manage.py seed`), для каждого уникального (по отпечатку) запроса
+    выполняется `EXPLAIN (ANALYZE, BUFFERS)` и отмечаются последовательные чтения
+    и сортировки от `--min-rows` строк. Все изменения (счётчики просмотров и т.п.)
+    откатываются.
+    Пример: `python manage.py explain_endpoints post-list --min-rows 5000 --fail`
+    """
+    help = "EXPLAIN ANALYZE the queries of every API endpoint and flag sequential scans and sorts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="URL names of endpoints to check")
+        parser.add_argument("--min-rows", type=int, default=1000, help="Flag scans and sorts from this many rows")
+        parser.add_argument("--fail", action="store_true", help="Exit with an error if anything was flagged")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        flagged = 0
+        with transaction.atomic():
+            endpoints = [
+                endpoint for endpoint in get_endpoints(get_samples())
+                if not options["names"] or endpoint[0] in options["names"]
+            ]
+            if not endpoints:
+                raise CommandError("No endpoints matched %s" % ", ".join(options["names"]))
+            invalidate_trending()                         # расчёт популярности вместо кэша
+            for name, kwargs, params, user in endpoints:
+                path = reverse(name, kwargs=kwargs)
+                request = factory.get(path, params, HTTP_HOST="localhost")
+                if user is not None:
+                    force_authenticate(request, user=user)
+                match = resolve(path)
+                with CaptureQueriesContext(connection) as context:
+                    response = match.func(request, *match.args, **match.kwargs)
+                    response.render()
+                queries = {}
+                for query in context.captured_queries:
+                    if query["sql"].lstrip().upper().startswith("SELECT"):
+                        queries.setdefault(fingerprint(query["sql"]), []).append(query["sql"])
+                self.stdout.write(self.style.MIGRATE_HEADING("%s %s%s  [%d, %d queries]" % (
+                    name, path, "?" + request.META["QUERY_STRING"] if params else "",
+                    response.status_code, len(context.captured_queries),
+                )))
+                for key, statements in queries.items():
+                    plan, duration = explain(statements[0])
+                    issues = plan_issues(plan, options["min_rows"])
+                    flagged += len(issues)
+                    self.stdout.write("  %3dx %9.2f ms  %s" % (len(statements), duration, key[:120]))
+                    for issue in issues:
+                        self.stdout.write(self.style.WARNING("                      ! %s" % issue))
+            transaction.set_rollback(True)
+        if flagged and options["fail"]:
+            raise CommandError("%d sequential scans or sorts flagged" % flagged)
+        message = "%d endpoints checked, %d sequential scans or sorts flagged" % (len(endpoints), flagged)
+        self.stdout.write(self.style.WARNING(message) if flagged else self.style.SUCCESS(message))
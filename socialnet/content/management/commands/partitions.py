@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from content.models import Post
+from content.partitioning import (
+    COMMENT_TABLE, LIKE_TABLE, ensure_comment_partitions, list_partitions, pruning_checks,
+)
+
+
+class Command(BaseCommand):
+    """
+    Команда обслуживания секций лайков и комментариев
+
+    Создаёт месячные секции комментариев на `PARTITIONING['COMMENT_MONTHS_AHEAD']`
+    месяцев вперёд (и за месяцы строк, попавших в секцию по умолчанию), выводит
+    секции таблиц. С `--check` проверяет исключение секций из планов запросов.
+    Пример: `python manage.py partitions --check` (ежемесячно, например по cron)
+    """
+    help = "Create upcoming comment partitions, list partitions and check partition pruning"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Check partition pruning of post queries")
+
+    def handle(self, *args, **options):
+        for name in ensure_comment_partitions():
+            self.stdout.write(self.style.SUCCESS("Created %s" % name))
+        for table in (LIKE_TABLE, COMMENT_TABLE):
+            self.stdout.write(self.style.MIGRATE_HEADING(table))
+            for name, bound, rows in list_partitions(table):
+                self.stdout.write("  %-28s %10d rows  %s" % (name, rows, bound))
+        if not options["check"]:
+            return
+        post = Post.objects.filter(is_published=True, created_at__isnull=False).select_related("author").order_by("-pk").first()
+        if post is None:
+            raise CommandError("No published posts found")
+        failed = 0
+        for description, scanned, extra in pruning_checks(post, post.author):
+            failed += bool(extra)
+            line = "%-24s %d partitions scanned" % (description, len(scanned))
+            if extra:
+                self.stdout.write(self.style.ERROR("%s, not pruned: %s" % (line, ", ".join(sorted(extra)))))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        if failed:
+            raise CommandError("%d queries are not pruned" % failed)
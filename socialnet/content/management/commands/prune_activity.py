@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from content.models import PostActivity
+from content.trending import get_setting, hour_bucket
+
+
+class Command(BaseCommand):
+    """
+    Команда удаления почасовой активности постов вне окна популярности
+
+    Пример: `python manage.py prune_activity --keep-hours 168`
+    """
+    help = "Delete post activity buckets older than the trending window"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-hours", type=int, default=None,
+                            help="Buckets to keep (defaults to TRENDING['WINDOW_HOURS'])")
+
+    def handle(self, *args, **options):
+        hours = options["keep_hours"] or get_setting('WINDOW_HOURS')
+        deleted, _ = PostActivity.objects.filter(bucket__lt=hour_bucket(timezone.now() - timedelta(hours=hours))).delete()
+        self.stdout.write(self.style.SUCCESS("Deleted %d activity buckets" % deleted))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from content.publishing import get_setting, publish_due_posts
+from core.querystats import recording_queries
+
+
+class Command(BaseCommand):
+    """
+    Команда публикации запланированных постов, время публикации которых наступило
+
+    Пример: `python manage.py publish_scheduled --loop --interval 30`
+    """
+    help = "Publish scheduled posts whose publish time has come"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Posts per transaction (defaults to PUBLISHING['BATCH_SIZE'])")
+        parser.add_argument("--loop", action="store_true", help="Keep running as a worker")
+        parser.add_argument("--interval", type=int, default=None,
+                            help="Seconds between runs in loop mode (defaults to PUBLISHING['INTERVAL'])")
+
+    def handle(self, *args, **options):
+        with recording_queries():                       # статистика отпечатков запросов команды
+            self.run_loop(options)
+
+    def run_loop(self, options):
+        interval = options["interval"] or get_setting('INTERVAL')
+        while True:
+            published = publish_due_posts(batch_size=options["batch_size"])
+            if published or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS("Published %d posts" % published))
+            if not options["loop"]:
+                return
+            time.sleep(interval)
@@ -0,0 +1,336 @@
+import io
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from taggit.models import Tag
+
+from content.models import Blog, Post, Comment, Like, Subscription, TaggedPost
+from content.partitioning import ensure_comment_partitions
+
+WORDS = (
+    "python", "django", "postgres", "docker", "linux", "музыка", "кино", "спорт", "путешествия", "книги",
+    "наука", "история", "кулинария", "фото", "игры", "дизайн", "бизнес", "финансы", "здоровье", "природа",
+    "город", "новости", "обзор", "заметки", "идеи", "опыт", "советы", "проект", "код", "данные",
+)
+
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i", "й": "j",
+    "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sch", "ы": "y", "э": "e", "ю": "ju", "я": "ja",
+    "ь": "", "ъ": "",
+})
+
+NULL = "\\N"
+
+
+def copy_rows(cursor, table, columns, rows, chunk_size):
+    """
+    Потоковая запись строк в таблицу через `COPY ... FROM STDIN`
+    Строки буферизуются порциями по `chunk_size`, каждая порция - отдельный COPY
+    :param cursor: курсор psycopg2
+    :param table: имя таблицы
+    :param columns: имена колонок
+    :param rows: итератор кортежей значений (None - NULL)
+    :param chunk_size: размер порции
+    :return: кол-во записанных строк
+    """
+    sql = "COPY %s (%s) FROM STDIN" % (table, ", ".join(columns))
+    total = 0
+    buffer = io.StringIO()
+    buffered = 0
+    for row in rows:
+        buffer.write("\t".join(NULL if value is None else str(value) for value in row))
+        buffer.write("\n")
+        buffered += 1
+        if buffered >= chunk_size:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += buffered
+            buffer = io.StringIO()
+            buffered = 0
+    if buffered:
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        total += buffered
+    return total
+
+
+class SyntheticDataset:
+    """
+    Генератор коррелированных синтетических данных
+
+    Популярность блога (распределение Парето) определяет кол-во его постов,
+    подписчиков и лайков под постами, популярность тегов подчиняется закону Ципфа.
+    Идентификаторы выделяются после текущих максимальных, поэтому данные
+    добавляются к существующим. При одинаковом `seed` и исходном состоянии бд
+    результат воспроизводим.
+    """
+    def __init__(self, seed, users, blogs, posts, likes, comments, subscriptions, tags, until, days):
+        self.random = random.Random(seed)
+        self.amounts = {
+            "users": users, "blogs": blogs, "posts": posts, "likes": likes,
+            "comments": comments, "subscriptions": subscriptions, "tags": tags,
+        }
+        self.until = until
+        self.days = days
+        self.offsets = {}
+        self.blog_weights = []
+        self.blog_owners = []
+        self.published = []             # (id поста, вес поста, дата публикации)
+        self.last_post_id = None
+
+    def pareto(self, alpha=1.2):
+        return self.random.paretovariate(alpha)
+
+    def split(self, total, weights):
+        """
+        Распределение общего кол-ва пропорционально весам
+        """
+        weight_sum = sum(weights) or 1
+        return [int(round(total * weight / weight_sum)) for weight in weights]
+
+    def moment(self, after=None):
+        start = after or self.until - timedelta(days=self.days)
+        span = max((self.until - start).total_seconds(), 1)
+        return start + timedelta(seconds=self.random.random() * span)
+
+    def phrase(self, words):
+        return " ".join(self.random.choice(WORDS) for _ in range(words))
+
+    def users(self):
+        offset = self.offsets["auth_user"]
+        joined = self.until - timedelta(days=self.days)
+        for i in range(1, self.amounts["users"] + 1):
+            pk = offset + i
+            yield pk, "!", None, False, "seed_%d" % pk, "", "", "", False, True, joined.isoformat()
+
+    def blogs(self):
+        offset, user_offset = self.offsets["content_blog"], self.offsets["auth_user"]
+        owner_weights = [self.pareto() for _ in range(self.amounts["users"])]
+        owners = self.random.choices(range(user_offset + 1, user_offset + self.amounts["users"] + 1),
+                                     weights=owner_weights, k=self.amounts["blogs"])
+        for i, owner in enumerate(owners, start=1):
+            pk = offset + i
+            self.blog_weights.append(self.pareto())
+            self.blog_owners.append(owner)
+            title = self.phrase(3)
+            slug = "seed-%d-%s" % (pk, title.translate(TRANSLIT).replace(" ", "-"))
+            yield pk, slug[:50], title, self.phrase(12), self.moment().isoformat(), None, owner
+
+    def blog_authors(self):
+        offset = self.offsets["content_blog_authors"]
+        for i, owner in enumerate(self.blog_owners, start=1):
+            yield offset + i, self.offsets["content_blog"] + i, owner
+
+    def posts(self):
+        offset = self.offsets["content_post"]
+        pk = offset
+        counts = self.split(self.amounts["posts"], self.blog_weights)
+        for index, count in enumerate(counts):
+            blog_id = self.offsets["content_blog"] + index + 1
+            for _ in range(count):
+                pk += 1
+                is_published = self.random.random() < 0.9
+                created_at = self.moment() if is_published else None
+                weight = self.blog_weights[index] * self.pareto(1.5)
+                if is_published:
+                    self.published.append((pk, weight, created_at))
+                yield (pk, "seed-%d-%x" % (pk, blog_id), self.phrase(5), self.phrase(60), is_published,
+                       created_at.isoformat() if created_at else None, min(int(weight * 10), 10 ** 7),
+                       blog_id, self.blog_owners[index], 0, None)
+        self.last_post_id = pk
+
+    def tags(self):
+        offset = self.offsets["taggit_tag"]
+        for i in range(1, self.amounts["tags"] + 1):
+            pk = offset + i
+            word = WORDS[(i - 1) % len(WORDS)]
+            yield pk, "%s-%d" % (word, pk), "%s-%d" % (word.translate(TRANSLIT), pk)
+
+    def tagged_posts(self):
+        offset = self.offsets["content_taggedpost"]
+        tag_ids = range(self.offsets["taggit_tag"] + 1, self.offsets["taggit_tag"] + self.amounts["tags"] + 1)
+        cum_weights, accumulated = [], 0.0
+        for rank in range(1, len(tag_ids) + 1):       # Закон Ципфа: вес тега 1 / ранг
+            accumulated += 1.0 / rank
+            cum_weights.append(accumulated)
+        pk = offset
+        if not tag_ids:
+            return
+        for post_id in range(self.offsets["content_post"] + 1, self.last_post_id + 1):
+            for tag_id in sorted(set(self.random.choices(tag_ids, cum_weights=cum_weights, k=self.random.randint(0, 5)))):
+                pk += 1
+                yield pk, post_id, tag_id
+
+    def likes(self):
+        pk = self.offsets["content_like"]
+        user_ids = range(self.offsets["auth_user"] + 1, self.offsets["auth_user"] + self.amounts["users"] + 1)
+        counts = self.split(self.amounts["likes"], [weight for _, weight, _ in self.published])
+        for (post_id, _, published_at), count in zip(self.published, counts):
+            for user_id in self.random.sample(user_ids, min(count, len(user_ids))):
+                pk += 1
+                yield pk, post_id, self.moment(published_at).isoformat(), user_id
+
+    def comments(self):
+        pk = self.offsets["content_comment"]
+        user_ids = range(self.offsets["auth_user"] + 1, self.offsets["auth_user"] + self.amounts["users"] + 1)
+        counts = self.split(self.amounts["comments"], [weight for _, weight, _ in self.published])
+        step = Comment.PATH_STEP
+        for (post_id, _, published_at), count in zip(self.published, counts):
+            thread = []                                  # (путь, дата) комментариев поста
+            for _ in range(count):
+                pk += 1
+                parent_id, path, after = None, "", published_at
+                if thread and self.random.random() < 0.5:            # ответ на один из предыдущих
+                    path, after = self.random.choice(thread)
+                    parent_id = int(path[-step:])
+                path += str(pk).zfill(step)
+                created_at = self.moment(after)
+                thread.append((path, created_at))
+                yield (pk, self.phrase(8), created_at.isoformat(), self.random.choice(user_ids), post_id,
+                       parent_id, path)
+
+    def subscriptions(self):
+        pk = self.offsets["content_subscription"]
+        user_ids = range(self.offsets["auth_user"] + 1, self.offsets["auth_user"] + self.amounts["users"] + 1)
+        counts = self.split(self.amounts["subscriptions"], self.blog_weights)
+        for index, count in enumerate(counts):
+            for user_id in self.random.sample(user_ids, min(count, len(user_ids))):
+                pk += 1
+                yield pk, self.offsets["content_blog"] + index + 1, self.moment().isoformat(), user_id
+
+
+class Command(BaseCommand):
+    """
+    Команда загрузки синтетических данных больших объёмов
+
+    Данные генерируются потоково и записываются через `COPY FROM STDIN` порциями,
+    на время загрузки вторичные индексы таблиц удаляются и затем создаются заново,
+    после загрузки обновляются последовательности и статистика планировщика.
+    Пример: `python manage.py seed --users 100000 --blogs 100000 --posts 1000000 --likes 10000000 --seed 42`
+    """
+    help = "Generate correlated synthetic data and bulk-load it with COPY"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--blogs", type=int, default=100)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument("--likes", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=5000)
+        parser.add_argument("--subscriptions", type=int, default=5000)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (reproducible runs)")
+        parser.add_argument("--until", default=None, help="Latest timestamp date, YYYY-MM-DD (default: today)")
+        parser.add_argument("--days", type=int, default=365, help="Time span of generated activity")
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per COPY chunk")
+        parser.add_argument("--keep-indexes", action="store_true", help="Do not drop secondary indexes while loading")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("COPY loading requires PostgreSQL")
+        try:
+            until = datetime.strptime(options["until"], "%Y-%m-%d") if options["until"] else timezone.now()
+        except ValueError:
+            raise CommandError("--until must be in YYYY-MM-DD format")
+        until = until.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=dt_timezone.utc)
+        dataset = SyntheticDataset(
+            options["seed"], options["users"], options["blogs"], options["posts"], options["likes"],
+            options["comments"], options["subscriptions"], options["tags"], until, options["days"],
+        )
+        chunk_size = options["chunk_size"]
+        authors = Blog.authors.through
+        tables = [
+            (User, ("id", "password", "last_login", "is_superuser", "username", "first_name", "last_name",
+                    "email", "is_staff", "is_active", "date_joined"), dataset.users),
+            (Blog, ("id", "slug", "title", "description", "created_at", "updated_at", "owner_id"), dataset.blogs),
+            (authors, ("id", "blog_id", "user_id"), dataset.blog_authors),
+            (Post, ("id", "slug", "title", "body", "is_published", "created_at", "views", "blog_id", "author_id",
+                    "comments_count", "last_commented_at"), dataset.posts),
+            (Tag, ("id", "name", "slug"), dataset.tags),
+            (TaggedPost, ("id", "content_object_id", "tag_id"), dataset.tagged_posts),
+            (Like, ("id", "post_id", "created_at", "liked_by_id"), dataset.likes),
+            (Comment, ("id", "body", "created_at", "commented_by_id", "post_id", "parent_id", "path"),
+             dataset.comments),
+            (Subscription, ("id", "blog_id", "created_at", "user_id"), dataset.subscriptions),
+        ]
+        models = [model for model, _, _ in tables]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in models:
+                table = model._meta.db_table
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM "%s"' % table)
+                dataset.offsets[table] = cursor.fetchone()[0]
+            ensure_comment_partitions(until - timedelta(days=options["days"]), until)   # секции комментариев
+            indexes = [] if options["keep_indexes"] else self.drop_secondary_indexes(cursor, models)
+
+            for model, columns, rows in tables:
+                started_at = time.monotonic()
+                written = copy_rows(cursor.cursor, '"%s"' % model._meta.db_table, columns, rows(), chunk_size)
+                self.stdout.write("%-28s %10d rows  %7.1f s" % (model._meta.db_table, written, time.monotonic() - started_at))
+
+            cursor.execute(                          # Последний опубликованный пост и дата публикации блогов
+                'UPDATE "content_blog" AS b SET "latest_post_id" = p."id", "updated_at" = p."created_at" '
+                'FROM (SELECT DISTINCT ON ("blog_id") "blog_id", "id", "created_at" FROM "content_post" '
+                'WHERE "is_published" AND "id" > %s ORDER BY "blog_id", "created_at" DESC NULLS LAST, "id" DESC) AS p '
+                'WHERE b."id" = p."blog_id"', [dataset.offsets["content_post"]]
+            )
+            cursor.execute(                          # Счётчики комментариев постов
+                'UPDATE "content_post" AS p SET "comments_count" = c."total", "last_commented_at" = c."latest", '
+                '"first_commented_at" = LEAST(p."first_commented_at", c."first") '
+                'FROM (SELECT "post_id", COUNT(*) AS "total", MAX("created_at") AS "latest", MIN("created_at") AS "first" '
+                'FROM "content_comment" '
+                'WHERE "id" > %s GROUP BY "post_id") AS c '
+                'WHERE p."id" = c."post_id"', [dataset.offsets["content_comment"]]
+            )
+            cursor.execute(                          # Почасовая активность постов по лайкам и комментариям
+                'INSERT INTO "content_postactivity" ("post_id", "bucket", "likes", "views", "comments") '
+                'SELECT "post_id", "bucket", SUM("likes"), 0, SUM("comments") FROM ('
+                'SELECT "post_id", date_trunc(\'hour\', "created_at" AT TIME ZONE \'UTC\') AT TIME ZONE \'UTC\' AS "bucket", '
+                '1 AS "likes", 0 AS "comments" FROM "content_like" WHERE "id" > %s '
+                'UNION ALL SELECT "post_id", date_trunc(\'hour\', "created_at" AT TIME ZONE \'UTC\') AT TIME ZONE \'UTC\', 0, 1 '
+                'FROM "content_comment" WHERE "id" > %s) AS "events" GROUP BY "post_id", "bucket" '
+                'ON CONFLICT ("post_id", "bucket") DO UPDATE SET "likes" = "content_postactivity"."likes" + EXCLUDED."likes", '
+                '"comments" = "content_postactivity"."comments" + EXCLUDED."comments"',
+                [dataset.offsets["content_like"], dataset.offsets["content_comment"]]
+            )
+            cursor.execute(                          # Счётчики использования тегов
+                'INSERT INTO "content_tagcount" ("tag_id", "posts") '
+                'SELECT "tag_id", COUNT(*) FROM "content_taggedpost" WHERE "id" > %s GROUP BY "tag_id" '
+                'ON CONFLICT ("tag_id") DO UPDATE SET "posts" = "content_tagcount"."posts" + EXCLUDED."posts"',
+                [dataset.offsets["content_taggedpost"]]
+            )
+            started_at = time.monotonic()
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")     # проверка отложенных FK до CREATE INDEX
+            for definition in indexes:
+                cursor.execute(definition)
+            cursor.execute("SET CONSTRAINTS ALL DEFERRED")      # возврат режима внешней транзакции
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+            self.stdout.write("%-28s %10d       %7.1f s" % ("indexes rebuilt", len(indexes), time.monotonic() - started_at))
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute('ANALYZE "%s"' % model._meta.db_table)
+        self.stdout.write(self.style.SUCCESS("Synthetic data loaded (seed=%d)" % options["seed"]))
+
+    @staticmethod
+    def drop_secondary_indexes(cursor, models):
+        """
+        Удаление индексов, не обеспечивающих ограничения (PK, UNIQUE)
+        :return: список определений удалённых индексов для пересоздания
+        """
+        cursor.execute(
+            "SELECT i.indexname, i.indexdef FROM pg_indexes AS i "
+            "WHERE i.schemaname = current_schema() AND i.tablename = ANY(%s) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint AS c WHERE c.conname = i.indexname)",
+            [[model._meta.db_table for model in models]],
+        )
+        rows = cursor.fetchall()
+        for name, _ in rows:
+            cursor.execute('DROP INDEX "%s"' % name)
+        return [definition.replace(" ON ONLY ", " ON ") for _, definition in rows]   # с индексами секций
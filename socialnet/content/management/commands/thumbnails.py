@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from content.images import regenerate_thumbnails
+from content.models import PostImage
+
+
+class Command(BaseCommand):
+    """
+    Команда генерации миниатюр изображений постов, ожидающих генерации (задачи
+    пула теряются при перезапуске процесса) и, с `--failed`, завершившихся ошибкой
+
+    Пример: `python manage.py thumbnails --failed`
+    """
+    help = "Generate thumbnails of pending (and failed) post images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--failed", action="store_true", help="Retry images whose thumbnails failed")
+
+    def handle(self, *args, **options):
+        statuses = [PostImage.STATUS_PENDING] + ([PostImage.STATUS_FAILED] if options["failed"] else [])
+        images = PostImage.objects.filter(status__in=statuses).order_by("sha256", "id").distinct("sha256")
+        generated, failed = regenerate_thumbnails(images)
+        message = "Generated thumbnails of %d images, %d failed" % (generated, failed)
+        self.stdout.write(self.style.WARNING(message) if failed else self.style.SUCCESS(message))
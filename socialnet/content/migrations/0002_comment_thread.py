@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='content.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.TextField(db_collation='C', default='', editable=False),
+        ),
+        migrations.RunSQL(                 # Существующие комментарии - корни веток
+            sql="UPDATE content_comment SET path = LPAD(id::text, 10, '0')",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='content_comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_comment_thread'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE content_post AS p SET comments_count = c.total, last_commented_at = c.latest "
+                "FROM (SELECT post_id, COUNT(*) AS total, MAX(created_at) AS latest "
+                "FROM content_comment GROUP BY post_id) AS c WHERE p.id = c.post_id",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.OrderBy(models.F('last_commented_at'), descending=True, nulls_last=True), name='content_post_activity_idx'),
+        ),
+    ]
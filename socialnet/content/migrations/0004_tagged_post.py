@@ -0,0 +1,67 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:12
+
+import django.db.models.deletion
+import taggit.managers
+from django.db import migrations, models
+
+POST_CONTENT_TYPE = "(SELECT id FROM django_content_type WHERE app_label = 'content' AND model = 'post')"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_post_comment_counters'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag')),
+                ('posts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-posts'], name='content_tagcount_posts_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaggedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_items', to='taggit.tag')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='tags',
+            field=taggit.managers.TaggableManager(help_text='A comma-separated list of tags.', through='content.TaggedPost', to='taggit.Tag', verbose_name='Tags'),
+        ),
+        migrations.AddIndex(
+            model_name='taggedpost',
+            index=models.Index(fields=['tag', 'content_object'], name='content_taggedpost_tag_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taggedpost',
+            constraint=models.UniqueConstraint(fields=('content_object', 'tag'), name='content_taggedpost_uniq'),
+        ),
+        migrations.RunSQL(                 # Перенос тегов постов из обобщённой таблицы taggit
+            sql=[
+                "INSERT INTO content_taggedpost (content_object_id, tag_id) "
+                "SELECT object_id, tag_id FROM taggit_taggeditem "
+                "WHERE content_type_id = %s ON CONFLICT DO NOTHING" % POST_CONTENT_TYPE,
+                "DELETE FROM taggit_taggeditem WHERE content_type_id = %s" % POST_CONTENT_TYPE,
+            ],
+            reverse_sql=[
+                "INSERT INTO taggit_taggeditem (object_id, content_type_id, tag_id) "
+                "SELECT content_object_id, %s, tag_id FROM content_taggedpost" % POST_CONTENT_TYPE,
+            ],
+        ),
+        migrations.RunSQL(
+            sql="INSERT INTO content_tagcount (tag_id, posts) "
+                "SELECT tag_id, COUNT(*) FROM content_taggedpost GROUP BY tag_id",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Индекс префиксного поиска тегов без учёта регистра (`name__istartswith`)
+    """
+    dependencies = [
+        ('content', '0004_tagged_post'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX "taggit_tag_name_upper_prefix_idx" ON "taggit_tag" (UPPER("name"::text) text_pattern_ops)',
+            reverse_sql='DROP INDEX IF EXISTS "taggit_tag_name_upper_prefix_idx"',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_DAYS = 30
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_tag_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='content_activity_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'bucket'), name='content_activity_uniq'),
+        ),
+        migrations.RunSQL(                 # Активность за последние BACKFILL_DAYS дней по лайкам и комментариям
+            sql="INSERT INTO content_postactivity (post_id, bucket, likes, views, comments) "
+                "SELECT post_id, bucket, SUM(likes), 0, SUM(comments) FROM ("
+                "SELECT post_id, date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket, "
+                "1 AS likes, 0 AS comments FROM content_like "
+                "WHERE created_at >= now() - interval '%(days)d days' "
+                "UNION ALL "
+                "SELECT post_id, date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', 0, 1 "
+                "FROM content_comment WHERE created_at >= now() - interval '%(days)d days'"
+                ") AS events GROUP BY post_id, bucket" % {"days": BACKFILL_DAYS},
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0006_post_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='like',
+            name='content_lik_post_id_41eb34_idx',
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='liked_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunSQL(                 # Лайки удалённых пользователей (DO_NOTHING) и дубликаты
+            sql=[
+                "UPDATE content_like SET liked_by_id = NULL WHERE liked_by_id IS NOT NULL "
+                "AND NOT EXISTS (SELECT 1 FROM auth_user AS u WHERE u.id = content_like.liked_by_id)",
+                "DELETE FROM content_like AS a USING content_like AS b "
+                "WHERE a.post_id = b.post_id AND a.liked_by_id = b.liked_by_id AND a.id > b.id",
+                "DELETE FROM content_subscription AS a USING content_subscription AS b "
+                "WHERE a.blog_id = b.blog_id AND a.user_id = b.user_id AND a.id > b.id",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('post', 'liked_by'), name='content_like_post_user_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('blog', 'user'), name='content_subscription_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0008_post_publish_at'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='latest_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='content.post'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.F('blog'), models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('is_published', True)), name='content_post_blog_latest_idx'),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE content_blog AS b SET latest_post_id = p.id, updated_at = p.created_at "
+                "FROM content_blog AS o LEFT JOIN LATERAL (SELECT id, created_at FROM content_post "
+                "WHERE blog_id = o.id AND is_published ORDER BY created_at DESC NULLS LAST, id DESC LIMIT 1) AS p "
+                "ON TRUE WHERE b.id = o.id",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_blog_latest_post'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blog',
+            name='content_blo_slug_50eba4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='content_com_created_37dc1a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='content_pos_slug_b4dd0c_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='subscription',
+            new_name='content_subscription_user_idx',
+            old_name='content_sub_user_id_725192_idx',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='liked_by',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='postactivity',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='blog',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.blog'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(models.OrderBy(models.F('updated_at'), descending=True, nulls_last=True), name='content_blog_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(models.F('post'), models.OrderBy(models.F('created_at'), descending=True), name='content_comment_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['liked_by', 'post'], name='content_like_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), condition=models.Q(('is_published', True)), name='content_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.F('author'), models.OrderBy(models.F('created_at'), descending=True, nulls_last=True), name='content_post_author_idx'),
+        ),
+    ]
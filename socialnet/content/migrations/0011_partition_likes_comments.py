@@ -0,0 +1,94 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:39
+
+from datetime import datetime, timedelta, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LIKE_PARTITIONS = 8
+COMMENT_MONTHS_AHEAD = 3
+
+
+def next_month(moment):
+    return (moment.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_table(cursor, table, method, key, partitions):
+    """
+    Пересоздание таблицы секционированной: столбцы, индексы, ограничения UNIQUE и
+    внешние ключи переносятся с прежними именами, первичный ключ дополняется ключом
+    секционирования, столбец `id` получает последовательность вместо identity
+    (identity-столбцы секционированных таблиц не поддерживаются до PostgreSQL 17)
+    """
+    cursor.execute("SELECT conname FROM pg_constraint WHERE confrelid = %s::regclass", [table])
+    if cursor.fetchall():
+        raise RuntimeError("Table %s is referenced by foreign keys" % table)
+    cursor.execute(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes AS i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = %s "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint AS c WHERE c.conname = i.indexname)", [table]
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('u', 'f') ORDER BY contype DESC, conname", [table]
+    )
+    constraints = cursor.fetchall()
+
+    cursor.execute('ALTER TABLE "{0}" RENAME TO "{0}_old"'.format(table))
+    cursor.execute('CREATE TABLE "{0}" (LIKE "{0}_old" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   'PARTITION BY {1} ("{2}")'.format(table, method, key))
+    for name, bound in partitions:
+        cursor.execute('CREATE TABLE "%s" PARTITION OF "%s" %s' % (name, table, bound))
+    cursor.execute('INSERT INTO "{0}" SELECT * FROM "{0}_old"'.format(table))
+    cursor.execute('SELECT MAX("id") FROM "%s"' % table)
+    last_id = cursor.fetchone()[0]
+    cursor.execute('DROP TABLE "%s_old"' % table)
+
+    cursor.execute('ALTER TABLE "{0}" ADD CONSTRAINT "{0}_pkey" PRIMARY KEY ("id", "{1}")'.format(table, key))
+    for name, definition in constraints:
+        cursor.execute('ALTER TABLE "%s" ADD CONSTRAINT "%s" %s' % (table, name, definition))
+    for name, definition in indexes:
+        cursor.execute(definition.replace(" ON ONLY ", " ON "))
+    cursor.execute('CREATE SEQUENCE "{0}_id_seq" OWNED BY "{0}"."id"'.format(table))
+    cursor.execute("SELECT setval(%s, %s, %s)", ['"%s_id_seq"' % table, last_id or 1, last_id is not None])
+    cursor.execute('ALTER TABLE "{0}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{0}_id_seq"\')'.format(table))
+
+
+def partition_likes_comments(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(cursor, "content_like", "HASH", "post_id", [
+            ("content_like_p%d" % remainder, "FOR VALUES WITH (MODULUS %d, REMAINDER %d)" % (LIKE_PARTITIONS, remainder))
+            for remainder in range(LIKE_PARTITIONS)
+        ])
+
+        now = datetime.now(timezone.utc)
+        cursor.execute('SELECT MIN("created_at") FROM "content_comment"')
+        start = min(cursor.fetchone()[0] or now, now).astimezone(timezone.utc)
+        start = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        until = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(COMMENT_MONTHS_AHEAD):
+            until = next_month(until)
+        partitions = [("content_comment_default", "DEFAULT")]
+        while start <= until:
+            end = next_month(start)
+            partitions.append(("content_comment_y%04dm%02d" % (start.year, start.month),
+                               "FOR VALUES FROM ('%s') TO ('%s')" % (start.isoformat(), end.isoformat())))
+            start = end
+        partition_table(cursor, "content_comment", "RANGE", "created_at", partitions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0010_workload_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='content.comment'),
+        ),
+        migrations.RunPython(partition_likes_comments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-19 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0014_blog_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='first_commented_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE content_post AS p SET first_commented_at = c.first "
+                "FROM (SELECT post_id, MIN(created_at) AS first "
+                "FROM content_comment GROUP BY post_id) AS c WHERE p.id = c.post_id",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,9 +1,80 @@
 from django.conf import settings
-from django.db import models
-from django.db.models import F
+from django.db import models, transaction, connections
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import post_save
 from django.urls import reverse
 
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItemBase
+
+
+class InsertIgnoreManager(models.Manager):
+    """
+    Менеджер идемпотентного создания сущностей
+
+    `create_or_ignore()` выполняет один запрос `INSERT ... ON CONFLICT DO NOTHING`:
+    при нарушении ограничения уникальности запись не создаётся, проверка
+    существования перед вставкой (и гонка между проверкой и вставкой) не нужна.
+    Для созданной записи отправляется сигнал `post_save`, как при `create()`.
+    """
+    def create_or_ignore(self, **kwargs):
+        """
+        :return: (сущность, True - создана / False - уже существовала)
+        """
+        obj = self.model(**kwargs)
+        connection = connections[self.db]
+        meta = self.model._meta
+        fields = [field for field in meta.concrete_fields if not field.primary_key]
+        values = [field.get_db_prep_save(field.pre_save(obj, add=True), connection) for field in fields]
+        sql = 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT DO NOTHING RETURNING %s' % (
+            connection.ops.quote_name(meta.db_table),
+            ", ".join(connection.ops.quote_name(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+            connection.ops.quote_name(meta.pk.column),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+            row = cursor.fetchone()
+        if row is None:
+            return obj, False
+        obj.pk = row[0]
+        obj._state.adding = False
+        obj._state.db = self.db
+        post_save.send(sender=self.model, instance=obj, created=True, update_fields=None, raw=False, using=self.db)
+        return obj, True
+
+
+class BlogQuerySet(models.QuerySet):
+    def refresh_latest_post(self):
+        """
+        Пересчёт последнего опубликованного поста и даты обновления блогов одним UPDATE
+        (по частичному индексу опубликованных постов блога)
+        :return: кол-во обновлённых блогов
+        """
+        latest = Post.objects.filter(blog=OuterRef("pk"), is_published=True)\
+            .order_by(F("created_at").desc(nulls_last=True), "-pk")
+        return self.update(latest_post=Subquery(latest.values("pk")[:1]),
+                           updated_at=Subquery(latest.values("created_at")[:1]))
+
+
+class BlogManager(models.Manager.from_queryset(BlogQuerySet)):
+    """
+    Менеджер блогов, не отмеченных удалёнными
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class PostManager(models.Manager):
+    """
+    Менеджер постов блогов, не отмеченных удалёнными
+
+    Удалённые блоги выбираются подзапросом по частичному индексу (обычно пустому),
+    условие `NOT IN` вычисляется хешированным подпланом без соединения с блогами
+    """
+    def get_queryset(self):
+        deleted = Blog.all_objects.filter(deleted_at__isnull=False).values("pk")
+        return super().get_queryset().exclude(blog__in=deleted)
 
 
 class Blog(models.Model):
@@ -16,28 +87,44 @@ class Blog(models.Model):
      * `description` - описание блога
      * `created_at` - время и дата создания блога
      * `updated_at` - время и дата последнего обновления блога (по дате последней публикации)
+     * `latest_post` - последний опубликованный пост блога (Post OTM rel)
      * `authors` - авторы, добавляющие посты в блог (User MTM rel)
      * `owner` - владелец блога (User OTM rel)
+     * `deleted_at` - время и дата отметки удаления блога
+
+    Блог, отмеченный удалённым, скрыт менеджером `objects` (и посты блога -
+    менеджером постов) и удаляется фоновой задачей порциями (`content.deletion`),
+    `all_objects` - менеджер всех блогов.
+
+    `updated_at` и `latest_post` обновляются пакетно при публикации постов и
+    пересчитываются только при удалении или снятии с публикации последнего поста.
+    Ключ `latest_post` не изменяется каскадно: ограничение внешнего ключа
+    отложенное, и обработчик удаления поста заменяет ссылку до фиксации транзакции.
     """
     slug = models.SlugField(unique=True)
     title = models.CharField(max_length=255)
     description = models.CharField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(null=True)
+    latest_post = models.ForeignKey("Post", on_delete=models.DO_NOTHING, null=True, blank=True,
+                                    related_name="+")
     authors = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='authors')
     owner = models.ForeignKey(settings.AUTH_USER_MODEL,
                               on_delete=models.CASCADE,
                               related_name='owner')
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = BlogManager()
+    all_objects = BlogQuerySet.as_manager()
 
     class Meta:
         get_latest_by = "-updated_at"
         ordering = [F('updated_at').desc(nulls_last=True)]
-        indexes = [models.Index(fields=[
-            "slug",
-            "-updated_at",
-            "title",
-            "owner",
-        ])]
+        indexes = [
+            models.Index(F("updated_at").desc(nulls_last=True), name="content_blog_updated_idx"),
+            models.Index(fields=["deleted_at"], name="content_blog_deleted_idx",
+                         condition=models.Q(deleted_at__isnull=False)),
+        ]
 
     def get_absolute_url(self):
         return reverse("blog_detail", kwargs={"slug": self.slug})
@@ -47,6 +134,8 @@ class Blog(models.Model):
 
     @property
     def total_subscribers(self):
+        if hasattr(self, "subscribers"):       # Значение аннотации сортировки по актуальности
+            return self.subscribers
         return Subscription.objects.filter(blog=self).count()
 
     @staticmethod
@@ -67,8 +156,22 @@ class Post(models.Model):
      * `views` - Счётчик просмотров поста
      * `blog` - блог, в котором существует пост (Blog OTM rel)
      * `author` - автор поста (User OTM rel)
+     * `comments_count` - счётчик комментариев поста
+     * `last_commented_at` - время и дата последнего комментария
+     * `first_commented_at` - время и дата первого комментария (не сдвигается при удалении
+       комментариев и повторной публикации поста - нижняя граница дат комментариев)
+     * `publish_at` - запланированные время и дата публикации (неопубликованного поста)
      * `tags` - менеджер тегов (Taggit)
+
+    Посты блогов, отмеченных удалёнными, скрыты менеджером `objects`,
+    `all_objects` - менеджер всех постов.
+
+    Счётчики комментариев обновляются только запросами UPDATE из обработчиков сигналов
+    комментариев и исключаются из сохранения существующего поста целиком (`update_fields`,
+    поэтому удалённый пост вставляется повторно только с `force_insert=True`)
     """
+    COUNTER_FIELDS = ("comments_count", "last_commented_at", "first_commented_at")
+
     slug = models.SlugField(unique=True)
     title = models.CharField(max_length=255)
     body = models.CharField()
@@ -76,20 +179,39 @@ class Post(models.Model):
     created_at = models.DateTimeField(null=True)
     views = models.IntegerField(default=0)
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE)
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    comments_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(null=True, blank=True)
+    first_commented_at = models.DateTimeField(null=True, blank=True, editable=False)
+    publish_at = models.DateTimeField(null=True, blank=True)
+
+    tags = TaggableManager(through="TaggedPost")
 
-    tags = TaggableManager()
+    objects = PostManager()
+    all_objects = models.Manager()
 
     class Meta:
         get_latest_by = "-created_at"
         ordering = [F('created_at').desc(nulls_last=True)]
-        indexes = [models.Index(fields=[
-            "slug",
-            "-created_at",
-            "title",
-            "views",
-            "author"
-        ])]
+        indexes = [
+            models.Index(F("created_at").desc(nulls_last=True), name="content_post_feed_idx",
+                         condition=models.Q(is_published=True)),
+            models.Index(F("author"), F("created_at").desc(nulls_last=True), name="content_post_author_idx"),
+            models.Index(F("last_commented_at").desc(nulls_last=True), name="content_post_activity_idx"),
+            models.Index(fields=["publish_at"], name="content_post_scheduled_idx",
+                         condition=models.Q(is_published=False, publish_at__isnull=False)),
+            models.Index(F("blog"), F("created_at").desc(nulls_last=True), F("id").desc(),
+                         name="content_post_blog_latest_idx", condition=models.Q(is_published=True)),
+        ]
+
+    def save(self, *args, force_insert=False, update_fields=None, **kwargs):
+        if update_fields is None and not force_insert and not self._state.adding:
+            deferred = self.get_deferred_fields()        # Сохранение целиком не перезаписывает счётчики
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        return super().save(*args, force_insert=force_insert, update_fields=update_fields, **kwargs)
 
     def get_absolute_url(self):
         return reverse("post_detail", kwargs={"slug": self.slug})
@@ -99,6 +221,8 @@ class Post(models.Model):
 
     @property
     def total_likes(self):
+        if hasattr(self, "num_likes"):         # Значение аннотации сортировки по лайкам
+            return self.num_likes
         return Like.objects.filter(post=self).count()
 
     @staticmethod
@@ -106,6 +230,96 @@ class Post(models.Model):
         return "author"
 
 
+class TaggedPost(TaggedItemBase):
+    """
+    Сущность тега поста
+
+    Связывающая сущность поста и тега: `Post` O<->M `TaggedPost` M<->O `Tag`
+    (прямые ключи вместо обобщённой связи `TaggedItem` через contenttypes)
+
+    Поля сущности:
+     * `content_object` - ключ поста (Post OTM rel)
+     * `tag` - ключ тега (Tag OTM rel)
+    """
+    content_object = models.ForeignKey(Post, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_object", "tag"], name="content_taggedpost_uniq"),
+        ]
+        indexes = [models.Index(fields=["tag", "content_object"], name="content_taggedpost_tag_idx")]
+
+
+class PostImage(models.Model):
+    """
+    Сущность изображения поста
+
+    Поля сущности:
+     * `post` - пост (Post OTM rel)
+     * `image` - файл исходного изображения (имя по хешу содержимого)
+     * `sha256` - хеш содержимого файла
+     * `width`, `height` - размеры исходного изображения
+     * `size` - размер файла в байтах
+     * `status` - состояние миниатюр: ожидают генерации, готовы, ошибка
+     * `thumbnails` - имена файлов миниатюр по размеру (`{"160": имя}`)
+     * `created_at` - время и дата загрузки
+
+    Одинаковые файлы (в т.ч. разных постов) хранятся в одном экземпляре вместе
+    с миниатюрами, файлы удаляются с последним ссылающимся изображением
+    """
+    STATUS_PENDING = "pending"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_READY, "Ready"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="images")
+    image = models.FileField(max_length=255)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+
+class TagCount(models.Model):
+    """
+    Сущность счётчика использования тега
+
+    Поля сущности:
+     * `tag` - тег, первичный ключ (Tag OTO rel)
+     * `posts` - кол-во постов с тегом (обновляется обработчиками сигналов `TaggedPost`)
+    """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name="usage")
+    posts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-posts"], name="content_tagcount_posts_idx")]
+
+
+class CommentQuerySet(models.QuerySet):
+    def of_post(self, post):
+        """
+        Комментарии поста
+
+        Условие `created_at >= Post.first_commented_at` не меняет результат, но
+        исключает из плана секции таблицы за более ранние месяцы (дата публикации
+        поста для этого не годится: повторная публикация сдвигает её вперёд)
+        """
+        queryset = self.filter(post=post)
+        if post.first_commented_at is not None:
+            queryset = queryset.filter(created_at__gte=post.first_commented_at)
+        return queryset
+
+
 class Comment(models.Model):
     """
     Сущность комментария
@@ -115,20 +329,46 @@ class Comment(models.Model):
      * `created_at` - время и дата создания комментария
      * `post` - пост, в котором существует комментарий (Post OTM rel)
      * `commented_by` - автор комментария (User OTM rel)
+     * `parent` - комментарий, на который дан ответ (Comment OTM rel)
+     * `path` - материализованный путь: идентификаторы предков и самого комментария,
+       дополненные нулями до `PATH_STEP` символов (поддерево - все комментарии поста,
+       путь которых начинается с пути корня, порядок по пути - порядок обхода дерева)
+
+    Таблица секционирована по диапазонам `created_at` (по месяцам, команда `partitions`),
+    первичный ключ бд - (`id`, `created_at`), поэтому ключ `parent` не имеет ограничения
+    внешнего ключа в бд (каскадное удаление ответов выполняет Django)
     """
+    PATH_STEP = 10
+
     body = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
     commented_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="replies",
+                               db_constraint=False)
+    path = models.TextField(db_collation="C", default="", editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         get_latest_by = "-created_at"
         ordering = ["-created_at"]
-        indexes = [models.Index(fields=[
-            "-created_at",
-            "post",
-            "commented_by"
-        ])]
+        indexes = [
+            models.Index(F("post"), F("created_at").desc(), name="content_comment_post_idx"),
+            models.Index(fields=["post", "path"], name="content_comment_thread_idx"),
+        ]
+
+    @property
+    def depth(self):
+        return max(len(self.path) // self.PATH_STEP - 1, 0)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():             # Путь содержит идентификатор,
+            super().save(*args, **kwargs)      # поэтому вычисляется после вставки
+            self.path = (self.parent.path if self.parent_id else "") + str(self.pk).zfill(self.PATH_STEP)
+            Comment.objects.filter(pk=self.pk, created_at=self.created_at).update(path=self.path)  # одна секция
 
     @staticmethod
     def get_user_field_name():
@@ -144,17 +384,22 @@ class Like(models.Model):
     Поля сущности:
      * `post` - ключ понравившегося поста (Post OTM rel)
      * `created_at` - время и дата создания сущности
-     * `liked_by` - автор лайка (User OTM rel)
+     * `liked_by` - автор лайка (User OTM rel), при удалении пользователя лайк сохраняется без автора
+       (задача удаления пользователя обезличивает лайки порциями)
+
+    Таблица секционирована по хешу `post_id`, первичный ключ бд - (`id`, `post_id`)
     """
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    liked_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
+    liked_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, db_index=False)
+
+    objects = InsertIgnoreManager()
 
     class Meta:
-        indexes = [models.Index(fields=[
-            "post",
-            "liked_by"
-        ])]
+        constraints = [
+            models.UniqueConstraint(fields=["post", "liked_by"], name="content_like_post_user_uniq"),
+        ]
+        indexes = [models.Index(fields=["liked_by", "post"], name="content_like_user_idx")]
 
 
 class Subscription(models.Model):
@@ -168,12 +413,93 @@ class Subscription(models.Model):
      * `created_at` - время и дата создания сущности
      * `user` - подписчик (User OTM rel)
     """
-    blog = models.ForeignKey(Blog, on_delete=models.CASCADE)
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+
+    objects = InsertIgnoreManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["blog", "user"], name="content_subscription_uniq"),
+        ]
+        indexes = [models.Index(fields=["user", "blog"], name="content_subscription_user_idx")]
+
+
+class Notification(models.Model):
+    """
+    Сущность уведомления пользователя
+
+    Поля сущности:
+     * `recipient` - получатель (User OTM rel)
+     * `kind` - вид: публикация поста блога из подписок, комментарий к посту, ответ на комментарий
+     * `actor` - пользователь, действие которого вызвало уведомление (User OTM rel)
+     * `post` - пост (Post OTM rel)
+     * `comment_id` - id комментария (таблица комментариев секционирована, внешний ключ не создаётся)
+     * `is_read` - флаг прочтения
+     * `created_at` - время и дата создания сущности
+
+    Кол-во непрочитанных уведомлений хранится счётчиком `NotificationCounter`
+    """
+    KIND_POST_PUBLISHED = "post_published"
+    KIND_COMMENT = "comment"
+    KIND_REPLY = "reply"
+    KIND_CHOICES = (
+        (KIND_POST_PUBLISHED, "Post published"),
+        (KIND_COMMENT, "Comment"),
+        (KIND_REPLY, "Reply"),
+    )
+
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False,
+                                  related_name="notifications")
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="+")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True)
+    comment_id = models.BigIntegerField(null=True, blank=True)
+    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
     class Meta:
-        indexes = [models.Index(fields=[
-            "user",
-            "blog"
-        ])]
+        indexes = [models.Index(F("recipient"), F("id").desc(), name="content_notification_recip_idx")]
+
+
+class NotificationCounter(models.Model):
+    """
+    Сущность счётчика непрочитанных уведомлений пользователя
+
+    Поля сущности:
+     * `user` - пользователь, первичный ключ (User OTO rel)
+     * `unread` - кол-во непрочитанных уведомлений (изменяется запросами UPDATE
+       вместе с созданием и прочтением уведомлений)
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name="notification_counter")
+    unread = models.IntegerField(default=0)
+
+
+class PostActivity(models.Model):
+    """
+    Сущность почасовой активности поста
+
+    Счётчики событий поста за час, обновляются инкрементально (upsert)
+    при лайках, просмотрах и комментариях и используются для расчёта
+    популярности постов за последнее время
+
+    Поля сущности:
+     * `post` - ключ поста (Post OTM rel)
+     * `bucket` - начало часа
+     * `likes` - кол-во лайков за час
+     * `views` - кол-во просмотров за час
+     * `comments` - кол-во комментариев за час
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
+    bucket = models.DateTimeField()
+    likes = models.IntegerField(default=0)
+    views = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "bucket"], name="content_activity_uniq"),
+        ]
+        indexes = [models.Index(fields=["bucket"], name="content_activity_bucket_idx")]
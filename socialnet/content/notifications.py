@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from content.models import Notification, NotificationCounter, Post, Subscription
+
+DEFAULTS = {
+    'MAX_BATCH_SIZE': 1000,
+}
+
+
+def get_setting(name):
+    """
+    Получение параметра уведомлений из `settings.NOTIFICATIONS`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def fan_out_batch_size(followers):
+    """
+    Размер пакета рассылки по кол-ву подписчиков блога: подписчики делятся на
+    минимальное кол-во равных пакетов не больше `MAX_BATCH_SIZE` (без короткого
+    последнего пакета, 1500 подписчиков - 2 пакета по 750)
+    """
+    max_size = get_setting('MAX_BATCH_SIZE')
+    batches = max(-(-followers // max_size), 1)
+    return max(-(-followers // batches), 1)
+
+
+def notify(recipient_ids, kind, actor_id=None, post_id=None, comment_id=None):
+    """
+    Создание уведомлений одним пакетом в транзакции
+
+    Уведомления вставляются одним `bulk_create`, счётчики непрочитанных
+    получателей создаются при отсутствии и увеличиваются одним UPDATE (строки
+    счётчиков блокируются в порядке id пользователей - без взаимоблокировок
+    параллельных рассылок)
+    :param recipient_ids: id получателей (действующий пользователь исключается)
+    :return: кол-во созданных уведомлений
+    """
+    recipient_ids = sorted(set(recipient_ids) - {actor_id, None})
+    if not recipient_ids:
+        return 0
+    with transaction.atomic():
+        Notification.objects.bulk_create([
+            Notification(recipient_id=recipient_id, kind=kind, actor_id=actor_id, post_id=post_id,
+                         comment_id=comment_id)
+            for recipient_id in recipient_ids
+        ])
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=recipient_id) for recipient_id in recipient_ids], ignore_conflicts=True
+        )
+        counters = NotificationCounter.objects.filter(user_id__in=recipient_ids)
+        list(counters.order_by("user_id").select_for_update().values_list("user_id", flat=True))
+        counters.update(unread=F("unread") + 1)
+    return len(recipient_ids)
+
+
+def fan_out_batch(post_id, blog_id, author_id, batch_size, after=None):
+    """
+    Уведомление одного пакета подписчиков блога о публикации поста
+
+    Подписчики читаются по индексу (blog, user) с продолжением от последнего
+    id пользователя предыдущего пакета
+    :param batch_size: размер пакета (`fan_out_batch_size`)
+    :param after: id последнего подписчика предыдущего пакета
+    :return: кол-во созданных уведомлений, id последнего подписчика пакета
+             (None - подписчиков больше нет)
+    """
+    subscribers = Subscription.objects.filter(blog_id=blog_id).order_by("user_id")
+    if after is not None:
+        subscribers = subscribers.filter(user_id__gt=after)
+    user_ids = list(subscribers.values_list("user_id", flat=True)[:batch_size])
+    if not user_ids:
+        return 0, None
+    created = notify(user_ids, Notification.KIND_POST_PUBLISHED, actor_id=author_id, post_id=post_id)
+    return created, user_ids[-1] if len(user_ids) == batch_size else None
+
+
+def fan_out_post(post_id, blog_id, author_id):
+    """
+    Уведомление всех подписчиков блога о публикации поста, каждый пакет -
+    отдельная транзакция (фоновые задачи рассылают пакеты отдельными задачами)
+    :return: кол-во созданных уведомлений
+    """
+    batch_size = fan_out_batch_size(Subscription.objects.filter(blog_id=blog_id).count())
+    total, after = 0, None
+    while True:
+        created, after = fan_out_batch(post_id, blog_id, author_id, batch_size, after)
+        total += created
+        if after is None:
+            return total
+
+
+def notify_comment(comment_id, post_id, actor_id, parent_author_id=None):
+    """
+    Уведомление автора поста о комментарии и автора родительского комментария об ответе
+    (автор поста, получивший ответ на свой комментарий, уведомляется один раз)
+    :param comment_id: id комментария
+    :param post_id: id поста
+    :param actor_id: id автора комментария
+    :param parent_author_id: id автора родительского комментария (для ответа)
+    """
+    post_author_id = Post.objects.filter(pk=post_id).values_list("author_id", flat=True).first()
+    total = 0
+    if parent_author_id is not None:
+        total += notify([parent_author_id], Notification.KIND_REPLY, actor_id=actor_id, post_id=post_id,
+                        comment_id=comment_id)
+    if post_author_id != parent_author_id:
+        total += notify([post_author_id], Notification.KIND_COMMENT, actor_id=actor_id, post_id=post_id,
+                        comment_id=comment_id)
+    return total
+
+
+def discount_unread(notifications):
+    """
+    Уменьшение счётчиков непрочитанных получателей на кол-во непрочитанных уведомлений
+    запроса перед их удалением (одним UPDATE, строки счётчиков блокируются в порядке
+    id пользователей, как при рассылке)
+    :param notifications: запрос удаляемых уведомлений
+    """
+    unread = notifications.filter(is_read=False).order_by().values("recipient_id").annotate(count=Count("pk"))
+    counters = NotificationCounter.objects.filter(user_id__in=unread.values("recipient_id"))
+    if list(counters.order_by("user_id").select_for_update().values_list("user_id", flat=True)):
+        counters.update(unread=Greatest(
+            F("unread") - Subquery(unread.filter(recipient_id=OuterRef("user_id")).values("count")), 0
+        ))
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list("unread", flat=True).first() or 0
+
+
+def mark_all_read(user):
+    """
+    Отметка прочтения всех уведомлений пользователя
+
+    Счётчик уменьшается на кол-во отмеченных уведомлений (а не обнуляется): уведомления
+    параллельной рассылки, не попавшие в UPDATE, остаются непрочитанными в счётчике
+    :return: кол-во отмеченных уведомлений
+    """
+    with transaction.atomic():
+        list(NotificationCounter.objects.filter(user=user).select_for_update().values_list("user_id", flat=True))
+        updated = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user=user).update(unread=F("unread") - updated)
+    return updated
@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class CommentThreadPagination(CursorPagination):
+    """
+    Курсорная пагинация веток комментариев
+
+    Порядок по материализованному пути - порядок обхода дерева в глубину,
+    курсор не требует подсчёта общего кол-ва записей и смещения
+    """
+    ordering = "path"
+
+
+class NotificationPagination(CursorPagination):
+    """
+    Курсорная пагинация уведомлений пользователя
+
+    Порядок по убыванию id читается по индексу (recipient, id DESC), новые
+    уведомления не сдвигают следующие страницы
+    """
+    ordering = "-id"
+
+
+class TagCloudPagination(LimitOffsetPagination):
+    """
+    Пагинация облака тегов по кол-ву тегов (`?limit=`, `?offset=`)
+    """
+    default_limit = 100
+    max_limit = 1000
@@ -0,0 +1,148 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from content.models import Comment, Like
+from core.explain import explain, walk
+
+DEFAULTS = {
+    'COMMENT_MONTHS_AHEAD': 3,
+}
+
+COMMENT_TABLE = Comment._meta.db_table
+COMMENT_DEFAULT = COMMENT_TABLE + "_default"
+LIKE_TABLE = Like._meta.db_table
+
+
+def get_setting(name):
+    """
+    Получение параметра секционирования из `settings.PARTITIONING`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'PARTITIONING', {}).get(name, DEFAULTS[name])
+
+
+def month_start(moment):
+    return moment.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment):
+    return (moment.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def comment_partition_name(start):
+    return "%s_y%04dm%02d" % (COMMENT_TABLE, start.year, start.month)
+
+
+def list_partitions(table):
+    """
+    Секции таблицы
+    :return: список (имя секции, границы секции, оценка кол-ва строк) по имени
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples FROM pg_inherits AS i "
+            "JOIN pg_class AS c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        return [(name, bound, max(int(rows), 0)) for name, bound, rows in cursor.fetchall()]
+
+
+def create_comment_partition(start):
+    """
+    Создание секции комментариев за месяц
+
+    Строки месяца, попавшие в секцию по умолчанию, переносятся в новую секцию:
+    секция по умолчанию отсоединяется на время переноса (иначе создание секции
+    невозможно из-за нарушения её границ)
+    :param start: начало месяца (UTC)
+    :return: имя секции или None, если секция уже существует
+    """
+    name, end = comment_partition_name(start), next_month(start)
+    bound = "FOR VALUES FROM ('%s') TO ('%s')" % (start.isoformat(), end.isoformat())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if cursor.fetchone()[0]:
+            return None
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM "%s" WHERE "created_at" >= %%s AND "created_at" < %%s)'
+                       % COMMENT_DEFAULT, [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute('CREATE TABLE "%s" PARTITION OF "%s" %s' % (name, COMMENT_TABLE, bound))
+            return name
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")          # ALTER TABLE запрещён при отложенных проверках
+        cursor.execute('ALTER TABLE "%s" DETACH PARTITION "%s"' % (COMMENT_TABLE, COMMENT_DEFAULT))
+        cursor.execute('CREATE TABLE "%s" PARTITION OF "%s" %s' % (name, COMMENT_TABLE, bound))
+        cursor.execute('INSERT INTO "%s" SELECT * FROM "%s" WHERE "created_at" >= %%s AND "created_at" < %%s'
+                       % (name, COMMENT_DEFAULT), [start, end])
+        cursor.execute('DELETE FROM "%s" WHERE "created_at" >= %%s AND "created_at" < %%s' % COMMENT_DEFAULT,
+                       [start, end])
+        cursor.execute('ALTER TABLE "%s" ATTACH PARTITION "%s" DEFAULT' % (COMMENT_TABLE, COMMENT_DEFAULT))
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    return name
+
+
+def ensure_comment_partitions(since=None, until=None):
+    """
+    Создание месячных секций комментариев: за месяцы строк в секции по умолчанию
+    и от `since` (по умолчанию - текущий месяц) до `until` (по умолчанию -
+    `COMMENT_MONTHS_AHEAD` месяцев вперёд)
+    :return: список имён созданных секций
+    """
+    now = timezone.now()
+    start = month_start(since or now)
+    if until is None:
+        until = month_start(now)
+        for _ in range(get_setting('COMMENT_MONTHS_AHEAD')):
+            until = next_month(until)
+    else:
+        until = month_start(until)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT date_trunc('month', \"created_at\" AT TIME ZONE 'UTC') FROM \"%s\""
+                       % COMMENT_DEFAULT)
+        months = {month.replace(tzinfo=dt_timezone.utc) for month, in cursor.fetchall()}
+    while start <= until:
+        months.add(start)
+        start = next_month(start)
+    return [name for name in map(create_comment_partition, sorted(months)) if name is not None]
+
+
+def scanned_partitions(queryset, table):
+    """
+    Секции таблицы, читаемые планом запроса (без выполнения запроса)
+    :return: множество имён секций
+    """
+    sql, params = queryset.query.sql_with_params()
+    plan, _ = explain(sql, params, analyze=False)
+    names = {name for name, _, _ in list_partitions(table)}
+    return {node["Relation Name"] for node in walk(plan) if node.get("Relation Name") in names}
+
+
+def pruning_checks(post, user):
+    """
+    Проверка исключения секций из планов запросов лайков и комментариев поста
+    :param post: опубликованный пост
+    :param user: пользователь
+    :return: список (описание запроса, читаемые секции, лишние секции)
+    """
+    older = set()
+    if post.first_commented_at is not None:
+        older = {
+            name for name, _, _ in list_partitions(COMMENT_TABLE)
+            if name != COMMENT_DEFAULT and name < comment_partition_name(month_start(post.first_commented_at))
+        }
+    checks = [
+        ("like of post by user", Like.objects.filter(post=post, liked_by=user), LIKE_TABLE, 1, set()),
+        ("likes count of post", Like.objects.filter(post=post), LIKE_TABLE, 1, set()),
+        ("comments of post", Comment.objects.of_post(post), COMMENT_TABLE, None, older),
+    ]
+    results = []
+    for description, queryset, table, limit, excluded in checks:
+        scanned = scanned_partitions(queryset, table)
+        extra = scanned & excluded
+        if limit is not None and len(scanned) > limit:
+            extra = scanned
+        results.append((description, scanned, extra))
+    return results
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from content.models import Blog, Post
+from content.signals import posts_published
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'INTERVAL': 60,
+}
+
+
+def get_setting(name):
+    """
+    Получение параметра отложенной публикации из `settings.PUBLISHING`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'PUBLISHING', {}).get(name, DEFAULTS[name])
+
+
+def publish_posts(queryset, published_at=None):
+    """
+    Публикация неопубликованных постов из queryset одним пакетом
+
+    В одной транзакции: блокировка строк постов (занятые другим процессом
+    пропускаются), один UPDATE постов и один UPDATE `updated_at` и `latest_post`
+    затронутых блогов (последний пост блога в пакете, если он новее). Получатели
+    сигнала `posts_published` уведомляются один раз на пакет после фиксации.
+    :param queryset: посты для публикации
+    :param published_at: дата публикации (по умолчанию - запланированная `publish_at`
+     или текущая, если пост не запланирован)
+    :return: кол-во опубликованных постов
+    """
+    published_at = Value(published_at) if published_at is not None else Coalesce("publish_at", Value(timezone.now()))
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(is_published=False).order_by().select_for_update(skip_locked=True)
+            .values_list("pk", "blog_id")
+        )
+        if not rows:
+            return 0
+        post_ids = [pk for pk, _ in rows]
+        blog_ids = sorted({blog_id for _, blog_id in rows})
+        Post.objects.filter(pk__in=post_ids).update(is_published=True, created_at=published_at, publish_at=None)
+        latest = Post.objects.filter(pk__in=post_ids, blog=OuterRef("pk"))\
+            .order_by(F("created_at").desc(nulls_last=True), "-pk")
+        latest_at = Subquery(latest.values("created_at")[:1])
+        Blog.objects.filter(pk__in=blog_ids).update(
+            latest_post=Case(                    # пост пакета новее последнего поста блога
+                When(Q(latest_post__isnull=True) | Q(updated_at__isnull=True) | Q(updated_at__lte=latest_at),
+                     then=Subquery(latest.values("pk")[:1])),
+                default=F("latest_post"),
+            ),
+            updated_at=Greatest(F("updated_at"), latest_at),                       # NULL игнорируется
+        )
+        transaction.on_commit(lambda: posts_published.send(sender=Post, post_ids=post_ids, blog_ids=blog_ids))
+    return len(post_ids)
+
+
+def publish_due_posts(now=None, batch_size=None):
+    """
+    Публикация всех постов, время публикации которых наступило, пакетами по `BATCH_SIZE`
+    (каждый пакет - отдельная транзакция)
+    :param now: текущее время
+    :return: кол-во опубликованных постов
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    total = 0
+    while True:
+        due = Post.objects.filter(
+            pk__in=Post.objects.filter(is_published=False, publish_at__lte=now)
+            .order_by("publish_at", "pk").values("pk")[:batch_size]
+        )
+        published = publish_posts(due)
+        total += published
+        if published < batch_size:
+            return total
+
@@ -1,4 +1,7 @@
 from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import F, Prefetch
+from django.db.models.functions import Substr
 from django.utils import timezone
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
@@ -6,13 +9,19 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.fields import empty
 from taggit.serializers import TaggitSerializer, TagListSerializerField
 
-from content.models import Blog, Subscription, Post, Like, Comment
+from content.images import attach_image, media_url, thumbnail_urls, get_setting as get_image_setting
+from content.models import Blog, Subscription, Post, PostImage, Like, Comment, TagCount, Notification
+from content.publishing import publish_posts
 from content.utils import (
     generate_slug, slug_valid, only_exist_users, all_except_owner, all_except_blog_authors,
-    only_blog_authors, has_subscribed, was_liked, slug_valid_upd
+    only_blog_authors, slug_valid_upd, make_excerpt
 )
 
 
+INCLUDED_POSTS = 10                 # Кол-во встраиваемых постов блога
+INCLUDED_COMMENTS = 10              # Кол-во встраиваемых комментариев поста
+
+
 class SlugSerializer(serializers.Serializer):
     """
     Сериализатор создания двусоставных слагов
@@ -59,7 +68,260 @@ class SlugSerializer(serializers.Serializer):
         return validated_data
 
 
-class BlogSerializer(serializers.ModelSerializer):
+def get_root_param(serializer, name):
+    """
+    Значения параметра GET запроса, перечисленные через запятую
+    :param serializer: сериализатор (или элемент сериализатора списка) верхнего уровня
+    :param name: имя параметра
+    :return: множество значений или None для вложенного сериализатора и запросов записи
+    """
+    parent = serializer.parent
+    if isinstance(parent, serializers.ListSerializer):
+        parent = parent.parent
+    request = serializer.context.get("request")
+    if parent is not None or (request is not None and request.method != "GET"):
+        return None
+    params = getattr(request, "query_params", {})
+    return {value for value in params.get(name, "").split(",") if value}
+
+
+class SparseFieldsMixin:
+    """
+    Примесь выборочного вывода полей (`?fields=title,slug`, `?exclude=body`)
+
+     * параметры применяются к ответам GET и только к сериализатору верхнего уровня
+       (и элементам списка), вложенные сериализаторы выводятся целиком
+     * `Meta.list_exclude` - поля, не выводимые в списках без `?fields=`
+     * `optimize_queryset()` откладывает (`defer()`) чтение полей модели, которые
+       выводятся только невыводимыми полями
+    """
+    default_error_messages = {
+        "fields": _("Unknown fields: {names}."),
+    }
+
+    def get_known_names(self, names):
+        """
+        Имена, допустимые в `?fields=` и `?exclude=`
+        :param names: имена всех полей сериализатора
+        """
+        return set(names)
+
+    def get_sparse_names(self, names):
+        """
+        Имена выводимых полей по параметрам запроса
+        :param names: имена всех полей сериализатора
+        :return: множество имён выводимых полей или None (все поля)
+        """
+        fields, exclude = get_root_param(self, "fields"), get_root_param(self, "exclude")
+        if fields is None:
+            return None                                   # Вложенный сериализатор или запись
+        unknown = (fields | exclude) - self.get_known_names(names)
+        if unknown:
+            key_error = "fields"
+            raise ValidationError(
+                {"fields": [self.error_messages[key_error].format(names=", ".join(sorted(unknown)))]}, code=key_error
+            )
+        if fields:
+            return fields - exclude
+        if self.parent is not None:                       # Элемент списка
+            exclude |= set(getattr(getattr(self, "Meta", None), "list_exclude", ()))
+        return set(names) - exclude
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.get_sparse_names(fields)
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+    def get_deferred_fields(self, queryset):
+        """
+        Поля модели, нужные только невыводимым полям
+        (связи не откладываются: они могут читаться через `select_related`)
+        """
+        used, unused = set(), set()
+        for name, field in super().get_fields().items():
+            source = name if not field.source or field.source == "*" else field.source.split(".")[0]
+            (used if name in self.fields else unused).add(source)
+        deferrable = {
+            field.name for field in queryset.model._meta.concrete_fields
+            if not field.primary_key and not field.is_relation
+        }
+        return (unused - used) & deferrable
+
+    def optimize_queryset(self, queryset):
+        deferred = self.get_deferred_fields(queryset)
+        return queryset.defer(*sorted(deferred)) if deferred else queryset
+
+
+class IncludeMixin:
+    """
+    Примесь встраивания связанных объектов (`?include=blog,comments`)
+
+     * `get_include_fields()` - встраиваемые поля; поле с именем существующего поля
+       заменяет его (например, `author` - объект вместо имени пользователя)
+     * `include_related` - связи встраиваемых полей: строка - `select_related()`,
+       кортеж - `prefetch_related()` (`Prefetch` c ограниченным срезом queryset)
+     * встраиваются только в сериализатор верхнего уровня GET запроса, поэтому
+       ответ строится фиксированным кол-вом запросов
+     * имена встраиваемых полей допустимы в `?fields=` и `?exclude=`: встроенное
+       поле выводится и без упоминания в `?fields=`, `?exclude=` его исключает
+    """
+    include_related = {}
+    default_error_messages = {
+        "include": _("Unknown includes: {names}."),
+    }
+
+    def get_include_fields(self):
+        return {}
+
+    def get_include_names(self):
+        names = get_root_param(self, "include") or set()
+        unknown = names - set(self.include_related)
+        if unknown:
+            key_error = "include"
+            raise ValidationError(
+                {"include": [self.error_messages[key_error].format(names=", ".join(sorted(unknown)))]}, code=key_error
+            )
+        return names
+
+    def get_known_names(self, names):
+        return super().get_known_names(names) | set(self.include_related)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.get_include_names() - (get_root_param(self, "exclude") or set())
+        if names:
+            fields.update({name: field for name, field in self.get_include_fields().items() if name in names})
+        return fields
+
+    def include_queryset(self, queryset):
+        """
+        Чтение встраиваемых связей: `select_related()` / `prefetch_related()`
+        """
+        for name in sorted(self.get_include_names()):
+            related = self.include_related[name]
+            if isinstance(related, str):
+                queryset = queryset.select_related(related)
+            else:
+                queryset = queryset.prefetch_related(*related)
+        return queryset
+
+
+class ViewerFlagsListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка с флагами текущего пользователя
+
+    Флаги вычисляются до сериализации элементов для всей страницы сразу
+    (по одному запросу `IN` на флаг)
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        self.child.load_viewer_flags(instances)
+        try:
+            return [self.child.to_representation(instance) for instance in instances]
+        finally:
+            self.child.viewer_flags = None
+
+
+class ViewerFlagsMixin:
+    """
+    Примесь флагов текущего пользователя (`liked_by_me`, `is_subscribed`, ...)
+
+     * `viewer_flag_names` - имена флагов, для каждого определяется метод
+       `query_<имя>(user, ids)`, возвращающий id объектов с установленным флагом
+     * одиночный объект сериализуется с запросом флагов только для него
+     * для анонимного пользователя все флаги ложны (без запросов к бд)
+    """
+    viewer_flag_names = ()
+    viewer_flags = None
+
+    def load_viewer_flags(self, instances):
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        ids = [instance.pk for instance in instances]
+        flags = {}
+        if user is not None and user.is_authenticated and ids:
+            for name in self.viewer_flag_names:
+                if name in self.fields:                   # только выводимые флаги
+                    flags[name] = set(getattr(self, "query_" + name)(user, ids))
+        self.viewer_flags = flags
+
+    def get_viewer_flag(self, name, obj):
+        return obj.pk in self.viewer_flags.get(name, ())
+
+    def to_representation(self, instance):
+        if self.viewer_flags is not None:                 # флаги загружены сериализатором списка
+            return super().to_representation(instance)
+        self.load_viewer_flags([instance])
+        try:
+            return super().to_representation(instance)
+        finally:
+            self.viewer_flags = None
+
+
+class LatestPostSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор превью последнего поста блога
+    """
+    class Meta:
+        model = Post
+        fields = ("slug", "title", "created_at")
+        read_only_fields = ("slug", "title", "created_at")
+
+
+class IncludedUserSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор встраиваемого пользователя (`?include=author`)
+    """
+    class Meta:
+        model = User
+        fields = ("username", "first_name", "last_name")
+        read_only_fields = ("username", "first_name", "last_name")
+
+
+class IncludedBlogSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор встраиваемого блога поста (`?include=blog`)
+    """
+    class Meta:
+        model = Blog
+        fields = ("slug", "title", "description", "created_at", "updated_at")
+        read_only_fields = ("slug", "title", "description", "created_at", "updated_at")
+
+
+class IncludedPostSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор встраиваемого поста блога (`?include=posts`)
+    """
+    class Meta:
+        model = Post
+        fields = ("slug", "title", "created_at", "views", "comments_count")
+        read_only_fields = ("slug", "title", "created_at", "views", "comments_count")
+
+
+class PostImageSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор изображения поста (адреса исходного файла и миниатюр по размеру,
+    миниатюры - после генерации, `status` = `ready`)
+    """
+    url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+
+    def get_url(self, obj):
+        return media_url(obj.image.name, self.context.get("request"))
+
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj.thumbnails, self.context.get("request"))
+
+    class Meta:
+        model = PostImage
+        fields = ("id", "url", "width", "height", "status", "thumbnails")
+        read_only_fields = ("id", "url", "width", "height", "status", "thumbnails")
+
+
+class BlogSerializer(IncludeMixin, SparseFieldsMixin, ViewerFlagsMixin, serializers.ModelSerializer):
     """
     Основной сериализатор сущности блогов
 
@@ -68,6 +330,22 @@ class BlogSerializer(serializers.ModelSerializer):
     owner = serializers.SerializerMethodField()
     authors = serializers.SerializerMethodField()
     subscribes = serializers.SerializerMethodField()
+    is_subscribed = serializers.SerializerMethodField()
+    is_author = serializers.SerializerMethodField()
+    latest_post = LatestPostSerializer(read_only=True)
+    viewer_flag_names = ("is_subscribed", "is_author")
+    include_related = {
+        "posts": (                                  # Последние опубликованные посты блога
+            Prefetch(                               # по индексу (blog, created_at, id)
+                "post_set", to_attr="included_posts",
+                queryset=Post.objects.filter(is_published=True)
+                .order_by(F("created_at").desc(nulls_last=True), "-id")[:INCLUDED_POSTS],
+            ),
+        ),
+    }
+
+    def get_include_fields(self):
+        return {"posts": IncludedPostSerializer(source="included_posts", many=True, read_only=True)}
 
     @staticmethod
     def get_owner(obj):
@@ -81,11 +359,28 @@ class BlogSerializer(serializers.ModelSerializer):
     def get_subscribes(obj):
         return obj.total_subscribers
 
+    def get_is_subscribed(self, obj):
+        return self.get_viewer_flag("is_subscribed", obj)
+
+    def get_is_author(self, obj):
+        return self.get_viewer_flag("is_author", obj)
+
+    @staticmethod
+    def query_is_subscribed(user, ids):
+        return Subscription.objects.filter(user=user, blog_id__in=ids).values_list("blog_id", flat=True)
+
+    @staticmethod
+    def query_is_author(user, ids):
+        return Blog.authors.through.objects.filter(user=user, blog_id__in=ids).values_list("blog_id", flat=True)
+
     class Meta:
         model = Blog
-        fields = ("slug", "title", "description", "created_at", "updated_at", "subscribes", "authors", "owner")
-        read_only_fields = ("slug", "authors", "updated_at", "created_at", "subscribes", "authors", "owner")
+        fields = ("slug", "title", "description", "created_at", "updated_at", "latest_post", "subscribes", "authors",
+                  "owner", "is_subscribed", "is_author")
+        read_only_fields = ("slug", "authors", "updated_at", "latest_post", "created_at", "subscribes", "authors",
+                            "owner", "is_subscribed", "is_author")
         lookup_field = "slug"
+        list_serializer_class = ViewerFlagsListSerializer
 
 
 class CreateOrUpdateBlogSerializer(SlugSerializer, BlogSerializer):
@@ -183,47 +478,53 @@ class AuthorSerializer(serializers.Serializer):
 class SubscribeSerializer(serializers.Serializer):
     """
     Сериализатор подписок
+
+    Подписка и отписка идемпотентны: повторный запрос не изменяет данные
     """
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    default_error_messages = {
-        "subscribed": _("User has already subscribed."),
-        "unsubscribed": _("User had not been subscribed."),
-    }
-
-    def validate(self, attrs):
-        validated_data = super().validate(attrs)
-        if self.context["request"].method == "POST":
-            """ При подписке """
-            if has_subscribed(self.instance, validated_data["user"]):
-                key_error = "subscribed"     # Исключить уже оформленную подписку
-                raise ValidationError(
-                    {"user": [self.error_messages[key_error]]}, code=key_error
-                )
-        elif self.context["request"].method == "DELETE":
-            """ При отписке """
-            if not has_subscribed(self.instance, validated_data["user"]):
-                key_error = "unsubscribed"   # Исключить несуществующую подписку
-                raise ValidationError(
-                    {"user": [self.error_messages[key_error]]}, code=key_error
-                )
-        return validated_data
 
     def subscribe(self, validated_data):
-        return Subscription.objects.create(user=validated_data.get("user"), blog=self.instance)
+        return Subscription.objects.create_or_ignore(user=validated_data.get("user"), blog=self.instance)
 
     def unsubscribe(self, validated_data):
-        return Subscription.objects.get(user=validated_data.get("user"), blog=self.instance).delete()
+        return Subscription.objects.filter(user=validated_data.get("user"), blog=self.instance).delete()
 
 
-class PostSerializer(TaggitSerializer, serializers.ModelSerializer):
+class PostSerializer(IncludeMixin, SparseFieldsMixin, ViewerFlagsMixin, TaggitSerializer, serializers.ModelSerializer):
     """
     Основной сериализатор сущности постов
 
     Предполагает использование методами: retrieve, list, delete
+
+    В списках вместо `body` выводится отрывок `excerpt` (`?fields=...,body` - полный текст),
+    отрывок читается из бд аннотацией `body_head` без чтения поля `body` целиком
     """
     tags = TagListSerializerField()
+    images = PostImageSerializer(many=True, read_only=True)
     author = serializers.SerializerMethodField()
     likes = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    viewer_flag_names = ("liked_by_me", )
+    excerpt_length = 200
+    include_related = {
+        "blog": "blog",
+        "author": "author",
+        "comments": (                               # Последние комментарии поста по индексу (post, created_at),
+            Prefetch(                               # авторы - отдельным запросом: соединение в запросе
+                "comment_set", to_attr="included_comments",     # с окном нарушило бы порядок индекса
+                queryset=Comment.objects.order_by("-created_at")[:INCLUDED_COMMENTS],
+            ),
+            "included_comments__commented_by",
+        ),
+    }
+
+    def get_include_fields(self):
+        return {
+            "blog": IncludedBlogSerializer(read_only=True),
+            "author": IncludedUserSerializer(read_only=True),
+            "comments": CommentSerializer(source="included_comments", many=True, read_only=True),
+        }
 
     @staticmethod
     def get_likes(obj):
@@ -233,11 +534,41 @@ class PostSerializer(TaggitSerializer, serializers.ModelSerializer):
     def get_author(obj):
         return getattr(obj, obj.get_user_field_name()).username
 
+    def get_liked_by_me(self, obj):
+        return self.get_viewer_flag("liked_by_me", obj)
+
+    def get_excerpt(self, obj):
+        text = obj.body_head if hasattr(obj, "body_head") else obj.body
+        return make_excerpt(text, self.excerpt_length)
+
+    def get_deferred_fields(self, queryset):
+        deferred = super().get_deferred_fields(queryset)
+        if "excerpt" in self.fields and queryset.query.group_by is None:
+            deferred.add("body")                     # Отрывок из аннотации `body_head`
+        elif "excerpt" in self.fields:
+            deferred.discard("body")                 # В запросе с GROUP BY (сортировка по лайкам) аннотация
+        return deferred                              # вошла бы в группировку - отрывок из полного текста
+
+    def optimize_queryset(self, queryset):
+        if "excerpt" in self.fields and queryset.query.group_by is None:
+            queryset = queryset.annotate(body_head=Substr("body", 1, self.excerpt_length + 1))
+        if "images" in self.fields:
+            queryset = queryset.prefetch_related("images")
+        return super().optimize_queryset(queryset)
+
+    @staticmethod
+    def query_liked_by_me(user, ids):
+        return Like.objects.filter(liked_by=user, post_id__in=ids).values_list("post_id", flat=True)
+
     class Meta:
         model = Post
-        fields = ("slug", "title", "body", "is_published", "created_at", "likes", "views", "tags", "author")
-        read_only_fields = ("slug", "is_published", "created_at", "likes", "views", "author")
+        fields = ("slug", "title", "body", "excerpt", "is_published", "created_at", "likes", "views",
+                  "comments_count", "last_commented_at", "publish_at", "tags", "images", "author", "liked_by_me")
+        read_only_fields = ("slug", "is_published", "created_at", "likes", "views", "comments_count",
+                            "last_commented_at", "publish_at", "images", "author", "liked_by_me", "excerpt")
         lookup_field = "slug"
+        list_serializer_class = ViewerFlagsListSerializer
+        list_exclude = ("body", )
 
 
 class CreatePostSerializer(SlugSerializer, PostSerializer):
@@ -290,7 +621,11 @@ class UpdatePostSerializer(SlugSerializer, PostSerializer):
 class PublishPostSerializer(serializers.Serializer):
     """
     Сериализатор публикации поста
+
+    Без `publish_at` (или с прошедшей датой) пост публикуется сразу, иначе -
+    планируется и публикуется командой `publish_scheduled`
     """
+    publish_at = serializers.DateTimeField(required=False, allow_null=True)
     default_error_messages = {
         "published": _("Post had been already published."),
     }
@@ -306,56 +641,71 @@ class PublishPostSerializer(serializers.Serializer):
 
     def publish(self):
         post = self.instance
-        post.is_published = True
-        post.created_at = timezone.now()      # Добавление времени создания поста
-        post.save()
-        blog = Blog.objects.get(pk=post.blog.pk)
-        blog.updated_at = post.created_at     # Обновление даты последней публикации блога
-        blog.save()
+        publish_at = self.validated_data.get("publish_at")
+        if publish_at is not None and publish_at > timezone.now():
+            post.publish_at = publish_at          # Отложенная публикация
+            post.save(update_fields=["publish_at"])
+            return
+        publish_posts(Post.objects.filter(pk=post.pk), published_at=timezone.now())
 
 
 class LikeSerializer(serializers.Serializer):
     """
     Сериализатор лайков
+
+    Добавление и удаление лайка идемпотентны: повторный запрос не изменяет данные
     """
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+
+    def like(self, validated_data):
+        return Like.objects.create_or_ignore(post=self.instance, liked_by=validated_data.get("user"))
+
+    def remove_like(self, validated_data):
+        return Like.objects.filter(post=self.instance, liked_by=validated_data.get("user")).delete()
+
+
+class PostImageUploadSerializer(serializers.Serializer):
+    """
+    Сериализатор загрузки изображений поста (`multipart/form-data`, поле `image`
+    может повторяться для загрузки нескольких файлов)
+    """
+    image = serializers.ListField(child=serializers.FileField(), allow_empty=False)
     default_error_messages = {
-        "liked": _("That post had been already liked by this user."),
-        "no-like": _("That post had not been liked by this user."),
+        "limit": _("A post can not have more than {limit} images."),
+        "size": _("File {name} is larger than {limit} bytes."),
     }
 
-    def validate(self, attrs):
-        validated_data = super().validate(attrs)
-        if self.context["request"].method == "POST":
-            """ При лайке поста """
-            if was_liked(self.instance, validated_data["user"]):
-                key_error = "liked"      # Исключение существующего лайка
-                raise ValidationError(
-                    {"like": [self.error_messages[key_error]]}, code=key_error
-                )
-        if self.context["request"].method == "DELETE":
-            """ При удалении лайка """
-            if not was_liked(self.instance, validated_data["user"]):
-                key_error = "no-like"     # Исключение несуществующего лайка
-                raise ValidationError(
-                    {"like": [self.error_messages[key_error]]}, code=key_error
-                )
-        return validated_data
+    def check_rejected(self, names):
+        """
+        Ошибка для файлов, пропущенных обработчиком загрузки по размеру
+        """
+        if names:
+            key_error = "size"
+            limit = get_image_setting('MAX_UPLOAD_SIZE')
+            raise ValidationError(
+                {"image": [self.error_messages[key_error].format(name=name, limit=limit) for name in names]},
+                code=key_error
+            )
 
-    def like(self, validated_data):
-        return Like.objects.create(post=self.instance, liked_by=validated_data.get("user"))
+    def validate_image(self, files):
+        limit = get_image_setting('MAX_PER_POST')
+        if self.instance.images.count() + len(files) > limit:
+            key_error = "limit"
+            raise ValidationError(self.error_messages[key_error].format(limit=limit), code=key_error)
+        return files
 
-    def remove_like(self, validated_data):
-        return Like.objects.get(post=self.instance, liked_by=validated_data.get("user")).delete()
+    def attach(self, validated_data):
+        return [attach_image(self.instance, file) for file in validated_data.get("image")]
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Основной сериализатор сущности комментария
 
     Предполагает использование методами: retrieve, list, update, partial_update, delete
     """
     commented_by = serializers.SerializerMethodField()
+    depth = serializers.IntegerField(read_only=True)
 
     @staticmethod
     def get_commented_by(obj):
@@ -363,8 +713,18 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = ("body", "created_at", "post", "commented_by")
-        read_only_fields = ("created_at", "post", "commented_by")
+        fields = ("id", "body", "created_at", "post", "parent", "depth", "commented_by")
+        read_only_fields = ("id", "created_at", "post", "parent", "depth", "commented_by")
+
+
+class ThreadCommentSerializer(CommentSerializer):
+    """
+    Сериализатор корневого комментария ветки с кол-вом ответов
+    """
+    replies = serializers.IntegerField(source="replies_count", read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ("replies", )
 
 
 class CreateCommentSerializer(CommentSerializer):
@@ -376,11 +736,12 @@ class CreateCommentSerializer(CommentSerializer):
     default_error_messages = {
         "slug": _("Wrong post slug was provided."),
         "publish": _("Post had not been published yet."),
+        "parent": _("Parent comment belongs to another post."),
     }
 
     class Meta:
         model = Comment
-        fields = ("body", "post_slug", "commented_by")
+        fields = ("body", "post_slug", "parent", "commented_by")
 
     def validate(self, attrs):
         try:
@@ -396,5 +757,54 @@ class CreateCommentSerializer(CommentSerializer):
             raise ValidationError(
                 {"post_slug": [self.error_messages[key_error]]}, code=key_error
             )
+        parent = attrs.get("parent")
+        if parent is not None and parent.post_id != post.id:
+            key_error = "parent"                        # Исключение ответа на комментарий другого поста
+            raise ValidationError(
+                {"parent": [self.error_messages[key_error]]}, code=key_error
+            )
         validated_data = super().validate(attrs)
         return validated_data
+
+
+class TagCountSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Сериализатор счётчика использования тега
+
+    Предполагает использование методами: list
+    """
+    name = serializers.CharField(source="tag.name")
+    slug = serializers.CharField(source="tag.slug")
+
+    class Meta:
+        model = TagCount
+        fields = ("name", "slug", "posts")
+        read_only_fields = ("name", "slug", "posts")
+
+
+class TagSuggestionSerializer(SparseFieldsMixin, serializers.Serializer):
+    """
+    Сериализатор подсказки тега
+    """
+    name = serializers.CharField(read_only=True)
+    posts = serializers.IntegerField(read_only=True)
+
+
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Сериализатор уведомления пользователя
+
+    Предполагает использование методами: list
+    """
+    actor = serializers.SerializerMethodField()
+    post = serializers.SlugRelatedField(slug_field="slug", read_only=True)
+    post_title = serializers.CharField(source="post.title", read_only=True, default=None)
+
+    @staticmethod
+    def get_actor(obj):
+        return obj.actor.username if obj.actor is not None else None
+
+    class Meta:
+        model = Notification
+        fields = ("id", "kind", "actor", "post", "post_title", "comment_id", "is_read", "created_at")
+        read_only_fields = ("id", "kind", "actor", "post", "post_title", "comment_id", "is_read", "created_at")
@@ -1,24 +1,189 @@
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Case, When, Q
+from django.db.models.functions import Greatest, Least
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import Signal, receiver
 from django.contrib.auth.models import User
 
-from content.models import Blog
-from content.utils import generate_slug
+from content.images import delete_image_files
+from content.models import Blog, Post, PostImage, Comment, Like, TaggedPost, TagCount, Notification
+from content.notifications import discount_unread
+from content.streams import publish_comment, publish_like
+from content.suggest import tag_suggest
+from content.trending import record_activity, invalidate_trending
+from core.jobs import enqueue, enqueue_on_commit
+
+posts_published = Signal()          # пакет постов опубликован (аргументы: post_ids, blog_ids)
 
 
 @receiver(pre_save, sender=User)
 def handle_username_change(sender, instance, **kwargs):
     """
     Обработчик сигнала при изменении имени пользователя
-    для обновления слагов зависимых сущностей блогов
+    для отметки изменения (слаги блогов обновляются фоновой задачей после сохранения)
     """
     if instance.pk is not None:
-        try:
-            old_user = User.objects.get(pk=instance.pk)
-            if instance.username != old_user.username:
-                blogs = Blog.objects.filter(owner=old_user)
-                for blog in blogs:
-                    blog.slug = generate_slug(instance.username, blog.title)
-                    blog.save()
-        except User.DoesNotExist:
-            pass
+        old_username = User.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+        instance._username_changed = old_username is not None and old_username != instance.username
+
+
+@receiver(post_save, sender=User)
+def handle_username_changed(sender, instance, created, **kwargs):
+    """
+    Обработчик сигнала при сохранении пользователя с изменённым именем
+    для постановки задачи обновления слагов зависимых сущностей блогов (в той же транзакции)
+    """
+    if getattr(instance, "_username_changed", False):
+        instance._username_changed = False
+        enqueue("content.rewrite_blog_slugs", {"user_id": instance.pk})
+
+
+@receiver(post_save, sender=Post)
+def handle_post_save(sender, instance, created, **kwargs):
+    """
+    Обработчик сигнала при сохранении поста
+    для обновления последнего поста блога: создание опубликованного поста -
+    инкрементально, снятие с публикации последнего поста - пересчёт
+    """
+    if instance.is_published:
+        if created and instance.created_at is not None:
+            Blog.objects.filter(pk=instance.blog_id).filter(
+                Q(latest_post__isnull=True) | Q(updated_at__isnull=True) | Q(updated_at__lte=instance.created_at)
+            ).update(latest_post=instance.pk, updated_at=instance.created_at)
+    elif not created:
+        Blog.objects.filter(pk=instance.blog_id, latest_post=instance.pk).refresh_latest_post()
+
+
+@receiver(pre_delete, sender=Post)
+def handle_post_pre_delete(sender, instance, **kwargs):
+    """
+    Обработчик сигнала перед удалением поста (в т.ч. каскадным)
+    для уменьшения счётчиков непрочитанных уведомлений, удаляемых каскадно вместе с постом
+    """
+    discount_unread(Notification.objects.filter(post=instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def handle_post_delete(sender, instance, origin=None, **kwargs):
+    """
+    Обработчик сигнала при удалении поста (в т.ч. каскадном)
+    для пересчёта последнего поста блога, если удалён последний пост
+    """
+    if isinstance(origin, Blog) or getattr(origin, "model", None) is Blog:
+        return                                   # Блог удаляется вместе с постом
+    Blog.objects.filter(pk=instance.blog_id, latest_post=instance.pk).refresh_latest_post()
+
+
+@receiver(post_save, sender=Comment)
+def handle_comment_create(sender, instance, created, **kwargs):
+    """
+    Обработчик сигнала при создании комментария
+    для обновления счётчика и дат первого и последнего комментария поста
+    и постановки задачи уведомления авторов поста и родительского комментария и
+    уведомления потока событий поста после фиксации транзакции
+    """
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") + 1,
+            last_commented_at=Greatest("last_commented_at", instance.created_at),  # NULL игнорируется
+            first_commented_at=Least("first_commented_at", instance.created_at),
+        )
+        record_activity(instance.post_id, comments=1, at=instance.created_at)
+        enqueue_on_commit("content.notify_comment", {
+            "comment_id": instance.pk, "post_id": instance.post_id, "actor_id": instance.commented_by_id,
+            "parent_author_id": instance.parent.commented_by_id if instance.parent_id is not None else None,
+        })
+        transaction.on_commit(partial(publish_comment, instance))
+
+
+@receiver(post_delete, sender=Comment)
+def handle_comment_delete(sender, instance, origin=None, **kwargs):
+    """
+    Обработчик сигнала при удалении комментария (в т.ч. каскадном)
+    для обновления счётчика и даты последнего комментария поста
+    """
+    if isinstance(origin, (Post, Blog)) or getattr(origin, "model", None) in (Post, Blog):
+        return                                   # Пост удаляется вместе с комментарием
+    latest = Comment.objects.filter(post=instance.post_id).order_by().values("post").annotate(
+        latest=Max("created_at")
+    ).values("latest")
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F("comments_count") - 1, 0),
+        last_commented_at=Case(                  # Пересчёт только при удалении последнего комментария
+            When(last_commented_at__gt=instance.created_at, then=F("last_commented_at")),
+            default=latest,
+        ),
+    )
+    record_activity(instance.post_id, comments=-1, at=instance.created_at)
+
+
+@receiver(post_save, sender=TaggedPost)
+def handle_post_tag_add(sender, instance, created, **kwargs):
+    """
+    Обработчик сигнала при добавлении тега посту
+    для увеличения счётчика использования тега
+    """
+    if created:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO "{table}" ("tag_id", "posts") VALUES (%s, 1) '
+                'ON CONFLICT ("tag_id") DO UPDATE SET "posts" = "{table}"."posts" + 1'.format(
+                    table=TagCount._meta.db_table
+                ), [instance.tag_id]
+            )
+        transaction.on_commit(partial(tag_suggest.adjust, instance.tag_id, instance.tag.name, 1))
+
+
+@receiver(post_delete, sender=TaggedPost)
+def handle_post_tag_remove(sender, instance, **kwargs):
+    """
+    Обработчик сигнала при удалении тега поста (в т.ч. каскадном)
+    для уменьшения счётчика использования тега
+    """
+    TagCount.objects.filter(tag_id=instance.tag_id).update(posts=Greatest(F("posts") - 1, 0))
+    transaction.on_commit(partial(tag_suggest.adjust, instance.tag_id, None, -1))
+
+
+@receiver(post_save, sender=Like)
+def handle_like_create(sender, instance, created, **kwargs):
+    """
+    Обработчик сигнала при создании лайка
+    для обновления почасовой активности поста и потока событий поста
+    """
+    if created:
+        record_activity(instance.post_id, likes=1, at=instance.created_at)
+        transaction.on_commit(partial(publish_like, instance.post_id, 1))
+
+
+@receiver(post_delete, sender=Like)
+def handle_like_delete(sender, instance, origin=None, **kwargs):
+    """
+    Обработчик сигнала при удалении лайка
+    для обновления почасовой активности поста и потока событий поста
+    """
+    if isinstance(origin, (Post, Blog)) or getattr(origin, "model", None) in (Post, Blog):
+        return                                   # Пост удаляется вместе с лайком
+    record_activity(instance.post_id, likes=-1, at=instance.created_at)
+    transaction.on_commit(partial(publish_like, instance.post_id, -1))
+
+
+@receiver(post_delete, sender=PostImage)
+def handle_post_image_delete(sender, instance, **kwargs):
+    """
+    Обработчик сигнала при удалении изображения поста (в т.ч. каскадном)
+    для удаления файлов после фиксации транзакции, если на них не ссылаются другие изображения
+    """
+    transaction.on_commit(partial(delete_image_files, instance))
+
+
+@receiver(posts_published)
+def handle_posts_published(sender, post_ids, blog_ids, **kwargs):
+    """
+    Обработчик сигнала публикации пакета постов
+    для сброса кэша популярных постов (один раз на пакет) и постановки задачи
+    уведомления подписчиков блогов (сигнал отправляется после фиксации транзакции публикации)
+    """
+    invalidate_trending()
+    enqueue("content.fan_out_posts", {"post_ids": list(post_ids)})
@@ -0,0 +1,341 @@
+"""
+Потоки событий поста (Server-Sent Events) для ASGI
+
+Новые комментарии и изменения кол-ва отметок "нравится" публикуются после
+фиксации транзакции в брокер процесса, который рассылает их открытым потокам
+поста. С `BRIDGE` события передаются через PostgreSQL NOTIFY и рассылаются
+брокером каждого рабочего процесса, слушающего канал `CHANNEL`
+"""
+import asyncio
+import logging
+import re
+import select
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, connections
+from psycopg2 import sql
+from rest_framework.fields import DateTimeField
+
+from content.models import Post
+from core.querystats import recording_queries
+from core.renderers import OrjsonRenderer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BRIDGE': False,
+    'CHANNEL': 'content_streams',
+    'QUEUE_SIZE': 100,
+    'KEEPALIVE': 15,
+    'RETRY': 3000,
+    'POST_CACHE_TIMEOUT': 60,
+}
+
+STREAM_PATH = re.compile(r"^/api/v1/post/(?P<slug>[-\w]+)/stream/?$")
+LISTEN_TIMEOUT = 5                  # Проверка остановки слушателя, сек.
+
+renderer = OrjsonRenderer()
+_lookups = {}                       # слаг -> задача чтения id поста
+
+
+def get_setting(name):
+    """
+    Получение параметра потоков событий из `settings.STREAMS`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'STREAMS', {}).get(name, DEFAULTS[name])
+
+
+def encode_event(event, data):
+    """
+    Кадр события SSE (кодируется один раз для всех подписчиков)
+    :param event: имя события
+    :param data: JSON данных события (bytes)
+    """
+    return b"event: %s\ndata: %s\n\n" % (event.encode(), data)
+
+
+class Subscriber:
+    """
+    Подписчик потока поста: очередь кадров в цикле событий соединения
+
+    Кадры доставляются в цикл событий из любого потока брокером; при
+    переполнении очереди (клиент не успевает читать) очередь очищается и
+    соединение закрывается - клиент переподключается (`retry`)
+    """
+    def __init__(self, post_id, loop):
+        self.post_id = post_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=get_setting('QUEUE_SIZE'))
+
+    def deliver(self, frame):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            frame = None
+        self.queue.put_nowait(frame)
+
+
+def deliver(subscribers, frame):
+    for subscriber in subscribers:
+        subscriber.deliver(frame)
+
+
+class StreamBroker:
+    """
+    Брокер событий потоков постов процесса
+
+    Подписчики хранятся по id поста; простаивающий подписчик - корутина
+    соединения и пустая очередь, без потоков и соединений с бд
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}           # id поста -> множество подписчиков
+        self._listener = None
+
+    def subscribe(self, post_id):
+        subscriber = Subscriber(post_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(post_id, set()).add(subscriber)
+        if get_setting('BRIDGE'):
+            self.start_listener()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.post_id, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(subscriber.post_id, None)
+
+    def has_subscribers(self, post_id):
+        return post_id in self._subscribers
+
+    def count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, post_id, frame):
+        """
+        Рассылка кадра подписчикам поста процесса: один вызов
+        `call_soon_threadsafe` на цикл событий, а не на подписчика
+        :return: кол-во подписчиков
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(post_id, ()))
+        by_loop = {}
+        for subscriber in subscribers:
+            by_loop.setdefault(subscriber.loop, []).append(subscriber)
+        for loop, loop_subscribers in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, loop_subscribers, frame)
+            except RuntimeError:                    # Цикл событий соединений закрыт
+                for subscriber in loop_subscribers:
+                    self.unsubscribe(subscriber)
+        return len(subscribers)
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = NotifyListener(self)
+                self._listener.start()
+
+    def stop_listener(self, timeout=None):
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop.set()
+            listener.join(timeout)
+
+
+class NotifyListener(threading.Thread):
+    """
+    Поток процесса, слушающий канал NOTIFY событий потоков (`LISTEN`) на
+    отдельном соединении с бд и передающий события брокеру; при потере
+    соединения переподключается с увеличивающейся задержкой
+    """
+    def __init__(self, broker):
+        super().__init__(name="content-streams-listener", daemon=True)
+        self.broker = broker
+        self.stop = threading.Event()
+
+    def run(self):
+        delay = 1
+        while not self.stop.is_set():
+            try:
+                self.listen()
+            except Exception:
+                logger.exception("Stream listener failed, reconnecting in %d s", delay)
+                self.stop.wait(delay)
+                delay = min(delay * 2, 60)
+            else:
+                delay = 1
+
+    def listen(self):
+        database = connections['default']
+        listen_connection = database.get_new_connection(database.get_connection_params())
+        try:
+            listen_connection.autocommit = True
+            with listen_connection.cursor() as cursor:
+                cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(get_setting('CHANNEL'))))
+            while not self.stop.is_set():
+                if select.select([listen_connection], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+                listen_connection.poll()
+                while listen_connection.notifies:
+                    self.receive(listen_connection.notifies.pop(0).payload)
+        finally:
+            listen_connection.close()
+
+    def receive(self, payload):
+        post_id, event, data = payload.split(" ", 2)
+        if self.broker.has_subscribers(int(post_id)):
+            self.broker.dispatch(int(post_id), encode_event(event, data.encode()))
+
+
+stream_broker = StreamBroker()
+
+
+def publish(post_id, event, data):
+    """
+    Публикация события потока поста (вызывается после фиксации транзакции)
+
+    Без `BRIDGE` событие рассылается подписчикам процесса (и не сериализуется,
+    если их нет), с `BRIDGE` - отправляется в канал NOTIFY (события ограничены
+    длиной полей комментария, предел NOTIFY - 8000 байт)
+    :param post_id: id поста
+    :param event: имя события
+    :param data: данные события
+    """
+    if not get_setting('BRIDGE'):
+        if stream_broker.has_subscribers(post_id):
+            stream_broker.dispatch(post_id, encode_event(event, renderer.render(data)))
+        return
+    payload = b"%d %s %s" % (post_id, event.encode(), renderer.render(data))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [get_setting('CHANNEL'), payload.decode()])
+
+
+def publish_comment(comment):
+    """
+    Публикация нового комментария (поля как в `CommentSerializer`)
+    """
+    if not get_setting('BRIDGE') and not stream_broker.has_subscribers(comment.post_id):
+        return
+    publish(comment.post_id, "comment", {
+        "id": comment.pk,
+        "body": comment.body,
+        "created_at": DateTimeField().to_representation(comment.created_at),
+        "post": comment.post_id,
+        "parent": comment.parent_id,
+        "depth": comment.depth,
+        "commented_by": comment.commented_by.username,
+    })
+
+
+def publish_like(post_id, delta):
+    """
+    Публикация изменения кол-ва отметок "нравится" поста (+1, -1)
+    """
+    publish(post_id, "like", {"delta": delta})
+
+
+def find_post(slug):
+    close_old_connections()
+    try:
+        with recording_queries():
+            return Post.objects.filter(slug=slug, is_published=True).values_list("pk", flat=True).first()
+    finally:
+        close_old_connections()
+
+
+async def get_post_id(slug):
+    """
+    id опубликованного поста по слагу; найденный id кэшируется на
+    `POST_CACHE_TIMEOUT` сек., одновременные подключения к одному посту ждут
+    одного запроса - переподключение тысяч клиентов (перезапуск процесса) не
+    открывает соединение с бд на каждого
+    """
+    key = "content:stream-post:%s" % slug
+    post_id = await cache.aget(key)
+    if post_id is not None:
+        return post_id
+    lookup = _lookups.get(slug)
+    if lookup is None:
+        lookup = _lookups[slug] = asyncio.ensure_future(sync_to_async(find_post)(slug))
+        lookup.add_done_callback(lambda _: _lookups.pop(slug, None))
+    post_id = await asyncio.shield(lookup)
+    if post_id is not None:
+        await cache.aset(key, post_id, get_setting('POST_CACHE_TIMEOUT'))
+    return post_id
+
+
+async def send_response(send, status, body):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def post_stream(scope, receive, send, slug):
+    """
+    Поток событий опубликованного поста `text/event-stream`
+
+    Соединение держит корутина, ожидающая кадр очереди подписчика или отключение
+    клиента; при простое дольше `KEEPALIVE` сек. отправляется комментарий SSE
+    """
+    if scope["method"] != "GET":
+        return await send_response(send, 405, renderer.render({"detail": 'Method "%s" not allowed.' % scope["method"]}))
+    post_id = await get_post_id(slug)
+    if post_id is None:
+        return await send_response(send, 404, renderer.render({"detail": "Not found."}))
+    subscriber = stream_broker.subscribe(post_id)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    frame = None
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no"),
+        ]})
+        await send({"type": "http.response.body", "body": b"retry: %d\n\n" % get_setting('RETRY'), "more_body": True})
+        while True:
+            if frame is None:
+                frame = asyncio.ensure_future(subscriber.queue.get())
+            done, _ = await asyncio.wait({frame, disconnect}, timeout=get_setting('KEEPALIVE'),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                return
+            if frame in done:
+                body, frame = frame.result(), None
+                if body is None:                     # Очередь переполнена - клиент переподключится
+                    break
+            else:
+                body = b": keepalive\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        stream_broker.unsubscribe(subscriber)
+        for future in (frame, disconnect):
+            if future is not None:
+                future.cancel()
+
+
+def stream_router(application):
+    """
+    ASGI приложение: потоки событий постов (`/api/v1/post/<slug>/stream`),
+    остальные запросы - в приложение Django
+    """
+    async def router(scope, receive, send):
+        if scope["type"] == "http":
+            match = STREAM_PATH.match(scope["path"])
+            if match is not None:
+                return await post_stream(scope, receive, send, match["slug"])
+        return await application(scope, receive, send)
+    return router
@@ -0,0 +1,137 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Lower
+from taggit.models import Tag
+
+from content.models import TagCount
+from core.metrics import record_cache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MAX_TAGS': 200000,
+    'REBUILD_INTERVAL': 300,
+}
+
+
+def get_setting(name):
+    """
+    Получение параметра подсказок тегов из `settings.TAG_SUGGEST`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'TAG_SUGGEST', {}).get(name, DEFAULTS[name])
+
+
+def normalize(name):
+    return name.casefold()
+
+
+class TagSuggestIndex:
+    """
+    Индекс подсказок тегов процесса
+
+    Теги хранятся в отсортированном по нормализованному имени массиве: теги с
+    префиксом `q` занимают непрерывный диапазон `[bisect(q), bisect(q + '\\uffff'))`,
+    из которого выбираются наиболее используемые. Индекс строится по таблице
+    `TagCount` при первом обращении, обновляется после фиксации транзакций,
+    изменяющих счётчики, и полностью перестраивается не реже раза в
+    `REBUILD_INTERVAL` сек. (изменения в других процессах). При кол-ве тегов
+    больше `MAX_TAGS` индекс не строится и подсказки читаются из бд.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []                  # нормализованные имена (по возрастанию)
+        self._tags = []                  # [имя, кол-во постов] в порядке ключей
+        self._by_id = {}                 # id тега -> элемент `_tags`
+        self._built_at = None
+        self._oversized = False
+
+    def _expired(self):
+        return self._built_at is None or time.monotonic() - self._built_at >= get_setting('REBUILD_INTERVAL')
+
+    def rebuild(self):
+        rows = list(
+            TagCount.objects.filter(posts__gt=0)
+            .values_list("tag_id", "tag__name", "posts")[:get_setting('MAX_TAGS') + 1]
+        )
+        oversized = len(rows) > get_setting('MAX_TAGS')
+        rows = [] if oversized else sorted(rows, key=lambda row: (normalize(row[1]), row[1]))
+        with self._lock:
+            self._keys = [normalize(name) for _, name, _ in rows]
+            self._tags = [[name, posts] for _, name, posts in rows]
+            self._by_id = {tag_id: tag for (tag_id, _, _), tag in zip(rows, self._tags)}
+            self._oversized = oversized
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def adjust(self, tag_id, name, delta):
+        """
+        Изменение кол-ва постов тега (добавление нового тега в индекс)
+        :param tag_id: id тега
+        :param name: имя тега (необходимо только для нового тега)
+        :param delta: изменение кол-ва постов
+        """
+        with self._lock:
+            if self._built_at is None or self._oversized:
+                return
+            tag = self._by_id.get(tag_id)
+            if tag is not None:
+                tag[1] = max(tag[1] + delta, 0)
+            elif delta > 0 and name is not None:
+                tag = [name, delta]
+                index = bisect_left(self._keys, normalize(name))
+                self._keys.insert(index, normalize(name))
+                self._tags.insert(index, tag)
+                self._by_id[tag_id] = tag
+
+    def suggest(self, prefix, limit):
+        """
+        Наиболее используемые теги с префиксом
+        :param prefix: префикс имени тега
+        :param limit: кол-во подсказок
+        :return: список (имя, кол-во постов) или None, если индекс недоступен
+        """
+        if self._expired():
+            self.rebuild()
+        key = normalize(prefix)
+        with self._lock:
+            if self._oversized:
+                return None
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + "\uffff", lo=start)
+            best = heapq.nlargest(limit, range(start, end), key=lambda index: self._tags[index][1])
+            return [tuple(self._tags[index]) for index in best if self._tags[index][1] > 0]
+
+
+tag_suggest = TagSuggestIndex()
+
+
+def suggest_tags(prefix, limit):
+    """
+    Подсказки тегов по префиксу имени (без учёта регистра)
+
+    При недоступном индексе - запрос к бд по индексу `UPPER(name) text_pattern_ops`
+    :param prefix: префикс имени тега
+    :param limit: кол-во подсказок
+    :return: список (имя, кол-во постов)
+    """
+    if get_setting('ENABLED'):
+        result = tag_suggest.suggest(prefix, limit)
+        record_cache("tag_suggest", result is not None)
+        if result is not None:
+            return result
+    return list(
+        Tag.objects.filter(name__istartswith=prefix, usage__posts__gt=0)
+        .order_by(F("usage__posts").desc(), Lower("name"), "name")
+        .values_list("name", "usage__posts")[:limit]
+    )
@@ -0,0 +1,77 @@
+"""
+Фоновые задачи контента (`core.jobs`)
+"""
+from django.contrib.auth.models import User
+
+from content.deletion import PURGE_PRIORITY, purge_blog, purge_user
+from content.models import Blog, Post, Subscription
+from content.notifications import fan_out_batch, fan_out_batch_size, notify_comment
+from content.utils import generate_slug
+from core.jobs import task, enqueue, enqueue_many
+
+
+@task("content.fan_out_posts", batch=True)
+def fan_out_posts_job(payloads):
+    """
+    Постановка задач рассылки по опубликованным постам всех выбранных задач
+    (пакеты публикаций, выбранные рабочим процессом за раз, - одним INSERT)
+    """
+    post_ids = sorted({post_id for payload in payloads for post_id in payload["post_ids"]})
+    posts = Post.objects.filter(pk__in=post_ids, is_published=True).order_by("pk")\
+        .values_list("pk", "blog_id", "author_id")
+    enqueue_many("content.fan_out_batch", [
+        {"post_id": post_id, "blog_id": blog_id, "author_id": author_id} for post_id, blog_id, author_id in posts
+    ])
+
+
+@task("content.fan_out_batch")
+def fan_out_batch_job(payload):
+    """
+    Уведомление одного пакета подписчиков о публикации поста и постановка задачи
+    следующего пакета в той же транзакции: блокировки счётчиков держатся только
+    на время пакета, после ошибки повторяется только этот пакет
+    """
+    batch_size = payload.get("batch_size") or fan_out_batch_size(
+        Subscription.objects.filter(blog_id=payload["blog_id"]).count()
+    )
+    _, after = fan_out_batch(payload["post_id"], payload["blog_id"], payload["author_id"], batch_size,
+                             payload.get("after"))
+    if after is not None:
+        enqueue("content.fan_out_batch", {**payload, "batch_size": batch_size, "after": after})
+
+
+@task("content.notify_comment")
+def notify_comment_job(payload):
+    notify_comment(**payload)
+
+
+@task("content.rewrite_blog_slugs")
+def rewrite_blog_slugs_job(payload):
+    """
+    Обновление слагов блогов пользователя по текущему имени пользователя
+    """
+    username = User.objects.filter(pk=payload["user_id"]).values_list("username", flat=True).first()
+    if username is None:
+        return
+    for blog in Blog.objects.filter(owner_id=payload["user_id"]).only("pk", "slug", "title"):
+        slug = generate_slug(username, blog.title)
+        if blog.slug != slug:
+            Blog.objects.filter(pk=blog.pk).update(slug=slug)
+
+
+@task("content.purge_blog")
+def purge_blog_job(payload):
+    """
+    Удаление порции блога, отмеченного удалённым (следующая порция - следующей задачей)
+    """
+    if purge_blog(payload["blog_id"]):
+        enqueue("content.purge_blog", payload, priority=PURGE_PRIORITY)
+
+
+@task("content.purge_user")
+def purge_user_job(payload):
+    """
+    Удаление порции пользователя, отмеченного удалённым (следующая порция - следующей задачей)
+    """
+    if purge_user(payload["user_id"]):
+        enqueue("content.purge_user", payload, priority=PURGE_PRIORITY)
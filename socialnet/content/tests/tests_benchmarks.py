@@ -0,0 +1,22 @@
+from django.test import SimpleTestCase
+
+from content.benchmarks import cases  # noqa: F401 (регистрация бенчмарков)
+from content.benchmarks.runner import REGISTRY, find_regressions
+
+
+class BenchmarkTests(SimpleTestCase):
+    """
+    Тест кейс микробенчмарков
+
+    SimpleTestCase запрещает обращения к бд, поэтому тест также проверяет,
+    что бенчмарки выполняются только на данных в памяти
+    """
+    def test_benchmarks_run_in_memory(self):
+        for bench in REGISTRY:
+            with self.subTest(bench.name):
+                self.assertGreater(bench.measure(number=1, repeat=1), 0)
+
+    def test_find_regressions(self):
+        baseline = {"a": 100.0, "b": 100.0}
+        results = {"a": 120.0, "b": 130.0, "c": 500.0}
+        self.assertEqual(find_regressions(results, baseline, 0.25), [("b", 100.0, 130.0)])
@@ -1,9 +1,21 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
 
-from content.models import Blog, Subscription
+from content.models import Blog, Post, Subscription
+from content.publishing import publish_posts
+from content.serializers import BlogSerializer
+from content.values import BlogValuesSerializer
+from content.views import BlogViewSet
+from core.jobs import run_jobs
 
 User = get_user_model()
 
@@ -25,6 +37,62 @@ class BlogLogicTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get("count"), 2)
 
+    def test_list_blog_viewer_flags(self):
+        user = User.objects.get(username='blog_owner')
+        reader = User.objects.create_user(username='reader', password='reader')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        blog.authors.add(user)
+        Blog.objects.create(slug="blogowner-test1-blog", title="test1-blog", owner=user)
+        Subscription.objects.create(blog=blog, user=reader)
+        url = reverse('blog-list')
+        for viewer, subscribed, author in ((reader, {blog.slug}, set()), (user, set(), {blog.slug})):
+            self.client.force_authenticate(user=viewer)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path=url, format='json')
+            flag_queries = [query["sql"] for query in context.captured_queries
+                            if '"user_id" = %d' % viewer.pk in query["sql"]]
+            self.assertEqual(len(flag_queries), 2)       # по одному запросу на флаг для всей страницы
+            results = response.data["results"]
+            self.assertEqual({item["slug"] for item in results if item["is_subscribed"]}, subscribed)
+            self.assertEqual({item["slug"] for item in results if item["is_author"]}, author)
+
+    def test_list_blog_values_serializer(self):
+        user = User.objects.get(username='blog_owner')
+        reader = User.objects.create_user(username='reader', password='reader')
+        url = reverse('blog-list')
+        for i in range(6):
+            blog = Blog.objects.create(slug="blogowner-test-%d" % i, title="test-%d" % i, owner=user)
+            blog.authors.add(*(user, reader)[:i % 3])
+            if i % 2:
+                Subscription.objects.create(blog=blog, user=reader)
+            if i != 4:                                        # блог без постов - последним в порядке по умолчанию
+                post = Post.objects.create(slug="post-%d" % i, title="post-%d" % i, blog=blog, author=user)
+                publish_posts(Post.objects.filter(pk=post.pk), published_at=timezone.now() - timedelta(hours=i))
+
+        def get(params):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path=url, data=params, format='json')
+            return response.content, len(context.captured_queries)
+
+        for viewer in (None, reader):
+            self.client.force_authenticate(user=viewer)
+            for params in ({}, {"page": 2}, {"ordering": "-relevance"}, {"search": "test-1"}):
+                content, _ = get(params)
+                with mock.patch.object(BlogViewSet, "use_values_serializer", False):
+                    expected, _ = get(params)
+                self.assertEqual(content, expected)               # вывод совпадает побайтно
+        self.assertEqual(get({})[1], 8)        # кол-во, страница, авторы, посты, владельцы, подписчики и флаги
+
+    def test_values_serializer_fields(self):
+        user = User.objects.get(username='blog_owner')
+        Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        with mock.patch.object(BlogValuesSerializer, "to_representation", autospec=True,
+                               side_effect=BlogValuesSerializer.to_representation) as to_representation:
+            response = self.client.get(path=reverse('blog-list'), format='json')
+        self.assertTrue(to_representation.called)
+        serializer = BlogSerializer(many=True, context={"request": Request(response.wsgi_request)})
+        self.assertEqual(list(response.data["results"][0]), list(serializer.child.fields))  # поля не разошлись
+
     def test_create_blog(self):
         user = User.objects.get(username='blog_owner')
         url = reverse('blog-list')
@@ -56,6 +124,25 @@ class BlogDetailLogicTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get('slug'), 'blogowner-test-blog')
 
+    def test_retrieve_blog_include_posts(self):
+        blog, user = self.get_blog_user()
+        now = timezone.now()
+        for i in range(12):
+            Post.objects.create(slug="test-post-%d" % i, title="test-post", is_published=True, blog=blog,
+                                author=user, created_at=now - timedelta(hours=i))
+        Post.objects.create(slug="draft", title="draft", blog=blog, author=user)
+        url = reverse('blog-detail', kwargs={"slug": blog.slug})
+        with CaptureQueriesContext(connection) as plain:
+            response = self.client.get(path=url, format='json')
+        self.assertNotIn("posts", response.data)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path=url, data={"include": "posts"}, format='json')
+        self.assertEqual(len(context.captured_queries), len(plain.captured_queries) + 1)
+        self.assertEqual(len(response.data["posts"]), 10)       # ограниченное кол-во последних постов
+        self.assertEqual(response.data["posts"][0]["slug"], "test-post-0")
+        response = self.client.get(path=url, data={"include": "comments"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_update_blog(self):
         blog, user = self.get_blog_user()
         url = reverse('blog-detail', kwargs={"slug": blog.slug})
@@ -83,6 +170,16 @@ class BlogDetailLogicTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Blog.objects.count(), 0)
 
+    def test_username_change_rewrites_slugs(self):
+        blog, user = self.get_blog_user()
+        user.first_name = "Owner"
+        user.save()
+        user.username = "new_owner"
+        user.save()
+        self.assertEqual(Blog.objects.get().slug, "blogowner-test-blog")       # обновление - фоновой задачей
+        self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(Blog.objects.get().slug, "newowner-test-blog")
+
     def test_author_add_to_remove_from_blog(self):
         blog, user = self.get_blog_user()
         url = reverse('blog-author', kwargs={"slug": blog.slug})
@@ -116,6 +213,20 @@ class BlogDetailLogicTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Subscription.objects.count(), 0)
 
+    def test_subscribe_idempotent(self):
+        blog, user = self.get_blog_user()
+        url = reverse('blog-subscribe', kwargs={"slug": blog.slug})
+        subscriber = User.objects.create_user(username="subscriber", password="subscriber")
+        self.client.force_authenticate(user=subscriber)
+        for _ in range(2):
+            response = self.client.post(path=url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Subscription.objects.count(), 1)
+        for _ in range(2):
+            response = self.client.delete(path=url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Subscription.objects.count(), 0)
+
 
 class BlogPermissionsTests(APITestCase):
     """
@@ -196,3 +307,47 @@ class BlogPermissionsTests(APITestCase):
         exact_status = self.subtest_permission(self.client, auth_models, "POST", url, data)
         self.assertEqual(expect_status, exact_status)
 
+
+class BlogLatestPostTests(APITestCase):
+    """
+    Тест кейс на последний опубликованный пост блога
+    """
+    def setUp(self) -> None:
+        self.owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        self.blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.owner)
+        self.now = timezone.now()
+        self.posts = []
+        for i in range(3):
+            post = Post.objects.create(slug="post-%d" % i, title="post-%d" % i, blog=self.blog, author=self.owner)
+            publish_posts(Post.objects.filter(pk=post.pk), published_at=self.now - timedelta(hours=3 - i))
+            self.posts.append(post)
+
+    def assertLatest(self, post):
+        blog = Blog.objects.get()
+        self.assertEqual(blog.latest_post_id, post and post.pk)
+        self.assertEqual(blog.updated_at, post and Post.objects.get(pk=post.pk).created_at)
+
+    def test_publish(self):
+        self.assertLatest(self.posts[2])
+        older = Post.objects.create(slug="older", title="older", blog=self.blog, author=self.owner)
+        publish_posts(Post.objects.filter(pk=older.pk), published_at=self.now - timedelta(days=1))
+        self.assertLatest(self.posts[2])
+
+    def test_delete(self):
+        self.posts[0].delete()
+        self.assertLatest(self.posts[2])
+        self.posts[2].delete()
+        self.assertLatest(self.posts[1])
+        self.posts[1].delete()
+        self.assertLatest(None)
+
+    def test_unpublish(self):
+        post = self.posts[2]
+        post.is_published = False
+        post.save()
+        self.assertLatest(self.posts[1])
+
+    def test_list_preview(self):
+        response = self.client.get(path=reverse('blog-list'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["latest_post"]["slug"], "post-2")
@@ -1,9 +1,13 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from content.models import Blog, Post, Comment
+from content.publishing import publish_posts
 
 User = get_user_model()
 
@@ -98,3 +102,151 @@ class CommentLogicDetailTests(APITestCase):
         self.assertEqual(Comment.objects.count(), 0)
 
 
+class CommentThreadTests(APITestCase):
+    """
+    Тест кейс на логику веток комментариев
+    """
+    def setUp(self) -> None:
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        blog.authors.add(user)
+        self.post = Post.objects.create(slug="published-post" + "-" + hex(blog.id)[2:], title="published-post",
+                                        is_published=True, blog=blog, author=user)
+        self.user = user
+
+    def reply(self, parent=None, post=None):
+        return Comment.objects.create(body="reply", post=post or self.post, commented_by=self.user, parent=parent)
+
+    def test_create_reply(self):
+        root = self.reply()
+        self.client.force_authenticate(user=self.user)
+        data = {'body': 'test reply', 'post_slug': self.post.slug, 'parent': root.id}
+        response = self.client.post(path=reverse('comment-list'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reply = Comment.objects.get(body='test reply')
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(root.path))
+
+    def test_reply_to_other_post(self):
+        other = Post.objects.create(slug="other-post", title="other-post", is_published=True,
+                                    blog=self.post.blog, author=self.user)
+        root = self.reply(post=other)
+        self.client.force_authenticate(user=self.user)
+        data = {'body': 'test reply', 'post_slug': self.post.slug, 'parent': root.id}
+        response = self.client.post(path=reverse('comment-list'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_thread(self):
+        root = self.reply()
+        first = self.reply(root)
+        second = self.reply(root)
+        nested = self.reply(first)
+        self.reply()
+        url = reverse('comment-thread', kwargs={"pk": root.id})
+        with self.assertNumQueries(2):
+            response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data["results"]], [root.id, first.id, nested.id, second.id])
+        self.assertEqual([item["depth"] for item in response.data["results"]], [0, 1, 2, 1])
+
+    def test_thread_cursor_pagination(self):
+        root = self.reply()
+        parent = root
+        for _ in range(7):
+            parent = self.reply(parent)
+        url = reverse('comment-thread', kwargs={"pk": root.id})
+        response = self.client.get(path=url, format='json')
+        self.assertEqual(len(response.data["results"]), 5)
+        with self.assertNumQueries(2):
+            response = self.client.get(path=response.data["next"], format='json')
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertEqual(response.data["results"][-1]["id"], parent.id)
+
+    def test_threads_with_reply_counts(self):
+        first, second = self.reply(), self.reply()
+        self.reply(self.reply(first))
+        self.reply(second)
+        url = reverse('post-threads-list', kwargs={"slug": self.post.slug})
+        with self.assertNumQueries(2):
+            response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(item["id"], item["replies"]) for item in response.data["results"]],
+                         [(first.id, 2), (second.id, 1)])
+
+
+class CommentCountersTests(APITestCase):
+    """
+    Тест кейс на счётчики комментариев поста
+    """
+    def setUp(self) -> None:
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        blog.authors.add(user)
+        self.post = Post.objects.create(slug="published-post" + "-" + hex(blog.id)[2:], title="published-post",
+                                        is_published=True, blog=blog, author=user)
+        self.user = user
+
+    def test_counters_on_create_and_delete(self):
+        self.client.force_authenticate(user=self.user)
+        data = {'body': 'test comment body', 'post_slug': self.post.slug}
+        self.client.post(path=reverse('comment-list'), data=data, format='json')
+        first = Comment.objects.get()
+        self.client.post(path=reverse('comment-list'), data={**data, 'parent': first.id}, format='json')
+        second = Comment.objects.exclude(pk=first.pk).get()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(self.post.last_commented_at, second.created_at)
+        response = self.client.get(path=reverse('post-detail', kwargs={"slug": self.post.slug}), format='json')
+        self.assertEqual(response.data.get("comments_count"), 2)
+        self.client.delete(path=reverse('comment-detail', kwargs={"pk": first.id}), format='json')
+        self.post.refresh_from_db()                                     # Каскадно удалён и ответ
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertIsNone(self.post.last_commented_at)
+
+    def test_last_commented_at_recomputed(self):
+        first = Comment.objects.create(body="first", post=self.post, commented_by=self.user)
+        second = Comment.objects.create(body="second", post=self.post, commented_by=self.user)
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.last_commented_at, first.created_at)
+
+    def test_counters_on_user_cascade(self):
+        commenter = User.objects.create_user(username='commenter', password='commenter')
+        Comment.objects.create(body="own", post=self.post, commented_by=self.user)
+        Comment.objects.create(body="other", post=self.post, commented_by=commenter)
+        commenter.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_comments_after_republish(self):
+        Comment.objects.create(body="before", post=self.post, commented_by=self.user)
+        Post.objects.filter(pk=self.post.pk).update(is_published=False)            # снятие с публикации
+        publish_posts(Post.objects.filter(pk=self.post.pk), published_at=timezone.now() + timedelta(days=40))
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.created_at, self.post.first_commented_at)
+        for name in ('post-comments-list', 'post-threads-list'):
+            response = self.client.get(path=reverse(name, kwargs={"slug": self.post.slug}), format='json')
+            self.assertEqual([comment["body"] for comment in response.data["results"]], ["before"], name)
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_stale_save_keeps_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(body="comment", post=self.post, commented_by=self.user)
+        stale.views += 1
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.views, 1)
+
+    def test_ordering_by_activity(self):
+        other = Post.objects.create(slug="other-post", title="other-post", is_published=True,
+                                    blog=self.post.blog, author=self.user)
+        Comment.objects.create(body="old", post=self.post, commented_by=self.user)
+        Comment.objects.create(body="new", post=other, commented_by=self.user)
+        Post.objects.create(slug="silent-post", title="silent-post", is_published=True,
+                            blog=self.post.blog, author=self.user)
+        response = self.client.get(path=reverse('post-list'), data={"ordering": "-activity"}, format='json')
+        self.assertEqual([item["slug"] for item in response.data["results"]],
+                         ["other-post", self.post.slug, "silent-post"])
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from content.models import (
+    Blog, Post, Comment, Like, Subscription, TaggedPost, TagCount, Notification, NotificationCounter
+)
+from content.deletion import delete_comments_chunk
+from core.jobs import run_jobs
+from core.models import Job
+
+User = get_user_model()
+
+
+@override_settings(DELETION={'CHUNK_SIZE': 2})
+class DeletionTests(APITestCase):
+    """
+    Тест кейс на удаление блогов и пользователей (отметка удаления и удаление порциями)
+    """
+    def setUp(self) -> None:
+        self.owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        self.reader = User.objects.create_user(username='reader', password='reader')
+        self.blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.owner)
+        self.blog.authors.add(self.reader)
+        self.posts = [self.create_post(self.blog, "post%d" % i, self.owner) for i in range(3)]
+        for post in self.posts:
+            post.tags.add("python", "django")
+            Comment.objects.create(body="comment", post=post, commented_by=self.reader)
+            Like.objects.create(post=post, liked_by=self.reader)
+        Subscription.objects.create(blog=self.blog, user=self.reader)
+        Notification.objects.create(recipient=self.reader, kind=Notification.KIND_POST_PUBLISHED,
+                                    actor=self.owner, post=self.posts[0])
+        NotificationCounter.objects.create(user=self.reader, unread=1)
+
+    def create_post(self, blog, slug, author):
+        return Post.objects.create(slug=slug, title=slug, is_published=True, created_at=timezone.now(), blog=blog,
+                                   author=author)
+
+    def run_all_jobs(self):
+        runs = 0
+        while run_jobs()[0]:
+            runs += 1
+        return runs
+
+    def test_delete_blog(self):
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.delete(path=reverse('blog-detail', kwargs={"slug": self.blog.slug}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Blog.objects.exists())                         # скрыт сразу, удаляется задачей
+        self.assertEqual(Blog.all_objects.get().slug, "-deleted-%d" % self.blog.pk)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(Post.all_objects.count(), 3)
+        response = self.client.get(path=reverse('post-detail', kwargs={"slug": "post0"}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(path=reverse('blog-posts-list', kwargs={"slug": self.blog.slug}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(path=reverse('blog-list'), data={"title": "test-blog"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)  # слаг освобождён
+        # комментарии, лайки, уведомление, активность, 6 тегов, посты, подписка, автор - порциями по 2,
+        # удаление блога
+        self.assertEqual(self.run_all_jobs(), 2 + 2 + 1 + 2 + 3 + 2 + 1 + 1 + 1)
+        self.assertEqual(list(Blog.objects.values_list("slug", flat=True)), ["blogowner-test-blog"])
+        self.assertEqual(Blog.all_objects.count(), 1)
+        for model in (Post, Comment, Like, Subscription, TaggedPost, Notification):
+            self.assertFalse(model._base_manager.exists(), model)
+        self.assertEqual(list(TagCount.objects.values_list("posts", flat=True)), [0, 0])
+        self.assertEqual(NotificationCounter.objects.get(user=self.reader).unread, 0)
+        self.assertTrue(User.objects.filter(pk=self.reader.pk).exists())
+
+    def test_delete_user(self):
+        own_blog = Blog.objects.create(slug="reader-own-blog", title="own-blog", owner=self.reader)
+        self.create_post(own_blog, "own-post", self.reader)
+        authored = self.create_post(self.blog, "authored-post", self.reader)
+        Comment.objects.create(body="comment", post=authored, commented_by=self.owner)
+        root = Comment.objects.create(body="root", post=self.posts[0], commented_by=self.owner)
+        reply = Comment.objects.create(body="reply", post=self.posts[0], commented_by=self.reader, parent=root)
+        Comment.objects.create(body="reply to reply", post=self.posts[0], commented_by=self.owner, parent=reply)
+        Blog.objects.filter(pk=self.blog.pk).update(latest_post=authored)
+        token = Token.objects.create(user=self.reader)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.delete(path=reverse('user-me'), data={"current_password": "reader"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.objects.get(pk=self.reader.pk).is_active)
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(list(Blog.objects.values_list("pk", flat=True)), [self.blog.pk])
+        self.assertEqual(Job.objects.get().name, "content.purge_user")
+        self.run_all_jobs()
+        self.assertFalse(User.objects.filter(pk=self.reader.pk).exists())
+        self.assertEqual(Blog.all_objects.get(), self.blog)
+        self.assertEqual(set(Post.objects.values_list("slug", flat=True)), {"post0", "post1", "post2"})
+        self.assertEqual(list(Like.objects.values_list("liked_by", flat=True)), [None] * 3)   # обезличены
+        self.assertFalse(Subscription.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(self.blog.authors.exists())
+        self.assertEqual(list(Comment.objects.values_list("body", flat=True)), ["root"])   # с поддеревом ответа
+        counts = dict(Post.objects.values_list("slug", "comments_count"))
+        self.assertEqual(counts, {"post0": 1, "post1": 0, "post2": 0})
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.latest_post.slug, "post2")
+        self.assertEqual(Post.objects.get(slug="post0").last_commented_at, root.created_at)
+
+    def test_comment_subtree_chunks(self):
+        parent = Comment.objects.create(body="0", post=self.posts[1], commented_by=self.reader)
+        for depth in range(1, 5):                                       # ветка ответов глубиной 5
+            parent = Comment.objects.create(body=str(depth), post=self.posts[1], commented_by=self.owner,
+                                            parent=parent)
+        comments = Comment.objects.filter(commented_by=self.reader, post=self.posts[1])
+        remaining = []
+        while delete_comments_chunk(comments):
+            remaining.append(sorted(Comment.objects.filter(post=self.posts[1]).values_list("body", flat=True)))
+        self.assertEqual(remaining, [["0", "1", "2", "comment"], ["0", "comment"], []])   # по 2 строки, с глубоких
+        self.assertEqual(Post.objects.get(pk=self.posts[1].pk).comments_count, 0)
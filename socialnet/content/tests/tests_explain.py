@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from content.models import Blog, Post, Comment, Subscription
+
+User = get_user_model()
+
+
+class ExplainEndpointsCommandTests(TestCase):
+    """
+    Тест кейс проверки планов запросов конечных точек
+    """
+    def setUp(self) -> None:
+        owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=owner)
+        post = Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog, author=owner)
+        post.tags.add("python")
+        Comment.objects.create(body="comment", post=post, commented_by=owner)
+        Subscription.objects.create(blog=blog, user=owner)
+
+    def test_all_endpoints_explained(self):
+        out = StringIO()
+        call_command("explain_endpoints", stdout=out)
+        self.assertIn("21 endpoints checked, 0 sequential scans or sorts flagged", out.getvalue())
+        self.assertEqual(Post.objects.get().views, 0)    # изменения откатываются
+
+    def test_fail_on_flagged(self):
+        with self.assertRaises(CommandError):
+            call_command("explain_endpoints", "post-list", min_rows=0, fail=True, stdout=StringIO())
+
+    def test_empty_database(self):
+        Post.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command("explain_endpoints", stdout=StringIO())
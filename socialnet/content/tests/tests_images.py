@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+import content.images
+from content.images import get_pool, thumbnail_name
+from content.models import Blog, Post, PostImage
+from content.thumbnails import make_thumbnails
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(color, size=(64, 48), image_format="PNG", name="image.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/" + image_format.lower())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, POST_IMAGES={'WORKERS': 0, 'THUMBNAIL_SIZES': (16, 32), 'MAX_PER_POST': 3})
+class PostImageTests(APITestCase):
+    """
+    Тест кейс на загрузку изображений постов и миниатюры
+    """
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.user)
+        self.posts = [
+            Post.objects.create(slug="post-%d" % i, title="post", is_published=True, blog=blog, author=self.user)
+            for i in range(2)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self) -> None:
+        if content.images._pool is not None:        # Пул процессов модуля не переживает тест
+            content.images._pool.shutdown()
+            content.images._pool = None
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, post, *files):
+        url = reverse('post-images', kwargs={"slug": post.slug})
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path=url, data={"image": list(files)}, format='multipart')
+
+    def test_upload(self):
+        response = self.upload(self.posts[0], make_image("red"), make_image("blue"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([(item["width"], item["height"]) for item in response.data], [(64, 48), (64, 48)])
+        response = self.client.get(path=reverse('post-detail', kwargs={"slug": self.posts[0].slug}), format='json')
+        images = response.data["images"]
+        self.assertEqual([image["status"] for image in images], [PostImage.STATUS_READY] * 2)
+        self.assertEqual(list(images[0]["thumbnails"]), ["16", "32"])
+        self.assertTrue(images[0]["thumbnails"]["16"].startswith("http://testserver/media/posts/thumbnails/"))
+        image = PostImage.objects.get(pk=images[0]["id"])
+        with Image.open(default_storage.path(image.thumbnails["32"])) as thumbnail:
+            self.assertEqual(thumbnail.size, (32, 24))
+
+    def test_duplicates_share_files(self):
+        self.upload(self.posts[0], make_image("red"))
+        self.upload(self.posts[1], make_image("red", name="copy.png"))
+        first, second = PostImage.objects.order_by("id")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.thumbnails, second.thumbnails)
+        self.assertEqual(second.status, PostImage.STATUS_READY)
+        path = default_storage.path(first.image.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(path))), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[0].delete()
+        self.assertTrue(os.path.exists(path))                 # файл используется вторым постом
+        url = reverse('post-delete-image', kwargs={"slug": self.posts[1].slug, "image_id": second.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(path=url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(default_storage.path(first.thumbnails["16"])))
+
+    @override_settings(POST_IMAGES={'WORKERS': 0, 'MAX_UPLOAD_SIZE': 1024, 'MAX_PER_POST': 3})
+    def test_upload_invalid(self):
+        response = self.upload(self.posts[0], SimpleUploadedFile("image.png", b"not an image"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.upload(self.posts[0], make_image("red", size=(512, 512), image_format="BMP"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)     # больше MAX_UPLOAD_SIZE
+        self.assertIn("1024", str(response.data["image"][0]))
+        response = self.upload(self.posts[0], *[make_image(color) for color in ("red", "green", "blue", "white")])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)     # больше MAX_PER_POST
+        self.assertFalse(PostImage.objects.exists())
+        self.client.force_authenticate(user=User.objects.create_user(username='reader', password='reader'))
+        response = self.upload(self.posts[0], make_image("red"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_thumbnails_in_pool(self):
+        source = os.path.join(MEDIA_ROOT, "source.jpg")
+        os.makedirs(MEDIA_ROOT, exist_ok=True)
+        Image.new("RGB", (300, 100), "red").save(source, format="JPEG")
+        targets = [(size, default_storage.path(thumbnail_name("0" * 64, size, "JPEG"))) for size in (50, 150)]
+        with override_settings(POST_IMAGES={'WORKERS': 1}):
+            result = get_pool().submit(make_thumbnails, source, targets, "JPEG").result(timeout=60)
+        self.assertEqual(result, {50: (50, 17), 150: (150, 50)})
+        self.assertTrue(all(os.path.exists(path) for _, path in targets))
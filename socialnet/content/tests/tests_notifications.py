@@ -0,0 +1,160 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from content.models import Blog, Post, Comment, Subscription, Notification, NotificationCounter
+from content.notifications import fan_out_batch_size, fan_out_post
+from content.publishing import publish_posts
+from core.jobs import run_jobs
+from core.models import Job
+
+User = get_user_model()
+
+
+class NotificationTests(APITestCase):
+    """
+    Тест кейс на уведомления подписчиков о публикации и авторов о комментариях
+    """
+    def setUp(self) -> None:
+        self.owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        self.blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.owner)
+        self.subscribers = [User.objects.create_user(username='reader%d' % i, password='reader') for i in range(5)]
+        Subscription.objects.bulk_create([Subscription(blog=self.blog, user=user) for user in self.subscribers])
+        Subscription.objects.create(blog=self.blog, user=self.owner)      # автор не уведомляется о своём посте
+
+    def create_post(self, slug, is_published=False):
+        return Post.objects.create(slug=slug, title=slug, is_published=is_published, blog=self.blog, author=self.owner)
+
+    def unread(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get(path=reverse('notification-unread')).data["unread"]
+
+    def test_fan_out_on_publish(self):
+        post = self.create_post("draft")
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(path=reverse('post-publish', kwargs={"slug": post.slug}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Notification.objects.exists())             # рассылка - фоновой задачей
+        self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(list(Job.objects.values_list("name", flat=True)), ["content.fan_out_batch"])
+        self.assertEqual(run_jobs(), (1, 0))
+        notifications = Notification.objects.order_by("recipient_id")
+        self.assertEqual([item.recipient_id for item in notifications], [user.pk for user in self.subscribers])
+        self.assertTrue(all(item.kind == Notification.KIND_POST_PUBLISHED and item.post_id == post.pk
+                            and item.actor_id == self.owner.pk for item in notifications))
+        self.assertEqual(self.unread(self.subscribers[0]), 1)
+        self.assertEqual(self.unread(self.owner), 0)
+        self.client.force_authenticate(user=self.subscribers[0])
+        response = self.client.get(path=reverse('notification-list'))
+        self.assertEqual(response.data["results"][0]["post"], "draft")
+        self.assertEqual(response.data["results"][0]["actor"], "blog_owner")
+
+    def test_batch_size(self):
+        with override_settings(NOTIFICATIONS={'MAX_BATCH_SIZE': 1000}):
+            self.assertEqual(fan_out_batch_size(0), 1)
+            self.assertEqual(fan_out_batch_size(1000), 1000)
+            self.assertEqual(fan_out_batch_size(1500), 750)
+            self.assertEqual(fan_out_batch_size(2001), 667)
+        with override_settings(NOTIFICATIONS={'MAX_BATCH_SIZE': 2}):
+            post = self.create_post("published", is_published=True)
+            # подсчёт, 4 выборки подписчиков (последняя пустая), 3 пакета по 4 запроса
+            # и 2 запроса точки сохранения транзакции теста
+            with self.assertNumQueries(1 + 4 + 3 * (4 + 2)):
+                self.assertEqual(fan_out_post(post.pk, self.blog.pk, self.owner.pk), 5)
+        self.assertEqual(NotificationCounter.objects.filter(unread=1).count(), 5)
+
+    def test_publish_batch(self):
+        posts = [self.create_post("draft-%d" % i) for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_posts(Post.objects.filter(pk__in=[post.pk for post in posts]))
+        run_jobs()
+        self.assertEqual(run_jobs(), (3, 0))                    # задача рассылки на каждый пост
+        self.assertEqual(Notification.objects.count(), 15)
+        self.assertEqual(self.unread(self.subscribers[-1]), 3)
+
+    @override_settings(NOTIFICATIONS={'MAX_BATCH_SIZE': 4})
+    def test_job_per_batch(self):
+        post = self.create_post("draft")
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_posts(Post.objects.filter(pk=post.pk))
+        run_jobs()
+        self.assertEqual(run_jobs(), (1, 0))                    # 6 подписок - пакеты по 3, каждый - задачей
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(Job.objects.get().payload["batch_size"], 3)
+        self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(run_jobs(), (1, 0))                    # последний полный пакет - пустая выборка
+        self.assertFalse(Job.objects.exists())
+
+    def test_comments(self):
+        post = self.create_post("published", is_published=True)
+        reader, replier = self.subscribers[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(body="comment", post=post, commented_by=reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(body="reply", post=post, commented_by=replier, parent=comment)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(body="own reply", post=post, commented_by=self.owner, parent=comment)
+        self.assertEqual(run_jobs(), (3, 0))
+        received = sorted(Notification.objects.values_list("recipient__username", "kind", "actor__username"))
+        self.assertEqual(received, [
+            ("blog_owner", Notification.KIND_COMMENT, "reader0"),
+            ("blog_owner", Notification.KIND_COMMENT, "reader1"),
+            ("reader0", Notification.KIND_REPLY, "blog_owner"),
+            ("reader0", Notification.KIND_REPLY, "reader1"),
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(body="reply", post=post, commented_by=reader,
+                                   parent=Comment.objects.get(body="own reply"))
+        run_jobs()
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 3)     # ответ автору - один раз
+
+    def test_mark_read(self):
+        post = self.create_post("published", is_published=True)
+        user = self.subscribers[0]
+        for _ in range(3):
+            fan_out_post(post.pk, self.blog.pk, self.owner.pk)
+        self.assertEqual(self.unread(user), 3)
+        response = self.client.post(path=reverse('notification-read'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"unread": 0})
+        self.assertFalse(Notification.objects.filter(recipient=user, is_read=False).exists())
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 12)       # остальные подписчики
+        fan_out_post(post.pk, self.blog.pk, self.owner.pk)
+        self.assertEqual(self.unread(user), 1)
+
+    def test_post_delete(self):
+        post = self.create_post("published", is_published=True)
+        kept = self.create_post("kept", is_published=True)
+        user = self.subscribers[0]
+        fan_out_post(post.pk, self.blog.pk, self.owner.pk)
+        fan_out_post(kept.pk, self.blog.pk, self.owner.pk)
+        Notification.objects.filter(recipient=self.subscribers[1], post=post).update(is_read=True)
+        NotificationCounter.objects.filter(user=self.subscribers[1]).update(unread=1)
+        post.delete()                                           # уведомления удаляются каскадно
+        self.assertEqual(list(NotificationCounter.objects.values_list("unread", flat=True).distinct()), [1])
+        self.assertEqual(self.unread(user), 1)
+        self.client.post(path=reverse('notification-read'))
+        self.assertEqual(self.unread(user), 0)
+
+    def test_cursor_pagination(self):
+        post = self.create_post("published", is_published=True)
+        user = self.subscribers[0]
+        for _ in range(7):
+            fan_out_post(post.pk, self.blog.pk, self.owner.pk)
+        self.client.force_authenticate(user=user)
+        response = self.client.get(path=reverse('notification-list'))
+        ids = [item["id"] for item in response.data["results"]]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertNotIn("count", response.data)
+        fan_out_post(post.pk, self.blog.pk, self.owner.pk)      # новое уведомление не сдвигает страницы
+        response = self.client.get(path=response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertLess(response.data["results"][0]["id"], ids[-1])
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(path=reverse('notification-list')).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from content.models import Blog, Post, Comment, Like
+from content.partitioning import (
+    COMMENT_DEFAULT, COMMENT_TABLE, LIKE_TABLE, comment_partition_name, ensure_comment_partitions,
+    list_partitions, month_start, pruning_checks, scanned_partitions,
+)
+
+User = get_user_model()
+
+
+class PartitioningTests(TestCase):
+    """
+    Тест кейс секционирования лайков и комментариев
+    """
+    def setUp(self) -> None:
+        self.owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.owner)
+        self.post = Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog,
+                                        author=self.owner)
+        Post.objects.filter(pk=self.post.pk).update(created_at=timezone.now())
+        self.post.refresh_from_db()
+        Like.objects.create(post=self.post, liked_by=self.owner)
+        self.comment = Comment.objects.create(body="comment", post=self.post, commented_by=self.owner)
+
+    def test_tables_partitioned(self):
+        self.assertEqual(len(list_partitions(LIKE_TABLE)), 8)
+        names = [name for name, _, _ in list_partitions(COMMENT_TABLE)]
+        self.assertIn(COMMENT_DEFAULT, names)
+        self.assertIn(comment_partition_name(month_start(timezone.now())), names)
+
+    def test_like_pruned(self):
+        queryset = Like.objects.filter(post=self.post, liked_by=self.owner)
+        self.assertEqual(len(scanned_partitions(queryset, LIKE_TABLE)), 1)
+        self.assertEqual(self.post.total_likes, 1)
+
+    def test_comments_of_post_pruned(self):
+        ensure_comment_partitions(since=timezone.now() - timedelta(days=62))      # секции прошлых месяцев
+        self.post.refresh_from_db()                                               # дата первого комментария
+        scanned = scanned_partitions(Comment.objects.of_post(self.post), COMMENT_TABLE)
+        self.assertIn(comment_partition_name(month_start(self.post.first_commented_at)), scanned)
+        self.assertLess(len(scanned), len(list_partitions(COMMENT_TABLE)))
+        self.assertFalse([extra for _, _, extra in pruning_checks(self.post, self.owner) if extra])
+        self.assertEqual(list(Comment.objects.of_post(self.post)), [self.comment])
+
+    def test_rows_moved_from_default(self):
+        created_at = datetime(2001, 2, 3, tzinfo=dt_timezone.utc)
+        Comment.objects.filter(pk=self.comment.pk).update(created_at=created_at)   # строка в секцию по умолчанию
+        name = comment_partition_name(month_start(created_at))
+        self.assertIn(name, ensure_comment_partitions())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM "%s"' % COMMENT_DEFAULT)
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute('SELECT "id" FROM "%s"' % name)
+            self.assertEqual(cursor.fetchall(), [(self.comment.pk,)])
+        self.assertEqual(ensure_comment_partitions(), [])
+
+    def test_partitions_command(self):
+        out = StringIO()
+        call_command("partitions", check=True, stdout=out)
+        self.assertIn(COMMENT_DEFAULT, out.getvalue())
+        self.assertIn("like of post by user     1 partitions scanned", out.getvalue())
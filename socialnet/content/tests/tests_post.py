@@ -1,12 +1,25 @@
 import random
 import string
+from datetime import timedelta
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
 
-from content.models import Blog, Post
+from content.models import Blog, Post, PostImage, Comment, Like, PostActivity
+from content.publishing import publish_due_posts
+from content.serializers import PostSerializer
+from content.signals import posts_published
+from content.trending import record_activity
+from content.values import PostValuesSerializer
+from content.views import PostViewSet
 
 User = get_user_model()
 
@@ -35,6 +48,154 @@ class PostLogicTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data.get("count"), 2)
 
+    def test_list_post_liked_by_me(self):
+        blog, user = self.get_blog_user()
+        url = reverse('post-list')
+        for i in range(3):
+            post = Post.objects.create(slug="test-post-%d" % i, title="test-post", is_published=True,
+                                       blog=blog, author=user)
+        Like.objects.create(post=post, liked_by=user)
+        response = self.client.get(path=url, format='json')
+        self.assertFalse(any(item["liked_by_me"] for item in response.data["results"]))
+        self.client.force_authenticate(user=user)
+        response = self.client.get(path=url, format='json')
+        self.assertEqual([item["slug"] for item in response.data["results"] if item["liked_by_me"]],
+                         ["test-post-2"])
+
+    def test_list_post_flags_batched(self):
+        blog, user = self.get_blog_user()
+        url = reverse('post-list')
+        for i in range(5):
+            post = Post.objects.create(slug="test-post-%d" % i, title="test-post", is_published=True,
+                                       blog=blog, author=user)
+            Like.objects.create(post=post, liked_by=user)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(path=url, format='json')
+            return len(context.captured_queries)
+
+        anonymous = count_queries()
+        self.client.force_authenticate(user=user)
+        self.assertEqual(count_queries(), anonymous + 1)  # один запрос флага на страницу
+
+    def test_list_post_excerpt(self):
+        blog, user = self.get_blog_user()
+        body = "слово " * 100
+        post = Post.objects.create(slug="test-post", title="test-post", body=body, is_published=True, blog=blog,
+                                   author=user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path=reverse('post-list'), format='json')
+        item = response.data["results"][0]
+        self.assertNotIn("body", item)
+        self.assertTrue(item["excerpt"].endswith("…"))
+        self.assertLessEqual(len(item["excerpt"]), 201)
+        page_sql = next(query["sql"] for query in context.captured_queries if "LIMIT" in query["sql"])
+        self.assertNotIn(', "content_post"."body"', page_sql)    # в бд читается только начало текста
+        self.assertIn("SUBSTRING", page_sql)
+        response = self.client.get(path=reverse('post-detail', kwargs={"slug": post.slug}), format='json')
+        self.assertEqual(response.data["body"], body)
+
+    def test_list_post_sparse_fields(self):
+        blog, user = self.get_blog_user()
+        url = reverse('post-list')
+        Post.objects.create(slug="test-post", title="test-post", body="body", is_published=True, blog=blog, author=user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path=url, data={"fields": "slug,title,body"}, format='json')
+        self.assertEqual(response.data["results"], [{"slug": "test-post", "title": "test-post", "body": "body"}])
+        self.assertEqual(len(context.captured_queries), 2)        # кол-во и страница, без запросов полей-методов
+        self.assertNotIn("views", context.captured_queries[1]["sql"])
+        response = self.client.get(path=url, data={"exclude": "tags,excerpt,liked_by_me"}, format='json')
+        self.assertNotIn("tags", response.data["results"][0])
+        self.assertIn("likes", response.data["results"][0])
+        response = self.client.get(path=url, data={"fields": "slug,unknown"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_post_include(self):
+        blog, user = self.get_blog_user()
+        url = reverse('post-list')
+        reader = User.objects.create_user(username='reader', password='reader')
+
+        def count_queries(params):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path=url, data={"fields": "slug", **params}, format='json')
+            return len(context.captured_queries), response.data["results"]
+
+        for i in range(4):
+            post = Post.objects.create(slug="test-post-%d" % i, title="test-post", is_published=True, blog=blog,
+                                       author=user)
+            for j in range(12):
+                Comment.objects.create(body="comment %d" % j, post=post, commented_by=reader)
+            queries, results = count_queries({"include": "blog,author,comments"})
+            self.assertEqual(queries, count_queries({})[0] + 2)   # комментарии и их авторы для всей страницы
+        self.assertEqual(results[0]["blog"]["slug"], blog.slug)
+        self.assertEqual(results[0]["author"]["username"], user.username)
+        self.assertEqual(len(results[0]["comments"]), 10)
+        self.assertEqual(results[0]["comments"][0]["body"], "comment 11")
+        response = self.client.get(path=url, data={"include": "tags"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_post_include(self):
+        blog, user = self.get_blog_user()
+        post = Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog, author=user)
+        Comment.objects.create(body="comment", post=post, commented_by=user)
+        url = reverse('post-detail', kwargs={"slug": post.slug})
+        response = self.client.get(path=url, data={"include": "blog,comments"}, format='json')
+        self.assertEqual(response.data["author"], user.username)
+        self.assertEqual(response.data["blog"]["title"], blog.title)
+        self.assertEqual([comment["body"] for comment in response.data["comments"]], ["comment"])
+        response = self.client.get(path=url, data={"fields": "slug,comments", "include": "comments"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"slug", "comments"})
+        response = self.client.get(path=url, data={"exclude": "blog", "include": "blog,comments"}, format='json')
+        self.assertNotIn("blog", response.data)
+        self.assertIn("comments", response.data)
+
+    def test_list_post_values_serializer(self):
+        blog, user = self.get_blog_user()
+        url = reverse('post-list')
+        reader = User.objects.create_user(username='reader', password='reader')
+        for i in range(6):
+            post = Post.objects.create(slug="test-post-%d" % i, title="test-post", body="слово " * 40 * i,
+                                       is_published=True, created_at=timezone.now() - timedelta(hours=i), blog=blog,
+                                       author=user if i % 2 else reader, publish_at=timezone.now() if i == 3 else None)
+            post.tags.add("tag-%d" % (i % 3))
+            if i % 3 == 0:
+                PostImage.objects.create(post=post, image="posts/images/%d.png" % i, sha256="%064d" % i, width=10,
+                                         height=10, size=100, status=PostImage.STATUS_READY,
+                                         thumbnails={"480": "posts/thumbnails/%d_480.png" % i,
+                                                     "160": "posts/thumbnails/%d_160.png" % i})
+            for liker in (user, reader)[:i % 3]:
+                Like.objects.create(post=post, liked_by=liker)
+
+        def get(params):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path=url, data=params, format='json')
+            return response.content, len(context.captured_queries)
+
+        for viewer in (None, user):
+            self.client.force_authenticate(user=viewer)
+            for params in ({}, {"page": 2}, {"ordering": "-relevance"}, {"tags": "tag-1"}):
+                content, _ = get(params)
+                with mock.patch.object(PostViewSet, "use_values_serializer", False):
+                    expected, _ = get(params)
+                self.assertEqual(content, expected)               # вывод совпадает побайтно
+        self.assertEqual(get({})[1], 8)        # кол-во, страница, теги (2), изображения, лайки, авторы и флаг
+        content, _ = get({"fields": "slug"})                # выбор полей - основным сериализатором
+        with mock.patch.object(PostViewSet, "use_values_serializer", False):
+            expected, _ = get({"fields": "slug"})
+        self.assertEqual(content, expected)
+
+    def test_values_serializer_fields(self):
+        blog, user = self.get_blog_user()
+        Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog, author=user)
+        with mock.patch.object(PostValuesSerializer, "to_representation", autospec=True,
+                               side_effect=PostValuesSerializer.to_representation) as to_representation:
+            response = self.client.get(path=reverse('post-list'), format='json')
+        self.assertTrue(to_representation.called)
+        serializer = PostSerializer(many=True, context={"request": Request(response.wsgi_request)})
+        self.assertEqual(list(response.data["results"][0]), list(serializer.child.fields))  # поля не разошлись
+
     def test_list_post_my(self):
         blog, user = self.get_blog_user()
         url = reverse('user-posts-list')
@@ -140,6 +301,28 @@ class PostLogicDetailTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Post.objects.get().total_likes, 0)
 
+    def test_post_like_idempotent(self):
+        post, user = self.get_post_user()
+        url = reverse('post-like', kwargs={"slug": post.slug})
+        self.client.force_authenticate(user=user)
+        for _ in range(2):
+            response = self.client.post(path=url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get().total_likes, 1)
+        self.assertEqual(PostActivity.objects.get().likes, 1)
+        for _ in range(2):
+            response = self.client.delete(path=url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get().total_likes, 0)
+
+    def test_like_kept_after_user_delete(self):
+        post, user = self.get_post_user()
+        liker = User.objects.create_user(username='liker', password='liker')
+        Like.objects.create(post=post, liked_by=liker)
+        liker.delete()
+        self.assertEqual(Post.objects.get().total_likes, 1)
+        self.assertIsNone(Like.objects.get().liked_by)
+
 
 class PostPermissionsTests(APITestCase):
     """
@@ -196,7 +379,7 @@ class PostPermissionsTests(APITestCase):
                 post = Post.objects.get(slug=data.get("slug"))
                 response = client.delete(url, format='json')
                 if response.status_code == status.HTTP_204_NO_CONTENT:
-                    post.save()
+                    post.save(force_insert=True)
                 exact_responses.append(response)
         return exact_responses
 
@@ -295,3 +478,154 @@ class PostPermissionsTests(APITestCase):
                          status.HTTP_204_NO_CONTENT]
         responses = self.subtest_permission(self.client, auth_models, "POST-PUB", url, data)
         self.assertEqual([obj.status_code for obj in responses], expect_status)
+
+
+class PostTagsTests(APITestCase):
+    """
+    Тест кейс на фильтрацию постов по тегам и облако тегов
+    """
+    def setUp(self) -> None:
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        for slug, tags in (("first", ["python", "django"]), ("second", ["python"]), ("third", ["docker"])):
+            post = Post.objects.create(slug=slug, title=slug, is_published=True, blog=blog, author=user)
+            post.tags.add(*tags)
+
+    def filter_slugs(self, data):
+        response = self.client.get(path=reverse('post-list'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item["slug"] for item in response.data["results"])
+
+    def test_filter_any(self):
+        self.assertEqual(self.filter_slugs({"tags": ["python", "docker"]}), ["first", "second", "third"])
+        self.assertEqual(self.filter_slugs({"tags": ["unknown"]}), [])
+
+    def test_filter_all(self):
+        self.assertEqual(self.filter_slugs({"tags": ["python", "django"], "tags_match": "all"}), ["first"])
+        self.assertEqual(self.filter_slugs({"tags": ["python", "unknown"], "tags_match": "all"}), [])
+
+    def test_tag_cloud(self):
+        url = reverse('tag-list')
+        response = self.client.get(path=url, format='json')
+        self.assertEqual([(item["name"], item["posts"]) for item in response.data["results"]],
+                         [("python", 2), ("django", 1), ("docker", 1)])
+        Post.objects.get(slug="first").tags.remove("python")
+        Post.objects.get(slug="third").delete()
+        Post.objects.get(slug="second").tags.add("django")
+        response = self.client.get(path=url, format='json')
+        self.assertEqual([(item["name"], item["posts"]) for item in response.data["results"]],
+                         [("django", 2), ("python", 1)])
+
+
+class PostTrendingTests(APITestCase):
+    """
+    Тест кейс на популярные посты
+    """
+    def setUp(self) -> None:
+        cache.clear()
+        owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=owner)
+        for slug in ("fresh", "old", "draft"):
+            Post.objects.create(slug=slug, title=slug, is_published=slug != "draft", blog=blog, author=owner)
+        self.users = [User.objects.create_user(username='user%d' % i, password='user') for i in range(3)]
+
+    def trending(self):
+        response = self.client.get(path=reverse('post-trending'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["slug"] for item in response.data]
+
+    def test_activity_recorded(self):
+        post = Post.objects.get(slug="fresh")
+        self.client.force_authenticate(user=self.users[0])
+        self.client.post(path=reverse('post-like', kwargs={"slug": post.slug}), format='json')
+        self.client.post(path=reverse('comment-list'), data={'body': 'comment', 'post_slug': post.slug}, format='json')
+        self.client.get(path=reverse('post-detail', kwargs={"slug": post.slug}), format='json')
+        activity = PostActivity.objects.get(post=post)
+        self.assertEqual((activity.likes, activity.comments, activity.views), (1, 1, 1))
+        self.client.delete(path=reverse('post-like', kwargs={"slug": post.slug}), format='json')
+        activity.refresh_from_db()
+        self.assertEqual(activity.likes, 0)
+
+    def test_time_decay(self):
+        fresh, old, draft = (Post.objects.get(slug=slug) for slug in ("fresh", "old", "draft"))
+        now = timezone.now()
+        record_activity(fresh.pk, likes=1, at=now)
+        record_activity(old.pk, likes=2, at=now - timedelta(hours=36))    # 2 * 0.5^3 < 1
+        record_activity(old.pk, likes=100, at=now - timedelta(hours=100))  # вне окна
+        record_activity(draft.pk, likes=100, at=now)
+        self.assertEqual(self.trending(), ["fresh", "old"])
+
+    def test_cached(self):
+        post = Post.objects.get(slug="fresh")
+        for user in self.users:
+            Like.objects.create(post=post, liked_by=user)
+        self.assertEqual(self.trending(), ["fresh"])
+        record_activity(Post.objects.get(slug="old").pk, likes=10)
+        with self.assertNumQueries(3):                   # посты, теги и изображения, без расчёта популярности
+            self.assertEqual(self.trending(), ["fresh"])
+
+
+class PostPublishingTests(APITestCase):
+    """
+    Тест кейс на отложенную публикацию постов
+    """
+    def setUp(self) -> None:
+        self.owner = User.objects.create_user(username='blog_owner', password='blog_owner')
+        self.blogs = [Blog.objects.create(slug="blog-%d" % i, title="blog-%d" % i, owner=self.owner) for i in range(2)]
+        self.now = timezone.now()
+        self.batches = []
+        posts_published.connect(self.on_published)
+        self.addCleanup(posts_published.disconnect, self.on_published)
+
+    def on_published(self, sender, post_ids, blog_ids, **kwargs):
+        self.batches.append((sorted(post_ids), blog_ids))
+
+    def create_post(self, slug, blog, publish_at=None):
+        return Post.objects.create(slug=slug, title=slug, blog=blog, author=self.owner, publish_at=publish_at)
+
+    def test_schedule_post(self):
+        post = self.create_post("scheduled", self.blogs[0])
+        publish_at = self.now + timedelta(hours=1)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(path=reverse('post-publish', kwargs={"slug": post.slug}),
+                                    data={"publish_at": publish_at.isoformat()}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        post.refresh_from_db()
+        self.assertFalse(post.is_published)
+        self.assertEqual(post.publish_at, publish_at)
+
+    def test_publish_now(self):
+        post = self.create_post("scheduled", self.blogs[0], publish_at=self.now + timedelta(hours=1))
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(path=reverse('post-publish', kwargs={"slug": post.slug}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        post.refresh_from_db()
+        self.assertTrue(post.is_published)
+        self.assertIsNone(post.publish_at)
+        self.assertEqual(Blog.objects.get(pk=self.blogs[0].pk).updated_at, post.created_at)
+        self.assertEqual(self.batches, [([post.pk], [self.blogs[0].pk])])
+
+    def test_publish_due_in_batches(self):
+        first, second = self.blogs
+        due = [
+            self.create_post("due-1", first, self.now - timedelta(minutes=30)),
+            self.create_post("due-2", first, self.now - timedelta(minutes=10)),
+            self.create_post("due-3", second, self.now - timedelta(minutes=20)),
+        ]
+        future = self.create_post("future", second, self.now + timedelta(minutes=10))
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(10):              # 2 пакета: точки сохранения, блокировка, посты, блоги
+                self.assertEqual(publish_due_posts(now=self.now, batch_size=2), 3)
+        self.assertEqual(self.batches, [(sorted([due[0].pk, due[2].pk]), [first.pk, second.pk]),
+                                        ([due[1].pk], [first.pk])])
+        for post in due:
+            publish_at = post.publish_at
+            post.refresh_from_db()
+            self.assertTrue(post.is_published)
+            self.assertEqual(post.created_at, publish_at)  # дата публикации - запланированная
+            self.assertIsNone(post.publish_at)
+        self.assertEqual(Blog.objects.get(pk=first.pk).updated_at, self.now - timedelta(minutes=10))
+        self.assertEqual(Blog.objects.get(pk=second.pk).updated_at, self.now - timedelta(minutes=20))
+        self.assertFalse(Post.objects.get(pk=future.pk).is_published)
+        self.assertEqual(publish_due_posts(now=self.now), 0)
@@ -0,0 +1,48 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from content.models import Blog, Post, Like, Comment, Subscription
+
+User = get_user_model()
+
+
+class SeedCommandTests(TestCase):
+    """
+    Тест кейс загрузки синтетических данных
+    """
+    def seed(self, **options):
+        options = {"users": 20, "blogs": 3, "posts": 20, "likes": 50, "comments": 20, "subscriptions": 10,
+                   "tags": 5, "seed": 1, "until": "2024-01-01", **options}
+        call_command("seed", stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(User.objects.filter(username__startswith="seed_").values_list("username", "date_joined")),
+            list(Post.objects.order_by("id").values_list("slug", "title", "created_at", "views", "blog_id")),
+            list(Like.objects.order_by("id").values_list("post_id", "liked_by_id")),
+        )
+
+    def test_seed_loads_data(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(username__startswith="seed_").count(), 20)
+        self.assertEqual(Blog.objects.count(), 3)
+        self.assertTrue(Post.objects.exists())
+        self.assertTrue(Like.objects.exists() and Comment.objects.exists() and Subscription.objects.exists())
+        self.assertFalse(Like.objects.values("post", "liked_by").annotate(n=Count("id")).filter(n__gt=1).exists())
+        user = User.objects.create_user(username="after_seed", password="after_seed")    # последовательности сброшены
+        self.assertGreater(user.pk, User.objects.filter(username__startswith="seed_").order_by("pk").last().pk)
+
+    def test_seed_is_deterministic(self):
+        self.seed()
+        first = self.snapshot()
+        User.objects.filter(username__startswith="seed_").delete()
+        Blog.objects.all().delete()
+        self.seed()
+        second = self.snapshot()
+        self.assertEqual([row[1:] for row in first[0]], [row[1:] for row in second[0]])
+        self.assertEqual([row[:4] for row in first[1]], [row[:4] for row in second[1]])
+        self.assertEqual(len(first[2]), len(second[2]))
@@ -0,0 +1,102 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from content.models import Blog, Post, Comment, Like
+from content.serializers import CommentSerializer
+from content.streams import stream_broker
+from core.renderers import OrjsonRenderer
+from socialnet.asgi import application
+
+User = get_user_model()
+
+
+def stream_scope(slug, method="GET"):
+    return {"type": "http", "method": method, "path": "/api/v1/post/%s/stream" % slug, "query_string": b"",
+            "headers": [], "http_version": "1.1", "scheme": "http", "server": ("testserver", 80)}
+
+
+class PostStreamTests(TransactionTestCase):
+    """
+    Тест кейс на потоки событий поста (SSE)
+
+    Приложение потока читает пост в другом потоке, поэтому данные фиксируются
+    (`TransactionTestCase`)
+    """
+    def setUp(self) -> None:
+        cache.clear()                                   # id постов кэшируются по слагу
+        self.user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=self.user)
+        self.post = Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog,
+                                        author=self.user)
+        Post.objects.create(slug="draft-post", title="draft-post", is_published=False, blog=blog, author=self.user)
+
+    async def connect(self, slug="test-post"):
+        communicator = ApplicationCommunicator(application, stream_scope(slug))
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output(timeout=5)
+        return communicator, start
+
+    async def receive_body(self, communicator):
+        return (await communicator.receive_output(timeout=5))["body"]
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(timeout=5)
+
+    async def test_comment_and_like_events(self):
+        communicator, start = await self.connect()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertEqual(await self.receive_body(communicator), b"retry: 3000\n\n")
+        self.assertEqual(stream_broker.count(), 1)
+        comment = await sync_to_async(Comment.objects.create)(body="comment", post=self.post, commented_by=self.user)
+        data = OrjsonRenderer().render(await sync_to_async(lambda: CommentSerializer(comment).data)())
+        self.assertEqual(await self.receive_body(communicator), b"event: comment\ndata: %s\n\n" % data)
+        like = await sync_to_async(Like.objects.create)(post=self.post, liked_by=self.user)
+        self.assertEqual(await self.receive_body(communicator), b'event: like\ndata: {"delta":1}\n\n')
+        await sync_to_async(like.delete)()
+        self.assertEqual(await self.receive_body(communicator), b'event: like\ndata: {"delta":-1}\n\n')
+        await self.disconnect(communicator)
+        self.assertEqual(stream_broker.count(), 0)
+
+    async def test_keepalive_and_overflow(self):
+        with override_settings(STREAMS={'KEEPALIVE': 0.1, 'QUEUE_SIZE': 2}):
+            communicator, _ = await self.connect()
+            await self.receive_body(communicator)
+            self.assertEqual(await self.receive_body(communicator), b": keepalive\n\n")
+        for i in range(3):                              # клиент не читает - очередь переполняется
+            stream_broker.dispatch(self.post.pk, b"event: test\ndata: %d\n\n" % i)
+        message = await communicator.receive_output(timeout=5)
+        if message["body"] == b": keepalive\n\n":       # ожидание с интервалом 0.1 сек. до выхода из настроек
+            message = await communicator.receive_output(timeout=5)
+        self.assertEqual(message, {"type": "http.response.body", "body": b""})
+        await communicator.wait(timeout=5)
+        self.assertEqual(stream_broker.count(), 0)
+
+    async def test_not_found(self):
+        for slug in ("missing-post", "draft-post"):
+            communicator, start = await self.connect(slug)
+            self.assertEqual(start["status"], 404)
+            await communicator.wait(timeout=5)
+        communicator = ApplicationCommunicator(application, stream_scope("test-post", method="POST"))
+        await communicator.send_input({"type": "http.request", "body": b""})
+        self.assertEqual((await communicator.receive_output(timeout=5))["status"], 405)
+
+    @override_settings(STREAMS={'BRIDGE': True})
+    async def test_notify_bridge(self):
+        self.addCleanup(stream_broker.stop_listener, 10)
+        communicator, _ = await self.connect()
+        await self.receive_body(communicator)
+        await asyncio.sleep(0.5)                        # LISTEN слушателя
+        await sync_to_async(Comment.objects.create)(body="комментарий", post=self.post, commented_by=self.user)
+        body = await self.receive_body(communicator)
+        self.assertTrue(body.startswith(b"event: comment\ndata: {\"id\":"))
+        self.assertIn("комментарий".encode(), body)
+        await sync_to_async(Like.objects.create)(post=self.post, liked_by=self.user)
+        self.assertEqual(await self.receive_body(communicator), b'event: like\ndata: {"delta":1}\n\n')
+        await self.disconnect(communicator)
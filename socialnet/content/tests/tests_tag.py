@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from taggit.models import Tag
+
+from content.models import Blog, Post
+from content.suggest import tag_suggest
+
+User = get_user_model()
+
+
+@override_settings(TAG_SUGGEST={'REBUILD_INTERVAL': 10 ** 6})
+class TagSuggestTests(APITestCase):
+    """
+    Тест кейс на подсказки тегов
+    """
+    def setUp(self) -> None:
+        tag_suggest.invalidate()
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        self.blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        self.user = user
+        for slug, tags in (("first", ["Python", "pytest", "django"]), ("second", ["python", "pyramid"]),
+                           ("third", ["python"])):
+            self.create_post(slug, tags)
+
+    def tearDown(self) -> None:
+        tag_suggest.invalidate()
+
+    def create_post(self, slug, tags):
+        post = Post.objects.create(slug=slug, title=slug, is_published=True, blog=self.blog, author=self.user)
+        post.tags.add(*tags)
+        return post
+
+    def suggest(self, q, **params):
+        response = self.client.get(path=reverse('tag-suggest'), data={"q": q, **params}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item["name"], item["posts"]) for item in response.data]
+
+    def test_ranked_by_usage(self):
+        self.assertEqual(self.suggest("PY"), [("python", 2), ("pyramid", 1), ("pytest", 1), ("Python", 1)])
+        self.assertEqual(self.suggest("pyt", limit=2), [("python", 2), ("pytest", 1)])
+        self.assertEqual(self.suggest("dj"), [("django", 1)])
+        self.assertEqual(self.suggest("x"), [])
+        self.assertEqual(self.suggest(""), [])
+
+    def test_incremental_update(self):
+        self.suggest("py")                                        # построение индекса
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_post("fourth", ["pyramid", "pypy"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(slug="second").delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("pyr"), [("pyramid", 1)])
+            self.assertEqual(self.suggest("pyp"), [("pypy", 1)])
+            self.assertEqual(self.suggest("python"), [("Python", 1), ("python", 1)])
+
+    @override_settings(TAG_SUGGEST={'MAX_TAGS': 1})
+    def test_database_fallback(self):
+        self.assertEqual(self.suggest("PY"), [("python", 2), ("pyramid", 1), ("pytest", 1), ("Python", 1)])
+
+    def test_prefix_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            sql, params = Tag.objects.filter(name__istartswith="py").values("pk").query.sql_with_params()
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("taggit_tag_name_upper_prefix_idx", plan)
@@ -0,0 +1,49 @@
+"""
+Генерация миниатюр изображений в процессах пула
+
+Модуль не импортирует Django: рабочие процессы пула запускаются методом
+`spawn` и импортируют только этот модуль и Pillow
+"""
+import os
+
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 4},
+}
+
+
+def make_thumbnails(source, targets, image_format):
+    """
+    Запись миниатюр изображения (вписанных в квадрат размера, без увеличения)
+
+    Существующие файлы миниатюр не перезаписываются (одинаковые изображения
+    разделяют миниатюры), файл записывается во временный и переименовывается,
+    поэтому частично записанная миниатюра не бывает видна
+    :param source: путь исходного изображения
+    :param targets: список (размер, путь миниатюры)
+    :param image_format: формат миниатюр Pillow (`JPEG`, `PNG`, `WEBP`)
+    :return: словарь размер -> (ширина, высота) миниатюры
+    """
+    result = {}
+    largest = max(size for size, _ in targets)
+    with Image.open(source) as original:
+        original.draft(original.mode, (largest, largest))    # JPEG декодируется сразу в уменьшенном масштабе
+        image = ImageOps.exif_transpose(original)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        for size, path in targets:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+            result[size] = thumbnail.size
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = "%s.%d.tmp" % (path, os.getpid())
+            thumbnail.save(temporary, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+            os.replace(temporary, path)
+    return result
@@ -0,0 +1,115 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Extract, Power
+from django.utils import timezone
+
+from content.models import PostActivity
+from core.metrics import record_cache
+
+DEFAULTS = {
+    'WINDOW_HOURS': 72,
+    'HALF_LIFE_HOURS': 12,
+    'TOP_K': 50,
+    'CACHE_TIMEOUT': 60,
+    'WEIGHTS': {'likes': 3.0, 'comments': 2.0, 'views': 0.1},
+}
+
+UPSERT_SQL = (
+    'INSERT INTO "{table}" ("post_id", "bucket", "likes", "views", "comments") VALUES (%s, %s, %s, %s, %s) '
+    'ON CONFLICT ("post_id", "bucket") DO UPDATE SET '
+    '"likes" = "{table}"."likes" + EXCLUDED."likes", '
+    '"views" = "{table}"."views" + EXCLUDED."views", '
+    '"comments" = "{table}"."comments" + EXCLUDED."comments"'
+)
+
+
+def get_setting(name):
+    """
+    Получение параметра популярности постов из `settings.TRENDING`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'TRENDING', {}).get(name, DEFAULTS[name])
+
+
+def hour_bucket(moment=None):
+    return (moment or timezone.now()).astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(post_id, likes=0, views=0, comments=0, at=None):
+    """
+    Инкрементальное обновление почасовых счётчиков активности поста
+
+    Увеличение - upsert корзины часа события, уменьшение (отмена события) - только
+    обновление существующей корзины, поэтому при каскадном удалении поста не
+    создаются новые строки
+    :param post_id: id поста
+    :param likes: изменение кол-ва лайков
+    :param views: изменение кол-ва просмотров
+    :param comments: изменение кол-ва комментариев
+    :param at: время события (по умолчанию - текущее)
+    """
+    bucket = hour_bucket(at)
+    if min(likes, views, comments) < 0:
+        PostActivity.objects.filter(post_id=post_id, bucket=bucket).update(
+            likes=F("likes") + likes, views=F("views") + views, comments=F("comments") + comments
+        )
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(table=PostActivity._meta.db_table),
+                       [post_id, bucket, likes, views, comments])
+
+
+def trending_scores(now=None):
+    """
+    Расчёт популярности опубликованных постов за окно `WINDOW_HOURS`
+
+    Популярность - сумма взвешенных почасовых счётчиков, вклад каждого часа
+    уменьшается вдвое за `HALF_LIFE_HOURS`. Читаются только корзины окна
+    (индекс по `bucket`).
+    :return: список (id поста, популярность) по убыванию, не более `TOP_K`
+    """
+    now = now or timezone.now()
+    weights = get_setting('WEIGHTS')
+    age = Value(now.timestamp()) - Extract("bucket", "epoch", tzinfo=dt_timezone.utc)
+    decay = Power(Value(0.5), age / Value(get_setting('HALF_LIFE_HOURS') * 3600.0))
+    weighted = (F("likes") * Value(float(weights.get('likes', 0))) +
+                F("comments") * Value(float(weights.get('comments', 0))) +
+                F("views") * Value(float(weights.get('views', 0))))
+    rows = (
+        PostActivity.objects
+        .filter(bucket__gte=hour_bucket(now - timedelta(hours=get_setting('WINDOW_HOURS'))),
+                post__is_published=True)
+        .values("post")
+        .annotate(score=Sum(weighted * decay, output_field=FloatField()))
+        .filter(score__gt=0)
+        .order_by("-score", "-post_id")
+        .values_list("post", "score")[:get_setting('TOP_K')]
+    )
+    return list(rows)
+
+
+def cache_key():
+    return "trending:%s:%s:%s" % (get_setting('WINDOW_HOURS'), get_setting('HALF_LIFE_HOURS'), get_setting('TOP_K'))
+
+
+def get_trending():
+    """
+    Популярные посты из кэша (пересчёт не чаще раза в `CACHE_TIMEOUT` сек.)
+    :return: список (id поста, популярность) по убыванию
+    """
+    key = cache_key()
+    scores = cache.get(key)
+    record_cache("trending", scores is not None)
+    if scores is None:
+        scores = trending_scores()
+        cache.set(key, scores, get_setting('CACHE_TIMEOUT'))
+    return scores
+
+
+def invalidate_trending():
+    cache.delete(cache_key())
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 
 from content.views import (
     BlogViewSet, PostViewSet, CommentViewSet, BlogPostsListView, SubscribesListView,
-    MyPostsListView, PostCommentsListView
+    MyPostsListView, PostCommentsListView, PostThreadsListView, TagListView,
+    TagSuggestView, NotificationListView, NotificationUnreadView, NotificationReadView
 )
 
 router = DefaultRouter()
@@ -17,4 +18,10 @@ urlpatterns = [
     path('blog/subscribes', SubscribesListView.as_view(), name='user-subscribes-list'),
     path('post/my', MyPostsListView.as_view(), name='user-posts-list'),
     path('post/<slug>/comments', PostCommentsListView.as_view(), name='post-comments-list'),
+    path('post/<slug>/threads', PostThreadsListView.as_view(), name='post-threads-list'),
+    path('tags', TagListView.as_view(), name='tag-list'),
+    path('tags/suggest', TagSuggestView.as_view(), name='tag-suggest'),
+    path('notifications', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread', NotificationUnreadView.as_view(), name='notification-unread'),
+    path('notifications/read', NotificationReadView.as_view(), name='notification-read'),
 ]
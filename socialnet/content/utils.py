@@ -1,6 +1,6 @@
 from pytils.translit import slugify
 
-from content.models import Subscription, Blog, Like
+from content.models import Blog
 
 
 def generate_slug(beg_pt, end_pt):
@@ -118,16 +118,16 @@ def is_blog_owner(user, blog):
         return False
 
 
-def has_subscribed(instance, user):
-    return Subscription.objects.filter(user=user, blog=instance).exists()
-
-
-def was_liked(instance, user):
-    return Like.objects.filter(post=instance, liked_by=user).exists()
-
-
-
-
-
-
-
+def make_excerpt(text, length):
+    """
+    Отрывок текста по границе слова
+    :param text: текст
+    :param length: максимальная длина отрывка (без многоточия)
+    :return: текст целиком, если он не длиннее `length`, иначе - отрывок с многоточием
+    """
+    if len(text) <= length:
+        return text
+    excerpt = text[:length + 1]
+    if not excerpt[-1].isspace() and len(excerpt.split(None, 1)) > 1:   # последнее слово обрезано
+        excerpt = excerpt.rsplit(None, 1)[0]
+    return excerpt[:length].rstrip() + "…"
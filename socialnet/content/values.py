@@ -0,0 +1,216 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.functions import Substr
+from rest_framework import serializers
+from taggit.models import Tag
+
+from content.images import media_url, thumbnail_urls
+from content.models import Blog, Like, Post, PostImage, Subscription, TaggedPost
+from content.serializers import BlogSerializer, PostSerializer
+from content.utils import make_excerpt
+
+User = get_user_model()
+
+
+class ValuesSerializer(ABC):
+    """
+    Базовый класс сериализатора списка по строкам `values()`
+
+    Ответ строится без экземпляров моделей и полей DRF: строки страницы читаются
+    `values()` только по столбцам таблицы (соединения вошли бы в запрос кол-ва
+    пагинации и в группировку запросов с агрегатами), связанные объекты, списки
+    и счётчики - одним запросом на страницу. Вывод совпадает с выводом основного
+    сериализатора по умолчанию (без `?fields=`, `?exclude=`, `?include=`).
+
+     * `values` - читаемые поля
+     * `prepare_queryset()` - queryset строк для пагинации
+     * `to_representation()` - словарь объекта по строке и связанным данным
+    """
+    values = ()
+
+    def __init__(self, rows, context=None):
+        self.rows = list(rows)
+        self.context = context or {}
+        self.datetime_field = serializers.DateTimeField()           # Формат дат `DATETIME_FORMAT`,
+        self.datetime_field.timezone = self.datetime_field.default_timezone()  # часовой пояс - один раз
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        return queryset.values(*cls.values)
+
+    def format_datetime(self, value):
+        return None if value is None else self.datetime_field.to_representation(value)
+
+    def get_viewer_flags(self, serializer_class, ids):
+        """
+        Флаги текущего пользователя (запросы `query_<имя>()` основного сериализатора)
+        :return: словарь имя флага -> множество id объектов
+        """
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated or not ids:
+            return {}
+        return {
+            name: set(getattr(serializer_class, "query_" + name)(user, ids))
+            for name in serializer_class.viewer_flag_names
+        }
+
+    def load_related(self, ids):
+        return {}
+
+    @staticmethod
+    def load_usernames(user_ids):
+        return dict(User.objects.filter(pk__in=set(user_ids)).values_list("pk", "username"))
+
+    @abstractmethod
+    def to_representation(self, row, related):
+        """
+        Словарь объекта по строке `values()` и связанным данным `load_related()`
+        """
+
+    @property
+    def data(self):
+        related = self.load_related([row["id"] for row in self.rows])
+        return [self.to_representation(row, related) for row in self.rows]
+
+
+class PostValuesSerializer(ValuesSerializer):
+    """
+    Сериализатор списка постов по строкам `values()` (вывод `PostSerializer` в списке)
+
+    Отрывок текста читается аннотацией `body_head` (в запросе с GROUP BY - из
+    полного текста), лайки - из аннотации сортировки или одним запросом на страницу,
+    изображения - одним запросом на страницу
+    """
+    values = ("id", "slug", "title", "is_published", "created_at", "views", "comments_count", "last_commented_at",
+              "publish_at", "author_id")
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        annotations = queryset.query.annotations
+        fields = list(cls.values)
+        if "num_likes" in annotations:
+            fields.append("num_likes")
+        if queryset.query.group_by is not None:          # Отрывок из полного текста (см. `PostSerializer`)
+            fields.append("body")
+        else:
+            if "body_head" not in annotations:
+                queryset = queryset.annotate(body_head=Substr("body", 1, PostSerializer.excerpt_length + 1))
+            fields.append("body_head")
+        return queryset.values(*fields)
+
+    def load_related(self, ids):
+        tagged = list(TaggedPost.objects.filter(content_object_id__in=ids).order_by("content_object_id", "tag_id")
+                      .values_list("content_object_id", "tag_id"))
+        names = dict(Tag.objects.filter(pk__in={tag_id for _, tag_id in tagged}).values_list("pk", "name"))
+        tags = defaultdict(list)
+        for post_id, tag_id in tagged:
+            tags[post_id].append(names[tag_id])
+        likes = {}
+        if self.rows and "num_likes" not in self.rows[0]:
+            likes = dict(Like.objects.filter(post_id__in=ids).order_by().values("post_id")
+                         .annotate(total=Count("pk")).values_list("post_id", "total"))
+        request = self.context.get("request")
+        images = defaultdict(list)
+        for image in PostImage.objects.filter(post_id__in=ids).order_by("post_id", "id")\
+                .values("id", "post_id", "image", "width", "height", "status", "thumbnails"):
+            images[image["post_id"]].append({
+                "id": image["id"],
+                "url": media_url(image["image"], request),
+                "width": image["width"],
+                "height": image["height"],
+                "status": image["status"],
+                "thumbnails": thumbnail_urls(image["thumbnails"], request),
+            })
+        return {
+            "tags": tags,
+            "images": images,
+            "likes": likes,
+            "authors": self.load_usernames(row["author_id"] for row in self.rows),
+            "flags": self.get_viewer_flags(PostSerializer, ids),
+        }
+
+    def to_representation(self, row, related):
+        pk = row["id"]
+        text = row["body_head"] if "body_head" in row else row["body"]
+        return {
+            "slug": row["slug"],
+            "title": row["title"],
+            "excerpt": make_excerpt(text, PostSerializer.excerpt_length),
+            "is_published": row["is_published"],
+            "created_at": self.format_datetime(row["created_at"]),
+            "likes": row["num_likes"] if "num_likes" in row else related["likes"].get(pk, 0),
+            "views": row["views"],
+            "comments_count": row["comments_count"],
+            "last_commented_at": self.format_datetime(row["last_commented_at"]),
+            "publish_at": self.format_datetime(row["publish_at"]),
+            "tags": related["tags"].get(pk, []),
+            "images": related["images"].get(pk, []),
+            "author": related["authors"][row["author_id"]],
+            "liked_by_me": pk in related["flags"].get("liked_by_me", ()),
+        }
+
+
+class BlogValuesSerializer(ValuesSerializer):
+    """
+    Сериализатор списка блогов по строкам `values()` (вывод `BlogSerializer`)
+
+    Последние посты, авторы, владельцы и подписчики читаются одним запросом на
+    страницу (подписчики - из аннотации сортировки, если она есть)
+    """
+    values = ("id", "slug", "title", "description", "created_at", "updated_at", "latest_post_id", "owner_id")
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        if "subscribers" in queryset.query.annotations:
+            return queryset.values(*cls.values, "subscribers")
+        return queryset.values(*cls.values)
+
+    def load_related(self, ids):
+        authors = defaultdict(list)
+        for blog_id, username in Blog.authors.through.objects.filter(blog_id__in=ids)\
+                .order_by("blog_id", "user_id").values_list("blog_id", "user__username"):
+            authors[blog_id].append(username)
+        latest_posts = {
+            post["id"]: post for post in Post.objects.filter(
+                pk__in={row["latest_post_id"] for row in self.rows if row["latest_post_id"] is not None}
+            ).values("id", "slug", "title", "created_at")
+        }
+        subscribers = {}
+        if self.rows and "subscribers" not in self.rows[0]:
+            subscribers = dict(Subscription.objects.filter(blog_id__in=ids).order_by().values("blog_id")
+                               .annotate(total=Count("pk")).values_list("blog_id", "total"))
+        return {
+            "authors": authors,
+            "latest_posts": latest_posts,
+            "owners": self.load_usernames(row["owner_id"] for row in self.rows),
+            "subscribers": subscribers,
+            "flags": self.get_viewer_flags(BlogSerializer, ids),
+        }
+
+    def to_representation(self, row, related):
+        pk = row["id"]
+        latest_post = related["latest_posts"].get(row["latest_post_id"])
+        if latest_post is not None:
+            latest_post = {
+                "slug": latest_post["slug"],
+                "title": latest_post["title"],
+                "created_at": self.format_datetime(latest_post["created_at"]),
+            }
+        flags = related["flags"]
+        return {
+            "slug": row["slug"],
+            "title": row["title"],
+            "description": row["description"],
+            "created_at": self.format_datetime(row["created_at"]),
+            "updated_at": self.format_datetime(row["updated_at"]),
+            "latest_post": latest_post,
+            "subscribes": row["subscribers"] if "subscribers" in row else related["subscribers"].get(pk, 0),
+            "authors": related["authors"].get(pk, []),
+            "owner": related["owners"][row["owner_id"]],
+            "is_subscribed": pk in flags.get("is_subscribed", ()),
+            "is_author": pk in flags.get("is_author", ()),
+        }
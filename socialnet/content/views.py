@@ -1,24 +1,65 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
 from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as rest_filters
+from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework import filters
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
-from content.filters import BlogFilter, PostFilter
-from content.models import Blog, Post, Comment
+from content.deletion import soft_delete_blog, soft_delete_user
+from content.filters import BlogFilter, PostFilter, SparseFieldsFilterBackend, IncludeFilterBackend
+from content.images import HashingUploadHandler
+from content.models import Blog, Post, PostImage, Comment, TagCount, Notification
+from content.notifications import unread_count, mark_all_read
+from content.pagination import CommentThreadPagination, TagCloudPagination, NotificationPagination
+from content.suggest import suggest_tags, get_setting as get_suggest_setting
+from content.trending import get_trending, record_activity
+from content.values import BlogValuesSerializer, PostValuesSerializer
 from content.permissions import IsBlogAuthorOrAdmin, IsCreatorOrAdmin, IsCreatorBlogOwnerOrAdmin
 from content.serializers import (
     BlogSerializer, AuthorSerializer, SubscribeSerializer, PostSerializer,
     CreatePostSerializer, LikeSerializer, PublishPostSerializer, CommentSerializer,
-    CreateCommentSerializer, CreateOrUpdateBlogSerializer, UpdatePostSerializer
+    CreateCommentSerializer, CreateOrUpdateBlogSerializer, UpdatePostSerializer, ThreadCommentSerializer,
+    TagCountSerializer, TagSuggestionSerializer, PostImageSerializer, PostImageUploadSerializer,
+    NotificationSerializer
 )
 
 
-class BlogViewSet(viewsets.ModelViewSet):
+class ValuesListMixin:
+    """
+    Примесь чтения списка сериализатором по строкам `values()` (`content.values`)
+
+     * `values_serializer_class` - сериализатор списка по строкам
+     * `use_values_serializer` - включение (выключается для сравнения с основным сериализатором)
+     * с параметрами `?fields=`, `?exclude=`, `?include=` список строится основным сериализатором
+    """
+    values_serializer_class = None
+    use_values_serializer = True
+    values_fallback_params = ("fields", "exclude", "include")
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer or any(name in request.query_params for name in self.values_fallback_params):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)   # Связи читает сериализатор
+        queryset = self.values_serializer_class.prepare_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        serializer = self.values_serializer_class(queryset if page is None else page,
+                                                  context=self.get_serializer_context())
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+
+class BlogViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     Представление модели блога
 
@@ -29,10 +70,12 @@ class BlogViewSet(viewsets.ModelViewSet):
      * поля для поиска - заголовок (содержание в), имя владельца (точное совпадение)
     """
     serializer_class = BlogSerializer
+    values_serializer_class = BlogValuesSerializer
     permission_classes = [AllowAny, ]
-    queryset = Blog.objects.all()
+    queryset = Blog.objects.select_related("latest_post")
     lookup_field = "slug"
-    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter, SparseFieldsFilterBackend,
+                       IncludeFilterBackend)
     filterset_class = BlogFilter
     search_fields = ['title', '=owner__username']
 
@@ -52,6 +95,9 @@ class BlogViewSet(viewsets.ModelViewSet):
             return SubscribeSerializer
         return self.serializer_class
 
+    def perform_destroy(self, instance):
+        soft_delete_blog(instance)                 # Блог скрыт сразу, удаляется фоновой задачей порциями
+
     @action(detail=True, methods=["POST", "DELETE"])
     def author(self, request, slug=None):
         instance = self.get_object()
@@ -75,6 +121,18 @@ class BlogViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class UserViewSet(DjoserUserViewSet):
+    """
+    Представление модели пользователя (Djoser)
+
+    Удаление пользователя деактивирует его и скрывает его блоги сразу,
+    пользователь с остальными зависимыми сущностями (посты в чужих блогах и
+    комментарии видны до удаления) удаляется фоновой задачей порциями
+    """
+    def perform_destroy(self, instance):
+        soft_delete_user(instance)
+
+
 class SubscribesListView(ListAPIView):
     """
     Представление списка блогов, на которые подписан пользователь
@@ -87,12 +145,13 @@ class SubscribesListView(ListAPIView):
     queryset = Blog.objects.all()
     serializer_class = BlogSerializer
     permission_classes = [IsAuthenticated, ]
-    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter, SparseFieldsFilterBackend,
+                       IncludeFilterBackend)
     filterset_class = BlogFilter
     search_fields = ['title', '=owner__username']
 
     def get_queryset(self):
-        return Blog.objects.filter(subscription__user=self.request.user)
+        return Blog.objects.filter(subscription__user=self.request.user).select_related("latest_post")
 
 
 class BlogPostsListView(ListAPIView):
@@ -107,7 +166,8 @@ class BlogPostsListView(ListAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [AllowAny, ]
-    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter, SparseFieldsFilterBackend,
+                       IncludeFilterBackend)
     filterset_class = PostFilter
     search_fields = ['title', '=author__username']
 
@@ -121,7 +181,7 @@ class BlogPostsListView(ListAPIView):
         return Post.objects.filter(blog=blog)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     Представление модели поста
 
@@ -132,17 +192,19 @@ class PostViewSet(viewsets.ModelViewSet):
      * поля для поиска - заголовок (содержание в), имя автора (точное совпадение)
     """
     serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
     permission_classes = [AllowAny, ]
     queryset = Post.objects.all()
     lookup_field = "slug"
-    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter, SparseFieldsFilterBackend,
+                       IncludeFilterBackend)
     filterset_class = PostFilter
     search_fields = ['title', '=author__username']
 
     def get_permissions(self):
         if self.action in ["create", ]:
             self.permission_classes = [IsBlogAuthorOrAdmin, ]
-        elif self.action in ["update", "partial_update", "publish", ]:
+        elif self.action in ["update", "partial_update", "publish", "images", "delete_image", ]:
             self.permission_classes = [IsCreatorOrAdmin, ]
         elif self.action in ["destroy", ]:
             self.permission_classes = [IsCreatorBlogOwnerOrAdmin]
@@ -159,8 +221,16 @@ class PostViewSet(viewsets.ModelViewSet):
             self.serializer_class = PublishPostSerializer
         elif self.action in ["like", ]:
             self.serializer_class = LikeSerializer
+        elif self.action in ["images", ]:
+            return PostImageUploadSerializer
         return self.serializer_class
 
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.action in ["images", ]:                   # До чтения тела запроса (в т.ч. проверкой CSRF):
+            request.upload_handlers = [HashingUploadHandler(request)]   # файлы - блоками на диск
+        return drf_request
+
     def list(self, request, *args, **kwargs):
         if not request.user.is_staff:
             self.queryset = Post.objects.filter(is_published=True)
@@ -172,8 +242,18 @@ class PostViewSet(viewsets.ModelViewSet):
         if not instance.is_published and not request.user.is_staff and request.user != instance.author:
             raise Http404
         if instance.is_published:
+            Post.objects.filter(pk=instance.pk).update(views=F("views") + 1)   # Без чтения и записи всей строки
             instance.views += 1
-            instance.save()
+            record_activity(instance.pk, views=1)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["GET"])
+    def trending(self, request):
+        scores = dict(get_trending())
+        posts = Post.objects.filter(pk__in=scores, is_published=True).select_related("author")\
+            .prefetch_related("tags", "images").annotate(num_likes=Count("like"))
+        posts = sorted(posts, key=lambda post: (-scores[post.pk], -post.pk))
+        serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=["POST"])
@@ -184,6 +264,23 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer.publish()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=["POST"], parser_classes=[MultiPartParser])
+    def images(self, request, slug=None):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data)
+        serializer.check_rejected(request.upload_handlers[0].rejected)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            images = serializer.attach(serializer.validated_data)
+        serializer = PostImageSerializer(images, many=True, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["DELETE"], url_path=r"images/(?P<image_id>\d+)")
+    def delete_image(self, request, slug=None, image_id=None):
+        instance = self.get_object()
+        get_object_or_404(PostImage, post=instance, pk=image_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True, methods=["POST", "DELETE"])
     def like(self, request, slug=None):
         instance = self.get_object()
@@ -210,7 +307,8 @@ class MyPostsListView(ListAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated, ]
-    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter,)
+    filter_backends = (rest_filters.DjangoFilterBackend, filters.SearchFilter, SparseFieldsFilterBackend,
+                       IncludeFilterBackend)
     filterset_class = PostFilter
     search_fields = ['title']
 
@@ -245,6 +343,17 @@ class CommentViewSet(mixins.CreateModelMixin,
             return CreateCommentSerializer
         return self.serializer_class
 
+    @action(detail=True, methods=["GET"], pagination_class=CommentThreadPagination)
+    def thread(self, request, pk=None):
+        instance = self.get_object()
+        queryset = Comment.objects.filter(                  # Поддерево одним запросом
+            post_id=instance.post_id, path__startswith=instance.path,  # по индексу (post, path)
+            created_at__gte=instance.created_at,            # в секциях не раньше даты комментария
+        ).select_related("commented_by")
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 class PostCommentsListView(ListAPIView):
     """
@@ -262,4 +371,114 @@ class PostCommentsListView(ListAPIView):
         if not Post.objects.filter(slug=post_slug).exists():
             raise Http404
         post = Post.objects.get(slug=post_slug)
-        return Comment.objects.filter(post=post)
+        return Comment.objects.of_post(post)
+
+
+class PostThreadsListView(ListAPIView):
+    """
+    Представление списка веток комментариев поста
+
+     * базовый класс сериализатора - Сериализатор корневого комментария ветки
+     * базовый класс разрешения - Доступно всем
+     * класс пагинации - Курсорная пагинация веток комментариев
+    """
+    serializer_class = ThreadCommentSerializer
+    permission_classes = [AllowAny, ]
+    pagination_class = CommentThreadPagination
+    queryset = Comment.objects.all()
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, slug=self.kwargs.get('slug'))
+        replies = Comment.objects.filter(              # Ответы ветки - пути в диапазоне (путь корня, путь корня + ':'),
+            post=OuterRef("post"),                     # ':' следует за цифрами, поэтому диапазон покрывает
+            path__gt=OuterRef("path"),                 # всё поддерево и читается по индексу (post, path)
+            path__lt=Concat(OuterRef("path"), Value(":")),
+            created_at__gte=OuterRef("created_at"),    # ответы не раньше корня - чтение секций с даты корня
+        ).order_by().values("post").annotate(total=Count("pk")).values("total")
+        return Comment.objects.of_post(post).filter(parent__isnull=True).select_related("commented_by").annotate(
+            replies_count=Coalesce(Subquery(replies), 0)
+        )
+
+
+class TagListView(ListAPIView):
+    """
+    Представление облака тегов
+
+     * базовый класс сериализатора - Сериализатор счётчика использования тега
+     * базовый класс разрешения - Доступно всем
+     * класс пагинации - Пагинация облака тегов
+
+    Кол-во постов читается из таблицы счётчиков (индекс по убыванию кол-ва)
+    """
+    serializer_class = TagCountSerializer
+    permission_classes = [AllowAny, ]
+    pagination_class = TagCloudPagination
+    queryset = TagCount.objects.filter(posts__gt=0).select_related("tag").order_by("-posts", "tag_id")
+
+
+class TagSuggestView(APIView):
+    """
+    Представление подсказок тегов по префиксу имени (`?q=`, `?limit=`)
+
+     * базовый класс сериализатора - Сериализатор подсказки тега
+     * базовый класс разрешения - Доступно всем
+
+    Подсказки выбираются из индекса процесса (`content.suggest`), отсортированы
+    по убыванию кол-ва постов
+    """
+    permission_classes = [AllowAny, ]
+
+    def get(self, request):
+        prefix = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", get_suggest_setting('LIMIT')))
+        except ValueError:
+            limit = get_suggest_setting('LIMIT')
+        limit = min(max(limit, 1), get_suggest_setting('MAX_LIMIT'))
+        suggestions = suggest_tags(prefix, limit) if prefix else []
+        serializer = TagSuggestionSerializer([{"name": name, "posts": posts} for name, posts in suggestions], many=True,
+                                             context={"request": request})
+        return Response(serializer.data)
+
+
+class NotificationListView(ListAPIView):
+    """
+    Представление списка уведомлений пользователя (новые первыми)
+
+     * базовый класс сериализатора - Сериализатор уведомления
+     * базовый класс разрешения - Доступно авторизованным пользователям
+     * класс пагинации - Курсорная пагинация уведомлений
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated, ]
+    pagination_class = NotificationPagination
+    queryset = Notification.objects.all()
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user).select_related("actor", "post")\
+            .only("id", "kind", "comment_id", "is_read", "created_at", "actor__username", "post__slug", "post__title")
+
+
+class NotificationUnreadView(APIView):
+    """
+    Представление кол-ва непрочитанных уведомлений пользователя (из счётчика, без подсчёта уведомлений)
+
+     * базовый класс разрешения - Доступно авторизованным пользователям
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request):
+        return Response({"unread": unread_count(request.user)})
+
+
+class NotificationReadView(APIView):
+    """
+    Представление отметки прочтения всех уведомлений пользователя
+
+     * базовый класс разрешения - Доступно авторизованным пользователям
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    def post(self, request):
+        mark_all_read(request.user)
+        return Response({"unread": unread_count(request.user)})
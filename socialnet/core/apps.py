@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 from django.db.models.signals import post_migrate
 
 
@@ -9,3 +10,6 @@ class CoreConfig(AppConfig):
     def ready(self):
         from . import signals                                   # регистрация post migrate сигнала
         post_migrate.connect(signals.create_initial_superuser)  # для начального создания администратора
+        if 'core.middleware.ProfilingMiddleware' in settings.MIDDLEWARE:
+            from .profiling import instrument_serializers          # замер времени сериализации
+            instrument_serializers()                                # для Server-Timing
@@ -0,0 +1,69 @@
+import json
+
+from django.db import connection
+
+SORT_NODES = ("Sort", "Incremental Sort")
+
+
+def explain(sql, params=None, analyze=True):
+    """
+    План выполнения запроса `EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`
+    :param sql: текст SQL запроса
+    :param params: параметры запроса
+    :param analyze: выполнять запрос (фактические строки, время и буферы)
+    :return: корневой узел плана и время выполнения (мс., None без ANALYZE)
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (%s) %s" % (options, sql), params)
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]["Plan"], result[0].get("Execution Time")
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from walk(child)
+
+
+def table_sizes(plan):
+    """
+    Оценка кол-ва строк таблиц, читаемых планом (`pg_class.reltuples`)
+    :return: словарь имя таблицы -> кол-во строк
+    """
+    tables = sorted({node["Relation Name"] for node in walk(plan) if "Relation Name" in node})
+    if not tables:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p') AND relname = ANY(%s)",
+                       [tables])
+        return {name: max(rows, 0) for name, rows in cursor.fetchall()}
+
+
+def plan_issues(plan, min_rows, sizes=None):
+    """
+    Поиск в плане последовательных чтений и сортировок больших наборов строк
+
+     * `Seq Scan` - таблица от `min_rows` строк читается целиком
+     * `Sort` - сортируется от `min_rows` строк (порядок не берётся из индекса)
+    Небольшие таблицы и наборы строк не отмечаются: для них такой план оптимален
+    :param plan: корневой узел плана `EXPLAIN (FORMAT JSON)`
+    :param min_rows: порог кол-ва строк
+    :param sizes: кол-во строк таблиц (по умолчанию - `table_sizes(plan)`)
+    :return: список описаний найденных узлов
+    """
+    sizes = table_sizes(plan) if sizes is None else sizes
+    issues = []
+    for node in walk(plan):
+        if node["Node Type"] == "Seq Scan":
+            rows = sizes.get(node["Relation Name"], 0)
+            if rows >= min_rows:
+                issues.append("Seq Scan on %s (~%d rows)" % (node["Relation Name"], rows))
+        elif node["Node Type"] in SORT_NODES:
+            child = node["Plans"][0]
+            rows = child.get("Actual Rows", child["Plan Rows"]) * child.get("Actual Loops", 1)
+            if rows >= min_rows:
+                issues.append("%s of %d rows by %s" % (node["Node Type"], rows, ", ".join(node["Sort Key"])))
+    return issues
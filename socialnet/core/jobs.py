@@ -0,0 +1,196 @@
+"""
+Очередь фоновых задач в таблице бд (без внешнего брокера)
+
+Задачи регистрируются декоратором `task`, ставятся в очередь `enqueue`
+(в текущей транзакции - задача видна рабочим процессам после её фиксации) или
+`enqueue_on_commit` и выполняются командой `python manage.py run_jobs --loop`
+"""
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LOCK_TIMEOUT': 600,
+}
+
+tasks = {}                          # имя задачи -> (функция, пакетная ли задача)
+
+
+def get_setting(name):
+    """
+    Получение параметра очереди задач из `settings.JOBS`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULTS[name])
+
+
+def task(name, batch=False):
+    """
+    Регистрация функции задачи
+
+    Функция задачи принимает аргументы задачи (`payload`), пакетной задачи -
+    список аргументов всех её задач, выбранных рабочим процессом за раз
+    :param name: имя задачи
+    :param batch: пакетная задача
+    """
+    def decorator(func):
+        tasks[name] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, priority=0, delay=None, max_attempts=None):
+    """
+    Постановка задачи в очередь в текущей транзакции
+    :param name: имя зарегистрированной задачи
+    :param payload: аргументы задачи (сериализуемые в JSON)
+    :param priority: приоритет (больше - раньше)
+    :param delay: отсрочка выполнения (timedelta)
+    :param max_attempts: максимальное кол-во попыток (по умолчанию `MAX_ATTEMPTS`)
+    :return: задача
+    """
+    return enqueue_many(name, [payload], priority, delay, max_attempts)[0]
+
+
+def enqueue_many(name, payloads, priority=0, delay=None, max_attempts=None):
+    """
+    Постановка пакета задач в очередь одним INSERT
+    """
+    if name not in tasks:
+        raise ValueError("Unknown job %r" % name)
+    run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload if payload is not None else {}, priority=priority, run_at=run_at,
+            max_attempts=max_attempts or get_setting('MAX_ATTEMPTS'))
+        for payload in payloads
+    ])
+
+
+def enqueue_on_commit(name, payload=None, **kwargs):
+    """
+    Постановка задачи в очередь после фиксации текущей транзакции (при откате
+    транзакции задача не ставится)
+    """
+    if name not in tasks:
+        raise ValueError("Unknown job %r" % name)
+    transaction.on_commit(partial(enqueue, name, payload, **kwargs))
+
+
+def backoff(attempts):
+    """
+    Задержка повтора задачи после `attempts` попыток, сек. (экспоненциальная)
+    """
+    return min(get_setting('BACKOFF_BASE') * 2 ** (attempts - 1), get_setting('BACKOFF_MAX'))
+
+
+def claim(batch_size):
+    """
+    Выбор задач рабочим процессом
+
+    Задачи выбираются в порядке приоритета и времени выполнения с блокировкой
+    строк, занятые другими процессами пропускаются (`SKIP LOCKED`), и
+    отмечаются выполняемыми в той же короткой транзакции
+    :return: список задач
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.filter(status=Job.STATUS_QUEUED, run_at__lte=now)
+            .order_by("-priority", "run_at", "id").select_for_update(skip_locked=True)[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.STATUS_RUNNING, locked_at=now, attempts=F("attempts") + 1
+            )
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = Job.STATUS_RUNNING, now, job.attempts + 1
+    return jobs
+
+
+def requeue_stale():
+    """
+    Возврат в очередь задач, выполняемых дольше `LOCK_TIMEOUT` сек.
+    (рабочий процесс завершился, не закончив задачу); задачи с исчерпанными
+    попытками отмечаются ошибкой, как в `fail()`, - задача, завершающая рабочий
+    процесс, не повторяется бесконечно
+    :return: кол-во возвращённых в очередь задач
+    """
+    timeout = get_setting('LOCK_TIMEOUT')
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    error = "Worker exited: job is running longer than %d s" % timeout
+    jobs = list(stale.only("pk", "name", "attempts", "max_attempts"))     # обычно пусто - один запрос
+    if not jobs:
+        return 0
+    exhausted = [job for job in jobs if job.attempts >= job.max_attempts]
+    for job in exhausted:
+        logger.error("Job %s failed (attempt %d of %d): %s", job, job.attempts, job.max_attempts, error)
+    stale.filter(pk__in=[job.pk for job in exhausted]).update(
+        status=Job.STATUS_FAILED, locked_at=None, last_error=error
+    )
+    return stale.filter(pk__in=[job.pk for job in jobs]).update(
+        status=Job.STATUS_QUEUED, locked_at=None, last_error=error
+    )
+
+
+def fail(jobs, error):
+    """
+    Повтор задач с задержкой или, если попытки исчерпаны, отметка ошибки
+    """
+    now = timezone.now()
+    for job in jobs:
+        logger.error("Job %s failed (attempt %d of %d): %r", job, job.attempts, job.max_attempts, error)
+        retry = job.attempts < job.max_attempts
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_QUEUED if retry else Job.STATUS_FAILED, locked_at=None, last_error=repr(error),
+            run_at=now + timedelta(seconds=backoff(job.attempts)) if retry else job.run_at,
+        )
+
+
+def execute(jobs):
+    """
+    Выполнение задач одной функции (обычной - одной задачи, пакетной - всех)
+    в транзакции, выполненные задачи удаляются в той же транзакции
+    :return: выполнены ли задачи
+    """
+    func, batch = tasks.get(jobs[0].name, (None, False))
+    try:
+        if func is None:
+            raise LookupError("Unknown job %r" % jobs[0].name)
+        with transaction.atomic():
+            func([job.payload for job in jobs]) if batch else func(jobs[0].payload)
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    except Exception as error:
+        fail(jobs, error)
+        return False
+    return True
+
+
+def run_jobs(batch_size=None):
+    """
+    Выполнение одного пакета задач очереди
+    :param batch_size: кол-во выбираемых задач (по умолчанию `BATCH_SIZE`)
+    :return: кол-во выбранных, кол-во завершившихся ошибкой задач
+    """
+    requeue_stale()
+    jobs = claim(batch_size or get_setting('BATCH_SIZE'))
+    groups = {}
+    for job in jobs:
+        batch = tasks.get(job.name, (None, False))[1]
+        groups.setdefault(job.name if batch else job.pk, []).append(job)
+    failed = sum(len(group) for group in groups.values() if not execute(group))
+    return len(jobs), failed
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import get_setting, run_jobs
+from core.querystats import recording_queries
+
+
+class Command(BaseCommand):
+    """
+    Команда выполнения фоновых задач очереди (`core.jobs`), несколько рабочих
+    процессов выбирают разные задачи (`SKIP LOCKED`)
+
+    Пример: `python manage.py run_jobs --loop --batch-size 50`
+    """
+    help = "Run queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Jobs claimed at once (defaults to JOBS['BATCH_SIZE'])")
+        parser.add_argument("--loop", action="store_true", help="Keep running as a worker")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Seconds to wait when the queue is empty (defaults to JOBS['POLL_INTERVAL'])")
+
+    def handle(self, *args, **options):
+        with recording_queries():                       # статистика отпечатков запросов команды
+            self.run_loop(options)
+
+    def run_loop(self, options):
+        interval = options["interval"] or get_setting('POLL_INTERVAL')
+        while True:
+            claimed, failed = run_jobs(batch_size=options["batch_size"])
+            if claimed or not options["loop"]:
+                message = "Ran %d jobs, %d failed" % (claimed, failed)
+                self.stdout.write(self.style.WARNING(message) if failed else self.style.SUCCESS(message))
+            if not options["loop"]:
+                return
+            if not claimed:                             # очередь пуста - ожидание, иначе следующий пакет сразу
+                time.sleep(interval)
@@ -0,0 +1,288 @@
+import fcntl
+import glob
+import hmac
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULTS = {
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': None,
+}
+
+SHARD_NAME = re.compile(r"metrics-(\d+)-[0-9a-f]+\.json$")
+ARCHIVE_NAME = "metrics-archive.json"       # сумма снимков завершившихся процессов
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    "socialnet_http_requests_total": (
+        "counter", "Total HTTP requests by view, action and status.", None),
+    "socialnet_http_request_duration_seconds": (
+        "histogram", "HTTP request latency by view and action.", LATENCY_BUCKETS),
+    "socialnet_db_queries_total": (
+        "counter", "Total SQL queries executed by view and action.", None),
+    "socialnet_db_queries_per_request": (
+        "histogram", "SQL queries per request by view and action.", QUERY_BUCKETS),
+    "socialnet_cache_requests_total": (
+        "counter", "Cache lookups by cache name and result.", None),
+}
+
+
+def get_setting(name):
+    """
+    Получение параметра метрик из `settings.METRICS`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса
+
+    Все значения хранятся как аддитивные счётчики (у гистограмм - кумулятивные
+    корзины, сумма и кол-во), поэтому снимки нескольких процессов объединяются
+    простым суммированием. При заданном `METRICS['MULTIPROCESS_DIR']` каждый
+    процесс периодически (не чаще `FLUSH_INTERVAL` сек.) сохраняет свой снимок в
+    отдельный файл каталога, а эндпоинт `/metrics` суммирует все снимки. Снимки
+    завершившихся процессов при сборе прибавляются к общему архивному снимку и
+    удаляются (счётчики не уменьшаются, кол-во файлов не растёт).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._pid = os.getpid()
+        self._shard = None
+        self._flushed_at = 0.0
+
+    def _ensure_process(self):
+        if self._pid != os.getpid():        # После fork рабочий процесс начинает
+            self._values = {}               # с пустого реестра, значения родителя
+            self._pid = os.getpid()         # остаются в его собственном снимке
+            self._shard = None
+            self._flushed_at = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._ensure_process()
+            self._values[key] = self._values.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        items = tuple(sorted(labels.items()))
+        with self._lock:
+            self._ensure_process()
+            values = self._values
+            first = bisect_left(buckets, value)                # Все корзины присутствуют в выводе,
+            for index, le in enumerate(buckets + ("+Inf",)):   # в том числе нулевые
+                key = (name + "_bucket", items + (("le", _format_value(le)),))
+                values[key] = values.get(key, 0) + (1 if index >= first else 0)
+            for key, amount in (((name + "_sum", items), value), ((name + "_count", items), 1)):
+                values[key] = values.get(key, 0) + amount
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            self._ensure_process()
+            return dict(self._values)
+
+    def _maybe_flush(self):
+        if get_setting('MULTIPROCESS_DIR') and time.monotonic() - self._flushed_at >= get_setting('FLUSH_INTERVAL'):
+            self.flush()
+
+    def flush(self):
+        """
+        Сохранение снимка процесса в каталог мультипроцессных метрик (атомарно)
+        """
+        directory = get_setting('MULTIPROCESS_DIR')
+        if not directory:
+            return
+        values = self.snapshot()
+        if self._shard is None:
+            self._shard = "metrics-%d-%s.json" % (self._pid, uuid.uuid4().hex[:8])
+        os.makedirs(directory, exist_ok=True)
+        _write_shard(directory, self._shard, values)
+        self._flushed_at = time.monotonic()
+
+    def collect(self):
+        """
+        Суммарные значения метрик всех процессов
+        :return: словарь {(имя, метки): значение}
+        """
+        directory = get_setting('MULTIPROCESS_DIR')
+        if not directory:
+            return self.snapshot()
+        self.flush()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)        # Сбор и перенос снимков - по одному процессу
+            self.merge_dead_shards(directory)
+            values = {}
+            for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+                _add_rows(values, _read_shard(path))
+        return values
+
+    @staticmethod
+    def merge_dead_shards(directory):
+        """
+        Перенос снимков завершившихся процессов в архивный снимок
+        (выполняется под блокировкой каталога)
+        :return: кол-во перенесённых снимков
+        """
+        dead = []
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            match = SHARD_NAME.search(os.path.basename(path))
+            if match is not None and not _process_alive(int(match.group(1))):
+                dead.append(path)
+        if dead:
+            archive = os.path.join(directory, ARCHIVE_NAME)
+            values = {}
+            for path in [archive] + dead:
+                _add_rows(values, _read_shard(path))
+            _write_shard(directory, ARCHIVE_NAME, values)
+            for path in dead:
+                os.remove(path)
+        return len(dead)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:                     # процесс другого пользователя
+        return True
+    return True
+
+
+def _read_shard(path):
+    try:
+        with open(path) as shard:
+            return json.load(shard)
+    except (OSError, ValueError):
+        return []
+
+
+def _add_rows(values, rows):
+    for name, labels, value in rows:
+        key = (name, tuple(tuple(label) for label in labels))
+        values[key] = values.get(key, 0) + value
+
+
+def _write_shard(directory, shard, values):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")       # Запись атомарна
+    with os.fdopen(fd, "w") as tmp:
+        json.dump([[name, labels, value] for (name, labels), value in values.items()], tmp)
+    os.replace(tmp_path, os.path.join(directory, shard))
+
+
+registry = MetricsRegistry()
+
+
+def token_valid(authorization):
+    """
+    Проверка токена сборщика метрик (`Authorization: Bearer <METRICS['TOKEN']>`)
+    :param authorization: значение заголовка Authorization
+    :return: True / False (токен не задан - False)
+    """
+    token = get_setting('TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(authorization.encode(), ("Bearer " + token).encode())
+
+
+def record_request(view, action, method, status, duration, queries=None):
+    """
+    Учёт обработанного HTTP запроса
+    :param view: имя класса представления
+    :param action: действие представления (list, retrieve, like, ...)
+    :param method: HTTP метод
+    :param status: код ответа
+    :param duration: время обработки (сек.)
+    :param queries: кол-во SQL запросов (None - не замерялось)
+    """
+    labels = {"view": view, "action": action}
+    registry.inc("socialnet_http_requests_total", {**labels, "method": method, "status": str(status)})
+    registry.observe("socialnet_http_request_duration_seconds", labels, duration)
+    if queries is not None:
+        registry.inc("socialnet_db_queries_total", labels, queries)
+        registry.observe("socialnet_db_queries_per_request", labels, queries)
+
+
+def record_cache(cache, hit):
+    """
+    Учёт обращения к кэшу
+    :param cache: имя кэша (назначение)
+    :param hit: True - попадание / False - промах
+    """
+    registry.inc("socialnet_cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+
+def _format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if value >= 1 else repr(value)
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (key, _escape(value)) for key, value in labels) + "}"
+
+
+def _sample_order(series):
+    def order(item):
+        (name, labels), _ = item                      # Группировка по набору меток:
+        le = dict(labels).get("le")                   # корзины по возрастанию, затем _sum и _count
+        base_labels = tuple(label for label in labels if label[0] != "le")
+        return base_labels, series.index(name), float(le) if le else 0.0
+    return order
+
+
+def render_prometheus():
+    """
+    Формирование метрик в текстовом формате Prometheus (version 0.0.4)
+    """
+    values = registry.collect()
+    lines = []
+    for name, (metric_type, help_text, _) in METRICS.items():
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, metric_type))
+        series = [name] if metric_type == "counter" else [name + "_bucket", name + "_sum", name + "_count"]
+        samples = sorted(((key, value) for key, value in values.items() if key[0] in series),
+                         key=_sample_order(series))
+        for (sample_name, labels), value in samples:
+            lines.append("%s%s %s" % (sample_name, _format_labels(labels), _format_value(value)))
+
+    hits, lookups = {}, {}
+    for (name, labels), value in values.items():
+        if name == "socialnet_cache_requests_total":
+            labels = dict(labels)
+            lookups[labels["cache"]] = lookups.get(labels["cache"], 0) + value
+            if labels["result"] == "hit":
+                hits[labels["cache"]] = hits.get(labels["cache"], 0) + value
+    lines.append("# HELP socialnet_cache_hit_ratio Cache hit ratio by cache name.")
+    lines.append("# TYPE socialnet_cache_hit_ratio gauge")
+    for cache in sorted(lookups):
+        ratio = hits.get(cache, 0) / lookups[cache]
+        lines.append("socialnet_cache_hit_ratio%s %s" % (_format_labels((("cache", cache),)), repr(float(ratio))))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,158 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.db import connections
+from rest_framework.mixins import ListModelMixin
+from rest_framework.request import Request
+from rest_framework.views import APIView
+from rest_framework.viewsets import ViewSetMixin
+
+from core import metrics
+from core.profiling import RequestProfile, activate_profile, deactivate_profile, get_setting
+from core.querystats import recording_queries
+
+logger = logging.getLogger("core.requests")
+profile_logger = logging.getLogger("core.profiling")
+
+
+class MetricsMiddleware:
+    """
+    Промежуточный слой сбора метрик запросов для эндпоинта `/metrics`
+
+    Метки запроса - класс представления и его действие (list, retrieve, like,
+    publish, ...). Кол-во SQL запросов и время обработки берутся из профиля
+    `ProfilingMiddleware`, поэтому слой располагается перед ним в `MIDDLEWARE`.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started_at = time.perf_counter()
+        response = self.get_response(request)
+        profile = getattr(request, "profile", None)
+        view, action = getattr(request, "metrics_labels", ("none", "none"))
+        metrics.record_request(
+            view, action, request.method, response.status_code,
+            profile.total_time if profile is not None else time.perf_counter() - started_at,
+            profile.sql_count if profile is not None else None,
+        )
+        return response
+
+    @staticmethod
+    def process_view(request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if view_class is None:
+            request.metrics_labels = (view_func.__name__, request.method.lower())
+            return
+        method = request.method.lower()
+        actions = getattr(view_func, "actions", None)
+        if issubclass(view_class, ViewSetMixin) and actions:       # Действие вьюсета
+            action = actions.get(method, method)
+        elif issubclass(view_class, ListModelMixin) and method == "get":
+            action = "list"                                        # Списочные представления
+        else:
+            action = method
+        request.metrics_labels = (view_class.__name__, action)
+
+
+class ProfilingMiddleware:
+    """
+    Промежуточный слой профилирования запросов
+
+    Для каждого запроса замеряет кол-во и время SQL запросов, время сериализации,
+    время выполнения представления и общее время обработки. Метрики отдаются в
+    заголовке `Server-Timing` и пишутся структурированной (JSON) строкой в лог
+    `core.requests`.
+
+    Если администратор передаёт заголовок `X-Profile`, представление (с вероятностью
+    `PROFILING['SAMPLE_RATE']`) выполняется под `cProfile`: профилировщик запускается
+    перед представлением DRF после аутентификации аутентификаторами представления
+    (без заголовка запрос не аутентифицируется повторно), а сводка по функциям
+    пишется в лог `core.profiling` и, при заданной `PROFILING['PROFILE_DIR']`,
+    сохраняется в файл `<id>.prof`. Идентификатор профиля возвращается
+    в заголовке `X-Profile-Id`.
+
+    WARNING: Слой должен располагаться последним в `MIDDLEWARE`, иначе
+    время представления будет включать время внутренних слоёв
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        request.profile = profile
+        request.profiler = None
+        token = activate_profile(profile)
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(recording_queries())        # статистика отпечатков запросов
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            deactivate_profile(token)
+            if request.profiler is not None:
+                request.profiler.disable()
+        profile.finish()
+
+        response["Server-Timing"] = profile.server_timing()
+        if request.profiler is not None:
+            response["X-Profile-Id"] = self._save_profile(request, request.profiler)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                **profile.as_dict(),
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, "profile", None)
+        if profile is None:
+            return
+        if self._profile_requested(request) and self._is_admin(request, view_func):
+            request.profiler = cProfile.Profile()
+            request.profiler.enable()
+        profile.view_started_at = time.perf_counter()
+
+    @staticmethod
+    def _profile_requested(request):
+        return bool(request.META.get(get_setting('PROFILE_HEADER'))) and random.random() < get_setting('SAMPLE_RATE')
+
+    @staticmethod
+    def _is_admin(request, view_func):
+        """
+        Аутентификация запроса аутентификаторами представления DRF до его выполнения
+        (представление аутентифицирует запрос повторно, только для запросов профилирования)
+        """
+        view_class = getattr(view_func, "cls", None)
+        if view_class is None or not issubclass(view_class, APIView):
+            return False
+        authenticators = [authenticator() for authenticator in view_class.authentication_classes]
+        try:
+            user = Request(request, authenticators=authenticators).user
+        except Exception:                            # Ошибку аутентификации вернёт представление
+            return False
+        return bool(user is not None and user.is_staff)
+
+    @staticmethod
+    def _save_profile(request, profiler):
+        profile_id = uuid.uuid4().hex
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(get_setting('TOP_FUNCTIONS'))
+        profile_logger.info("profile %s %s %s\n%s", profile_id, request.method, request.path, stream.getvalue())
+        profile_dir = get_setting('PROFILE_DIR')
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+            stats.dump_stats(os.path.join(profile_dir, profile_id + ".prof"))
+        return profile_id
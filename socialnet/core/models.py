@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Сущность фоновой задачи
+
+    Очередь задач в таблице бд: задача выбирается рабочим процессом
+    `SELECT ... FOR UPDATE SKIP LOCKED` (`core.jobs`), выполненная задача удаляется
+
+    Поля сущности:
+     * `name` - имя зарегистрированной задачи (`core.jobs.task`)
+     * `payload` - аргументы задачи (JSON)
+     * `priority` - приоритет, задачи с большим приоритетом выполняются первыми
+     * `status` - состояние: в очереди, выполняется, завершилась ошибкой (попытки исчерпаны)
+     * `attempts` - кол-во попыток выполнения
+     * `max_attempts` - максимальное кол-во попыток
+     * `run_at` - время, не раньше которого задача выполняется (повтор - с задержкой)
+     * `locked_at` - время выбора задачи рабочим процессом
+     * `last_error` - ошибка последней попытки
+     * `created_at` - время и дата создания сущности
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_FAILED = "failed"
+    STATUSES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(F("priority").desc(), F("run_at"), F("id"), condition=Q(status="queued"),
+                         name="core_job_queued_idx"),       # выбор задач очереди по порядку выполнения
+            models.Index(F("locked_at"), condition=Q(status="running"),
+                         name="core_job_running_idx"),      # возврат задач завершившихся процессов
+        ]
+
+    def __str__(self):
+        return "%s #%s" % (self.name, self.pk)
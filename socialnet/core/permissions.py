@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from core.metrics import token_valid
+
 
 class CurrentNonAdminUserOnly(permissions.IsAuthenticated):
     """
@@ -11,3 +13,11 @@ class CurrentNonAdminUserOnly(permissions.IsAuthenticated):
     def has_object_permission(self, request, view, obj):
         user = request.user
         return not user.is_staff and obj.pk == user.pk
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Доступ сборщику метрик по токену `METRICS['TOKEN']` (заголовок `Authorization: Bearer <токен>`)
+    """
+    def has_permission(self, request, view):
+        return token_valid(request.META.get("HTTP_AUTHORIZATION", ""))
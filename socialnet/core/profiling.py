@@ -0,0 +1,129 @@
+import contextvars
+import time
+
+from django.conf import settings
+from rest_framework.serializers import BaseSerializer
+
+_current_profile = contextvars.ContextVar("request_profile", default=None)
+
+DEFAULTS = {
+    'PROFILE_HEADER': 'HTTP_X_PROFILE',
+    'SAMPLE_RATE': 1.0,
+    'PROFILE_DIR': None,
+    'TOP_FUNCTIONS': 30,
+}
+
+
+def get_setting(name):
+    """
+    Получение параметра профилирования из `settings.PROFILING`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+class RequestProfile:
+    """
+    Сборщик метрик выполнения одного запроса
+
+    Метрики:
+     * `sql_count` - кол-во выполненных SQL запросов
+     * `sql_time` - суммарное время выполнения SQL запросов (сек.)
+     * `serializer_time` - суммарное время сериализации ответа (сек.)
+     * `view_time` - время выполнения представления (сек.)
+     * `total_time` - общее время обработки запроса (сек.)
+
+    Экземпляр используется как обёртка `connection.execute_wrapper()` (статистика
+    отпечатков `core.querystats` ведётся отдельной обёрткой `recording_queries()`)
+    """
+    __slots__ = ("started_at", "view_started_at", "sql_count", "sql_time",
+                 "serializer_time", "serializer_depth", "view_time", "total_time")
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.view_started_at = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.view_time = 0.0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started_at
+
+    def finish(self):
+        finished_at = time.perf_counter()
+        self.total_time = finished_at - self.started_at
+        if self.view_started_at is not None:
+            self.view_time = finished_at - self.view_started_at
+
+    def server_timing(self):
+        """
+        Значение заголовка `Server-Timing` (длительности в мс.)
+        """
+        return ", ".join((
+            'sql;desc="%d queries";dur=%.2f' % (self.sql_count, self.sql_time * 1000),
+            'serializer;dur=%.2f' % (self.serializer_time * 1000),
+            'view;dur=%.2f' % (self.view_time * 1000),
+            'total;dur=%.2f' % (self.total_time * 1000),
+        ))
+
+    def as_dict(self):
+        return {
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_time * 1000, 2),
+            "serializer_ms": round(self.serializer_time * 1000, 2),
+            "view_ms": round(self.view_time * 1000, 2),
+            "total_ms": round(self.total_time * 1000, 2),
+        }
+
+
+def get_current_profile():
+    """
+    Профиль текущего обрабатываемого запроса (или None вне запроса)
+    """
+    return _current_profile.get()
+
+
+def activate_profile(profile):
+    return _current_profile.set(profile)
+
+
+def deactivate_profile(token):
+    _current_profile.reset(token)
+
+
+def instrument_serializers():
+    """
+    Подключение замера времени сериализации ко всем сериализаторам DRF
+
+    Замеряется только верхнеуровневое обращение к `serializer.data`,
+    вложенные сериализаторы вызывают `to_representation()` напрямую.
+    Вне профилируемого запроса накладные расходы - одно чтение contextvar.
+    """
+    data_property = BaseSerializer.data
+    if getattr(data_property.fget, "_profiled", False):
+        return
+    base_data = data_property.fget
+
+    def data(self):
+        profile = _current_profile.get()
+        if profile is None or profile.serializer_depth:   # вложенные вызовы уже учтены
+            return base_data(self)
+        profile.serializer_depth += 1
+        started_at = time.perf_counter()
+        try:
+            return base_data(self)
+        finally:
+            profile.serializer_time += time.perf_counter() - started_at
+            profile.serializer_depth -= 1
+
+    data._profiled = True
+    BaseSerializer.data = property(data)
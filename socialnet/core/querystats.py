@@ -0,0 +1,154 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("core.querystats")
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_FINGERPRINTS': 500,
+    'SLOW_QUERY_MS': 200,
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUE_ROW = r"\(\s*(?:\?|DEFAULT|NULL)(?:\s*,\s*(?:\?|DEFAULT|NULL))*\s*\)"
+_VALUES_LIST = re.compile(_VALUE_ROW + r"(?:\s*,\s*" + _VALUE_ROW + r")+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def get_setting(name):
+    """
+    Получение параметра статистики запросов из `settings.QUERY_STATS`
+    :param name: имя параметра
+    :return: значение параметра или значение по умолчанию
+    """
+    return getattr(settings, 'QUERY_STATS', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """
+    Нормализация SQL запроса в отпечаток
+    Литералы и параметры заменяются на `?`, списки `IN (...)` и
+    строки `VALUES (...), (...)` схлопываются, пробелы нормализуются
+    :param sql: текст SQL запроса
+    :return: отпечаток запроса
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """
+    Агрегированная статистика SQL запросов по отпечаткам
+
+    Для каждого отпечатка хранятся: кол-во вызовов, суммарное и максимальное
+    время выполнения, суммарное кол-во строк. Таблица ограничена
+    `QUERY_STATS['MAX_FINGERPRINTS']` записями, при переполнении вытесняется
+    давно не выполнявшийся отпечаток. Запросы дольше
+    `QUERY_STATS['SLOW_QUERY_MS']` пишутся в лог `core.querystats`.
+
+    Статистика ведётся в пределах процесса
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+
+    def _fingerprint(self, sql):
+        result = self._fingerprints.get(sql)    # Django формирует одинаковый текст
+        if result is None:                      # для запросов одной формы - кэш по тексту
+            if len(self._fingerprints) >= get_setting('MAX_FINGERPRINTS') * 4:
+                self._fingerprints.clear()
+            result = self._fingerprints[sql] = fingerprint(sql)
+        return result
+
+    def record(self, sql, duration, rows):
+        """
+        Учёт выполненного запроса
+        :param sql: текст SQL запроса
+        :param duration: время выполнения (сек.)
+        :param rows: кол-во строк (rowcount курсора, -1 - неизвестно)
+        """
+        key = self._fingerprint(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= get_setting('MAX_FINGERPRINTS'):
+                    self._entries.popitem(last=False)
+                entry = self._entries[key] = {"calls": 0, "total_time": 0.0, "max_time": 0.0, "rows": 0}
+            else:
+                self._entries.move_to_end(key)
+            entry["calls"] += 1
+            entry["total_time"] += duration
+            entry["max_time"] = max(entry["max_time"], duration)
+            if rows > 0:
+                entry["rows"] += rows
+            snapshot = dict(entry)
+        if duration * 1000 >= get_setting('SLOW_QUERY_MS'):
+            logger.warning("slow query %.2f ms (calls=%d, total=%.2f ms, max=%.2f ms, rows=%d): %s",
+                           duration * 1000, snapshot["calls"], snapshot["total_time"] * 1000,
+                           snapshot["max_time"] * 1000, snapshot["rows"], key)
+
+    def as_list(self, ordering="total_time"):
+        """
+        Статистика отпечатков, отсортированная по убыванию показателя
+        :param ordering: показатель сортировки (calls, total_time, max_time, rows)
+        :return: список словарей статистики
+        """
+        with self._lock:
+            rows = [{"fingerprint": key, **entry} for key, entry in self._entries.items()]
+        for row in rows:
+            row["total_ms"] = round(row.pop("total_time") * 1000, 3)
+            row["max_ms"] = round(row.pop("max_time") * 1000, 3)
+            row["mean_ms"] = round(row["total_ms"] / row["calls"], 3)
+        key = {"total_time": "total_ms", "max_time": "max_ms"}.get(ordering, ordering)
+        return sorted(rows, key=lambda row: row[key], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_stats = QueryStats()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка выполнения запросов соединения (`connection.execute_wrappers`) для учёта
+    в статистике отпечатков
+    """
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query_stats.record(sql, time.perf_counter() - started_at, context["cursor"].rowcount)
+
+
+@contextmanager
+def recording_queries():
+    """
+    Учёт запросов всех соединений потока в статистике отпечатков на время блока:
+    обработки HTTP запроса (`ProfilingMiddleware`), команд управления (`run_jobs`,
+    `publish_scheduled`) и чтения поста потоков событий ASGI
+
+    Обёртка подключается `connection.execute_wrapper()` и снимается при выходе
+    из блока, поэтому вложенные обёртки (профиль запроса) снимаются в своём порядке
+    """
+    with ExitStack() as stack:
+        if get_setting('ENABLED'):
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+        yield
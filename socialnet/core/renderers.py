@@ -0,0 +1,50 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    Рендерер JSON на orjson
+
+    Вывод побайтно совпадает с выводом `JSONRenderer` при настройках по умолчанию
+    (`COMPACT_JSON`, `UNICODE_JSON`):
+     * даты и время, `Decimal`, ленивые строки и прочие типы, которые не поддерживает
+       orjson или которые он выводит иначе, передаются в `JSONEncoder.default()` DRF
+     * U+2028, U+2029 экранируются, как и в `JSONRenderer`
+     * вывод с отступами (`; indent=4`, Browsable API), в ASCII или некомпактный
+       формируется `JSONRenderer`
+    Отличия: числа с плавающей точкой в экспоненциальной записи (`1e-5` вместо `1e-05`)
+    и NaN/Infinity (`null` вместо ошибки) - в ответах API таких значений нет
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.default, option=self.options)
+        for char, escaped in LINE_SEPARATORS:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
+
+
+class PlainTextRenderer(BaseRenderer):
+    """
+    Рендерер текста (`text/plain`) для представлений, отдающих текстовые форматы
+    (например, метрики Prometheus), ошибки выводятся текстом поля `detail`
+    """
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and "detail" in data:
+            data = data["detail"]
+        return str(data).encode(self.charset)
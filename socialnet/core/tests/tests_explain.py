@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase, TestCase
+
+from core.explain import explain, plan_issues
+
+
+class PlanIssuesTests(SimpleTestCase):
+    """
+    Тест кейс поиска последовательных чтений и сортировок в плане запроса
+    """
+    plan = {
+        "Node Type": "Limit", "Plan Rows": 5, "Plans": [{
+            "Node Type": "Sort", "Sort Key": ["created_at DESC"], "Plan Rows": 5000,
+            "Plans": [{"Node Type": "Seq Scan", "Relation Name": "content_post", "Plan Rows": 5000,
+                       "Actual Rows": 4000, "Actual Loops": 1}],
+        }],
+    }
+
+    def test_large_flagged(self):
+        self.assertEqual(plan_issues(self.plan, 1000, sizes={"content_post": 5000}), [
+            "Sort of 4000 rows by created_at DESC",
+            "Seq Scan on content_post (~5000 rows)",
+        ])
+
+    def test_small_ignored(self):
+        self.assertEqual(plan_issues(self.plan, 10000, sizes={"content_post": 5000}), [])
+
+
+class ExplainTests(TestCase):
+    """
+    Тест кейс получения плана выполнения запроса
+    """
+    def test_explain_analyze(self):
+        plan, duration = explain('SELECT "id" FROM "auth_user" WHERE "id" = %s', [1])
+        self.assertIn("Node Type", plan)
+        self.assertIn("Actual Rows", plan)
+        self.assertIsNotNone(duration)
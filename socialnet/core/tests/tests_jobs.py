@@ -0,0 +1,148 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import task, enqueue, enqueue_many, enqueue_on_commit, claim, run_jobs
+from core.models import Job
+
+calls = []
+
+
+@task("tests.record")
+def record_job(payload):
+    calls.append(payload["value"])
+
+
+@task("tests.record_batch", batch=True)
+def record_batch_job(payloads):
+    calls.append(sorted(payload["value"] for payload in payloads))
+
+
+@task("tests.fail")
+def fail_job(payload):
+    Job.objects.filter(name="tests.record").delete()         # откатывается вместе с задачей
+    raise RuntimeError("failed")
+
+
+class JobQueueTests(TestCase):
+    """
+    Тест кейс очереди фоновых задач
+    """
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_priority_order(self):
+        enqueue("tests.record", {"value": "low"}, priority=-1)
+        enqueue("tests.record", {"value": "first"})
+        enqueue("tests.record", {"value": "high"}, priority=5)
+        enqueue("tests.record", {"value": "delayed"}, priority=10, delay=timedelta(minutes=5))
+        enqueue("tests.record", {"value": "second"})
+        self.assertEqual(run_jobs(batch_size=2), (2, 0))
+        self.assertEqual(run_jobs(), (2, 0))
+        self.assertEqual(calls, ["high", "first", "second", "low"])
+        self.assertEqual(list(Job.objects.values_list("payload__value", flat=True)), ["delayed"])
+        with self.assertRaises(ValueError):
+            enqueue("tests.missing")
+
+    def test_batch(self):
+        enqueue_many("tests.record_batch", [{"value": i} for i in range(3)])
+        enqueue("tests.record", {"value": "single"})
+        # возврат, выбор и отметка, пакет и задача - удаление в транзакции (с точками сохранения теста)
+        with self.assertNumQueries(1 + 4 + 3 + 3):
+            self.assertEqual(run_jobs(), (4, 0))
+        self.assertEqual(calls, [[0, 1, 2], "single"])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS={'MAX_ATTEMPTS': 3, 'BACKOFF_BASE': 10, 'BACKOFF_MAX': 15})
+    def test_retry_backoff(self):
+        job = enqueue("tests.fail")
+        enqueue("tests.record", {"value": "kept"}, priority=-1)
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertEqual(run_jobs(batch_size=1), (1, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+        self.assertIn("RuntimeError", job.last_error)
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertTrue(Job.objects.filter(name="tests.record").exists())      # изменения задачи откачены
+        delays = []
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            with self.assertLogs("core.jobs", "ERROR"):
+                run_jobs(batch_size=1)
+            job.refresh_from_db()
+            delays.append(job.run_at - timezone.now())
+        self.assertAlmostEqual(delays[0].total_seconds(), 15, delta=2)          # 20 сек. > BACKOFF_MAX
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 3))
+        self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(calls, ["kept"])
+
+    def test_enqueue_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                enqueue_on_commit("tests.record", {"value": "committed"})
+            try:
+                with transaction.atomic():
+                    enqueue_on_commit("tests.record", {"value": "rolled back"})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(list(Job.objects.values_list("payload__value", flat=True)), ["committed"])
+
+    @override_settings(JOBS={'LOCK_TIMEOUT': 60})
+    def test_requeue_stale(self):
+        stale = enqueue("tests.record", {"value": "stale"})
+        Job.objects.filter(pk=stale.pk).update(status=Job.STATUS_RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+        running = enqueue("tests.record", {"value": "running"})
+        Job.objects.filter(pk=running.pk).update(status=Job.STATUS_RUNNING, locked_at=timezone.now())
+        self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(calls, ["stale"])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_RUNNING)
+
+    @override_settings(JOBS={'LOCK_TIMEOUT': 60})
+    def test_stale_attempts_exhausted(self):
+        crashed = enqueue("tests.record", {"value": "crashed"}, max_attempts=2)
+        retried = enqueue("tests.record", {"value": "retried"}, max_attempts=2)
+        locked_at = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=crashed.pk).update(status=Job.STATUS_RUNNING, locked_at=locked_at, attempts=2)
+        Job.objects.filter(pk=retried.pk).update(status=Job.STATUS_RUNNING, locked_at=locked_at, attempts=1)
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertEqual(run_jobs(), (1, 0))
+        self.assertEqual(calls, ["retried"])
+        crashed.refresh_from_db()
+        self.assertEqual((crashed.status, crashed.locked_at), (Job.STATUS_FAILED, None))
+        self.assertIn("Worker exited", crashed.last_error)
+
+    def test_command(self):
+        enqueue("tests.record", {"value": 1})
+        out = StringIO()
+        call_command("run_jobs", stdout=out)
+        self.assertIn("Ran 1 jobs, 0 failed", out.getvalue())
+
+
+class JobClaimTests(TransactionTestCase):
+    """
+    Тест кейс выбора задач параллельными рабочими процессами (`SKIP LOCKED`)
+    """
+    def test_skip_locked(self):
+        enqueue_many("tests.record", [{"value": i} for i in range(4)])
+        claimed = []
+
+        def other_worker():
+            try:
+                claimed.extend(job.payload["value"] for job in claim(10))
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            locked = list(Job.objects.order_by("id").select_for_update()[:2])
+            worker = threading.Thread(target=other_worker)
+            worker.start()
+            worker.join(timeout=10)
+        self.assertEqual(sorted(claimed), [2, 3])
+        self.assertEqual([job.status for job in locked], [Job.STATUS_QUEUED] * 2)
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_RUNNING).count(), 2)
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from content.models import Blog, Post
+from core.metrics import MetricsRegistry, registry, ARCHIVE_NAME
+
+User = get_user_model()
+
+
+class MetricsEndpointTests(APITestCase):
+    """
+    Тест кейс эндпоинта метрик
+    """
+    def setUp(self) -> None:
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog, author=user)
+
+    def test_metrics_labels(self):
+        user = User.objects.get(username="blog_owner")
+        self.client.get(path=reverse('post-list'), format='json')
+        self.client.get(path=reverse('blog-posts-list', kwargs={"slug": "blogowner-test-blog"}), format='json')
+        self.client.force_authenticate(user=user)
+        self.client.post(path=reverse('post-like', kwargs={"slug": "test-post"}), format='json')
+        self.assertEqual(self.client.get(path=reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=User.objects.get(username="ADMIN"))
+        response = self.client.get(path=reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('socialnet_http_requests_total{action="list",method="GET",status="200",view="PostViewSet"}', body)
+        self.assertIn('socialnet_http_requests_total{action="list",method="GET",status="200",view="BlogPostsListView"}', body)
+        self.assertIn('socialnet_http_requests_total{action="like",method="POST",status="204",view="PostViewSet"}', body)
+        self.assertIn('socialnet_http_request_duration_seconds_bucket{action="like",view="PostViewSet",le="+Inf"}', body)
+        self.assertIn('socialnet_db_queries_total{action="list",view="PostViewSet"}', body)
+
+    @override_settings(METRICS={'TOKEN': "secret"})
+    def test_metrics_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(path=url).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(path=url, HTTP_AUTHORIZATION="Bearer wrong", HTTP_ACCEPT="text/plain")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(path=url, HTTP_AUTHORIZATION="Bearer secret", HTTP_ACCEPT="text/plain")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("# TYPE socialnet_http_requests_total counter", response.content.decode())
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """
+    Тест кейс реестра метрик
+    """
+    def test_histogram_buckets_are_cumulative(self):
+        local = MetricsRegistry()
+        local.observe("socialnet_db_queries_per_request", {"view": "V", "action": "list"}, 3)
+        values = local.snapshot()
+        base = (("action", "list"), ("view", "V"))
+        self.assertEqual(values[("socialnet_db_queries_per_request_bucket", base + (("le", "2"),))], 0)
+        self.assertEqual(values[("socialnet_db_queries_per_request_bucket", base + (("le", "5"),))], 1)
+        self.assertEqual(values[("socialnet_db_queries_per_request_bucket", base + (("le", "+Inf"),))], 1)
+        self.assertEqual(values[("socialnet_db_queries_per_request_count", base)], 1)
+
+    def test_multiprocess_shards_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 0}):
+            other = MetricsRegistry()
+            other.inc("socialnet_cache_requests_total", {"cache": "test", "result": "hit"}, 2)
+            registry.inc("socialnet_cache_requests_total", {"cache": "test", "result": "hit"}, 3)
+            values = registry.collect()
+            self.assertEqual(values[("socialnet_cache_requests_total", (("cache", "test"), ("result", "hit")))], 5)
+
+    def test_dead_shards_are_merged(self):
+        key = ("socialnet_cache_requests_total", (("cache", "test"), ("result", "hit")))
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={'MULTIPROCESS_DIR': directory, 'FLUSH_INTERVAL': 0}):
+            for pid in (2 ** 22 + 1, 2 ** 22 + 2):          # больше pid_max - процессов нет
+                with open(os.path.join(directory, "metrics-%d-0123abcd.json" % pid), "w") as shard:
+                    json.dump([[key[0], key[1], 2]], shard)
+            local = MetricsRegistry()
+            local.inc(*key[:1], dict(key[1]), 1)
+            self.assertEqual(local.collect()[key], 5)
+            self.assertEqual(sorted(name for name in os.listdir(directory) if name.endswith(".json")),
+                             sorted([ARCHIVE_NAME, local._shard]))
+            self.assertEqual(local.collect()[key], 5)       # архив не суммируется повторно
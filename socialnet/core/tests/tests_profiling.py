@@ -0,0 +1,43 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from content.models import Blog, Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTests(APITestCase):
+    """
+    Тест кейс промежуточного слоя профилирования
+    """
+    def setUp(self) -> None:
+        user = User.objects.create_user(username='blog_owner', password='blog_owner')
+        blog = Blog.objects.create(slug="blogowner-test-blog", title="test-blog", owner=user)
+        Post.objects.create(slug="test-post", title="test-post", is_published=True, blog=blog, author=user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(path=reverse('post-list'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response["Server-Timing"]
+        for metric in ("sql;", "serializer;", "view;", "total;"):
+            self.assertIn(metric, timing)
+        self.assertNotIn('"0 queries"', timing)
+        self.assertFalse(response.has_header("X-Profile-Id"))
+
+    def test_profile_for_admin_only(self):
+        url = reverse('post-list')
+        with mock.patch("core.middleware.cProfile.Profile") as profiler:      # не запускается до проверки прав
+            response = self.client.get(path=url, format='json', HTTP_X_PROFILE="1")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.force_authenticate(user=User.objects.get(username="blog_owner"))
+            response = self.client.get(path=url, format='json', HTTP_X_PROFILE="1")
+            self.assertFalse(response.has_header("X-Profile-Id"))
+            profiler.assert_not_called()
+        self.client.force_authenticate(user=User.objects.get(username="ADMIN"))
+        with self.assertLogs("core.profiling", level="INFO"):
+            response = self.client.get(path=url, format='json', HTTP_X_PROFILE="1")
+        self.assertTrue(response.has_header("X-Profile-Id"))
@@ -0,0 +1,91 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from core.querystats import QueryStats, fingerprint, query_stats
+
+User = get_user_model()
+
+
+class FingerprintTests(SimpleTestCase):
+    """
+    Тест кейс нормализации SQL запросов
+    """
+    def test_literals_stripped(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'x''y' AND b = 42 AND c = %s LIMIT 21"),
+            "SELECT * FROM t WHERE a = ? AND b = ? AND c = ? LIMIT ?",
+        )
+
+    def test_lists_collapsed(self):
+        self.assertEqual(fingerprint("SELECT 1 FROM t WHERE id IN (%s, %s, %s)"),
+                         fingerprint("SELECT 1 FROM t WHERE id IN (%s)"))
+        self.assertEqual(fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, DEFAULT)"),
+                         "INSERT INTO t (a, b) VALUES (...)")
+
+    def test_identifiers_kept(self):
+        sql = 'SELECT "content_post"."id" FROM "content_post" INNER JOIN "T3" ON (U0."x" = T3."y")'
+        self.assertEqual(fingerprint(sql), sql)
+
+    @override_settings(QUERY_STATS={'MAX_FINGERPRINTS': 2, 'SLOW_QUERY_MS': 10 ** 6})
+    def test_bounded_table(self):
+        stats = QueryStats()
+        stats.record("SELECT 1 FROM a WHERE id = 1", 0.001, 1)
+        stats.record("SELECT 1 FROM a WHERE id = 2", 0.003, 1)
+        stats.record("SELECT 1 FROM b", 0.002, 5)
+        stats.record("SELECT 1 FROM c", 0.002, 0)
+        rows = stats.as_list("calls")
+        self.assertEqual(len(rows), 2)
+        self.assertEqual([row["fingerprint"] for row in rows], ["SELECT ? FROM b", "SELECT ? FROM c"])
+
+    @override_settings(QUERY_STATS={'SLOW_QUERY_MS': 1})
+    def test_slow_query_logged(self):
+        with self.assertLogs("core.querystats", level="WARNING"):
+            QueryStats().record("SELECT pg_sleep(1)", 1.0, 1)
+
+
+class QueryStatsEndpointTests(APITestCase):
+    """
+    Тест кейс эндпоинта статистики запросов
+    """
+    def test_admin_only(self):
+        url = reverse('query-stats')
+        self.client.get(path=reverse('post-list'), format='json')
+        response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=User.objects.create_user(username='user', password='user'))
+        response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=User.objects.get(username="ADMIN"))
+        response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('"content_post"' in row["fingerprint"] for row in response.data))
+
+    def test_queries_outside_requests(self):
+        query_stats.reset()
+        call_command("run_jobs", stdout=io.StringIO())  # фоновые задачи и команды вне HTTP запросов
+        self.assertTrue(any('"core_job"' in row["fingerprint"] for row in query_stats.as_list()))
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class QueryStatsWrapperTests(APITransactionTestCase):
+    """
+    Тест кейс обёрток выполнения запросов соединения
+
+    Соединение закрывается между запросами (вне транзакции теста), поэтому
+    открывается внутри обработки запроса, как при `CONN_MAX_AGE=0`
+    """
+    def test_wrappers_removed_after_requests(self):
+        query_stats.reset()
+        for _ in range(4):
+            connection.close()
+            response = self.client.get(path=reverse('post-list'), format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(connection.execute_wrappers, [])
+        self.assertTrue(any('"content_post"' in row["fingerprint"] for row in query_stats.as_list()))
@@ -0,0 +1,60 @@
+import io
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from content.benchmarks.cases import LIST_SIZE, make_blogs, make_posts
+from content.serializers import BlogSerializer, PostSerializer
+from core.parsers import OrjsonParser
+from core.renderers import OrjsonRenderer
+
+
+class OrjsonRendererTests(SimpleTestCase):
+    """
+    Тест кейс совпадения вывода рендерера orjson с выводом `JSONRenderer`
+    """
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(OrjsonRenderer().render(data, accepted_media_type),
+                         JSONRenderer().render(data, accepted_media_type))
+
+    def test_types(self):
+        self.assertSameOutput({
+            "text": "текст \u2028\u2029\n\t\x01 \"\\/ 😀", "numbers": [0, -1, 2 ** 62, 1.5, 0.1, True, None],
+            "decimal": Decimal("1.10"), "datetime": datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            "naive": datetime(2024, 1, 2, 3, 4, 5), "date": date(2024, 1, 2), "time": time(1, 2, 3, 4000),
+            "timedelta": timedelta(seconds=5), "uuid": uuid.uuid4(), "lazy": _("Invalid data provided."),
+            1: "int key", "tuple": (1, 2), "nested": {"list": [{}]},
+        })
+
+    def test_lists(self):
+        self.assertSameOutput(PostSerializer(make_posts(LIST_SIZE), many=True).data)
+        self.assertSameOutput(BlogSerializer(make_blogs(LIST_SIZE), many=True).data)
+
+    def test_indent_fallback(self):
+        self.assertSameOutput({"a": [1, 2]}, "application/json; indent=4")
+        self.assertEqual(OrjsonRenderer().render(None), b"")
+
+
+class OrjsonParserTests(SimpleTestCase):
+    """
+    Тест кейс парсера orjson
+    """
+    def parse(self, parser, body, encoding="utf-8"):
+        return parser.parse(io.BytesIO(body), parser_context={"encoding": encoding})
+
+    def test_same_result(self):
+        body = '{"title": "Заголовок", "tags": ["a", "b"], "n": 1.5, "x": null}'
+        for encoding in ("utf-8", "cp1251"):
+            self.assertEqual(self.parse(OrjsonParser(), body.encode(encoding), encoding),
+                             self.parse(JSONParser(), body.encode(encoding), encoding))
+
+    def test_invalid(self):
+        for body in (b"", b"{", b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                self.parse(OrjsonParser(), body)
@@ -1,6 +1,15 @@
 from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+
+from content.views import UserViewSet
+from core.views import QueryStatsView
+
+users_router = SimpleRouter()
+users_router.register("users", UserViewSet)     # Удаление пользователя порциями вместо каскада Djoser
 
 urlpatterns = [
+    path('auth/', include(users_router.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('admin/query-stats', QueryStatsView.as_view(), name='query-stats'),
 ]
@@ -0,0 +1,49 @@
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.metrics import render_prometheus
+from core.permissions import HasMetricsToken
+from core.renderers import OrjsonRenderer, PlainTextRenderer
+from core.querystats import query_stats
+
+
+class MetricsView(APIView):
+    """
+    Представление метрик приложения в текстовом формате Prometheus
+
+     * базовый класс разрешения - Доступно администраторам и сборщику метрик по токену
+    """
+    permission_classes = [IsAdminUser | HasMetricsToken, ]
+    renderer_classes = [OrjsonRenderer, PlainTextRenderer]      # Prometheus запрашивает text/plain
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class QueryStatsView(APIView):
+    """
+    Представление статистики SQL запросов по отпечаткам (текущего процесса)
+
+     * базовый класс разрешения - Доступно администраторам
+     * параметры запроса - `ordering` (calls, total_time, max_time, rows), `limit`
+    """
+    permission_classes = [IsAdminUser, ]
+    orderings = ("calls", "total_time", "max_time", "rows")
+
+    def get(self, request):
+        ordering = request.query_params.get("ordering", "total_time")
+        if ordering not in self.orderings:
+            ordering = "total_time"
+        rows = query_stats.as_list(ordering)
+        try:
+            rows = rows[:int(request.query_params["limit"])]
+        except (KeyError, ValueError):
+            pass
+        return Response(rows)
+
+    def delete(self, request):
+        query_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'socialnet.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from content.streams import stream_router  # noqa: E402 (после настройки Django)
+
+application = stream_router(django_application)
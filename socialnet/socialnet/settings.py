@@ -54,6 +54,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'socialnet.urls'
@@ -88,7 +90,20 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+        'content.filters.SparseFieldsFilterBackend',
+        'content.filters.IncludeFilterBackend',
+    ],
     'DATETIME_FORMAT': "%d.%m.%Y %H:%M:%S",
 }
 
@@ -137,6 +152,142 @@ DJOSER = {
     'SEND_ACTIVATION_EMAIL': False,
 }
 
+# Profiling
+# Заголовок `X-Profile` от администратора включает cProfile для запроса
+
+PROFILING = {
+    'PROFILE_HEADER': 'HTTP_X_PROFILE',
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', 1.0)),
+    'PROFILE_DIR': os.getenv('PROFILING_DIR'),
+    'TOP_FUNCTIONS': 30,
+}
+
+# Metrics
+# Каталог снимков метрик рабочих процессов (обязателен при нескольких процессах),
+# TOKEN - токен сборщика метрик (Authorization: Bearer <TOKEN>), без него метрики доступны только администраторам
+
+METRICS = {
+    'MULTIPROCESS_DIR': os.getenv('METRICS_MULTIPROCESS_DIR'),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.getenv('METRICS_TOKEN'),
+}
+
+# Query statistics
+# Статистика SQL запросов по отпечаткам, медленные запросы пишутся в лог
+
+QUERY_STATS = {
+    'ENABLED': True,
+    'MAX_FINGERPRINTS': 500,
+    'SLOW_QUERY_MS': int(os.getenv('SLOW_QUERY_MS', 200)),
+}
+
+# Tag suggestions
+# Индекс подсказок тегов в памяти процесса, полная перестройка раз в REBUILD_INTERVAL сек.
+
+TAG_SUGGEST = {
+    'ENABLED': True,
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'MAX_TAGS': 200000,
+    'REBUILD_INTERVAL': int(os.getenv('TAG_SUGGEST_REBUILD_INTERVAL', 300)),
+}
+
+# Trending posts
+# Популярность по почасовым счётчикам активности за окно WINDOW_HOURS с периодом полураспада HALF_LIFE_HOURS
+
+TRENDING = {
+    'WINDOW_HOURS': int(os.getenv('TRENDING_WINDOW_HOURS', 72)),
+    'HALF_LIFE_HOURS': float(os.getenv('TRENDING_HALF_LIFE_HOURS', 12)),
+    'TOP_K': 50,
+    'CACHE_TIMEOUT': 60,
+    'WEIGHTS': {'likes': 3.0, 'comments': 2.0, 'views': 0.1},
+}
+
+# Scheduled publishing
+# Публикация запланированных постов командой publish_scheduled пакетами по BATCH_SIZE
+
+PUBLISHING = {
+    'BATCH_SIZE': 500,
+    'INTERVAL': int(os.getenv('PUBLISHING_INTERVAL', 60)),
+}
+
+PARTITIONING = {
+    'COMMENT_MONTHS_AHEAD': 3,
+}
+
+# Post images
+# Файлы изображений постов хранятся по хешу содержимого, миниатюры THUMBNAIL_SIZES
+# генерируются пулом из WORKERS процессов (0 - в процессе запроса)
+
+POST_IMAGES = {
+    'THUMBNAIL_SIZES': (160, 480, 1024),
+    'MAX_UPLOAD_SIZE': int(os.getenv('POST_IMAGES_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)),
+    'MAX_PIXELS': 40 * 1000 * 1000,
+    'MAX_PER_POST': 10,
+    'WORKERS': int(os.getenv('POST_IMAGES_WORKERS', 2)),
+}
+
+# Notifications
+# Подписчики блога уведомляются о публикации пакетами не больше MAX_BATCH_SIZE
+
+NOTIFICATIONS = {
+    'MAX_BATCH_SIZE': int(os.getenv('NOTIFICATIONS_MAX_BATCH_SIZE', 1000)),
+}
+
+# Background jobs
+# Очередь фоновых задач в таблице бд, выполняется командой run_jobs пакетами по BATCH_SIZE,
+# повтор задачи через BACKOFF_BASE * 2 ** (попытка - 1) сек. (не больше BACKOFF_MAX)
+
+JOBS = {
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': float(os.getenv('JOBS_POLL_INTERVAL', 1)),
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LOCK_TIMEOUT': 600,
+}
+
+# Deletion
+# Удалённые блоги и пользователи скрываются сразу и удаляются фоновыми задачами
+# порциями не больше CHUNK_SIZE строк (порция - отдельная транзакция)
+
+DELETION = {
+    'CHUNK_SIZE': int(os.getenv('DELETION_CHUNK_SIZE', 1000)),
+}
+
+# Post event streams
+# Потоки событий постов (ASGI, socialnet.asgi), с BRIDGE события передаются
+# между процессами через PostgreSQL NOTIFY
+
+STREAMS = {
+    'BRIDGE': os.getenv('STREAMS_BRIDGE', 'False') == 'True',
+    'QUEUE_SIZE': 100,
+    'KEEPALIVE': 15,
+}
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', 'WARNING'),
+        },
+        'content': {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -154,6 +305,11 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Media files (post images)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
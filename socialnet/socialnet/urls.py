@@ -14,10 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView
+
 urlpatterns = [
     path('api/v1/', include('core.urls')),
     path('api/v1/', include('content.urls')),
-]
+    path('metrics', MetricsView.as_view(), name='metrics'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)      # Только при DEBUG